@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmarks of the namelist adapters and of the TNT directives' operations.
+
+Synthetic namelists (see :mod:`namgen`) of increasing sizes are generated and
+each operation is timed on a fresh copy of the parsed namelist. The results
+are written in JSON format (see :func:`write_results`), which allows to
+compare several versions of the package.
+"""
+
+import argparse
+import functools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+# Automatically set the python path
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'src')
+)
+
+import namgen  # noqa: E402
+from thenamelisttool import namadapter  # noqa: E402
+
+#: The adapters that can be benchmarked
+ADAPTERS = dict(bronx=namadapter.BronxNamelistAdapter,
+                native=namadapter.NativeNamelistAdapter,
+                lazy=namadapter.LazyNamelistAdapter)
+
+_SORTINGS = dict(none=namadapter.NO_SORTING,
+                 first=namadapter.FIRST_ORDER_SORTING,
+                 second=namadapter.SECOND_ORDER_SORTING)
+
+
+def _selection(nblocks, nkeys, fraction=10):
+    """One key out of **fraction**, in every block."""
+    return [(namgen.block_name(b), namgen.key_name(k))
+            for b in range(nblocks) for k in range(0, nkeys, fraction)]
+
+
+#: The operations that consume a copy of the delta namelist
+_DELTA_OPERATIONS = frozenset(['merge'])
+
+
+def _operations(nblocks, nkeys):
+    """Return the benchmarked operations: name -> function of a ``(namelist, delta)`` tuple.
+
+    The delta is ``None``, except for the :data:`_DELTA_OPERATIONS` (it is then
+    a fresh copy of the delta namelist).
+    """
+    selection = _selection(nblocks, nkeys)
+    renames = {(b, k): (b, k + '_MV') for b, k in selection}
+    new_keys = {(b, k + '_NEW'): 1 for b, k in selection}
+    operations = dict(
+        add_keys=lambda args: args[0].add_keys(new_keys),
+        remove_keys=lambda args: args[0].remove_keys(selection),
+        move_keys=lambda args: args[0].move_keys(renames),
+        move_keys_keep_index=lambda args: args[0].move_keys(renames, keep_index=True),
+        merge=lambda args: args[0].merge(args[1]),
+        squeeze=lambda args: args[0].squeeze(),
+        expand_keys=lambda args: args[0]._expand_keys(selection),
+    )
+    for s_name, sorting in _SORTINGS.items():
+        operations['dumps_' + s_name] = lambda args, sorting=sorting: args[0].dumps(sorting=sorting)
+    return operations
+
+
+def _setup(nam, delta):
+    """Fresh copies of the namelist and of the delta (if any)."""
+    return nam.copy(), None if delta is None else delta.copy()
+
+
+def _time(func, setup, repeat):
+    """Call ``func(setup())`` **repeat** times and return the elapsed times."""
+    timings = list()
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run(scales, adapters, repeat=3, keys_per_block=100, array_length=4,
+        nattributes=3, nmacros=5, operations=None):
+    """Run the benchmarks and return the list of results (as dictionaries).
+
+    :param list[int] scales: The total numbers of keys of the synthetic namelists
+    :param list[str] adapters: The names of the adapters (see :data:`ADAPTERS`)
+    :param int repeat: The number of measures for each operation
+    :param list[str] operations: Restrict the benchmarks to these operations
+    """
+    results = list()
+    for scale in scales:
+        nblocks, nkeys = namgen.shape_for(scale, keys_per_block)
+        shape = dict(nblocks=nblocks, nkeys=nkeys, array_length=array_length,
+                     nattributes=nattributes, nmacros=nmacros, nempty=max(1, nblocks // 10))
+        text = namgen.generate_namelist(seed=1, **shape)
+        delta_text = namgen.generate_namelist(seed=2, **shape)
+        macros = namgen.generate_macros(nmacros)
+        for a_name in adapters:
+            adapter = ADAPTERS[a_name]
+            measures = dict(parse=_time(lambda t: adapter(t, macros=macros), lambda: text, repeat))
+            nam = adapter(text, macros=macros)
+            delta = adapter(delta_text, macros=macros)
+            for o_name, func in _operations(nblocks, nkeys).items():
+                if operations is None or o_name in operations:
+                    # The copies are made outside of the timed region
+                    setup = functools.partial(_setup, nam, delta if o_name in _DELTA_OPERATIONS else None)
+                    measures[o_name] = _time(func, setup, repeat)
+            for o_name, timings in measures.items():
+                if operations is None or o_name in operations:
+                    results.append(dict(adapter=a_name, operation=o_name, scale=scale,
+                                        size=len(text), best=min(timings),
+                                        median=statistics.median(timings), repeat=repeat, **shape))
+                    print('{:8s} {:22s} {:8d} keys: {:10.6f}s'.format(a_name, o_name, scale, min(timings)),
+                          file=sys.stderr)
+    return results
+
+
+def metadata():
+    """Describe the environment the benchmarks were run in."""
+    try:
+        from importlib.metadata import version
+        tnt_version = version('thenamelisttool')
+    except Exception:
+        tnt_version = None
+    return dict(python=platform.python_version(), implementation=platform.python_implementation(),
+                platform=platform.platform(), thenamelisttool=tnt_version,
+                date=time.strftime('%Y-%m-%dT%H:%M:%S'))
+
+
+def write_results(results, output=None):
+    """Write **results** (in JSON format) in the **output** file (or on stdout)."""
+    document = dict(metadata=metadata(), results=results)
+    if output is None:
+        json.dump(document, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(output, 'w') as fhout:
+            json.dump(document, fhout, indent=2)
+
+
+def main():
+    """Start the adapters' micro-benchmarks."""
+    parser = argparse.ArgumentParser(description='Micro-benchmarks of the namelist adapters.')
+    parser.add_argument('-s', '--scales', type=lambda s: [int(float(x)) for x in s.split(',')],
+                        default=[100, 1000, 10000],
+                        help='comma-separated list of total numbers of keys (e.g. 1e2,1e3,1e5).')
+    parser.add_argument('-a', '--adapters', type=lambda s: s.split(','),
+                        default=sorted(ADAPTERS.keys()),
+                        help='comma-separated list of adapters ({:s}).'.format(', '.join(sorted(ADAPTERS))))
+    parser.add_argument('--operations', type=lambda s: s.split(','), default=None,
+                        help='comma-separated list of operations to benchmark (default: all).')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='number of measures for each operation.')
+    parser.add_argument('--keys-per-block', type=int, default=100)
+    parser.add_argument('--array-length', type=int, default=4)
+    parser.add_argument('--attributes', type=int, default=3,
+                        help='number of attributes of derived type variables.')
+    parser.add_argument('--macros', type=int, default=5)
+    parser.add_argument('-o', '--output', default=None,
+                        help='the JSON output file (default: stdout).')
+    args = parser.parse_args()
+    unknown = set(args.adapters) - set(ADAPTERS)
+    if unknown:
+        parser.error('unknown adapter(s): {:s}'.format(', '.join(sorted(unknown))))
+    results = run(args.scales, args.adapters, repeat=args.repeat, keys_per_block=args.keys_per_block,
+                  array_length=args.array_length, nattributes=args.attributes, nmacros=args.macros,
+                  operations=args.operations)
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+
+"""
+End-to-end benchmarks of the TNT command line utilities.
+
+A pack of synthetic namelists (see :mod:`namgen`), together with directives,
+a tntstack todolist and tntcompose recipes, are generated in a temporary
+directory. Then, the ``main`` function of each of the command line utilities
+(``tnt.py``, ``tntstack.py``, ``tntcompose.py``, ``tntdiff.py`` and
+``tntdiffpack.py``) is run on them. Each run takes place in a forked process
+(on a fresh copy of the input files): its elapsed time and its peak memory
+usage (maximum resident set size) are recorded.
+
+The results are written in JSON format. When a baseline (i.e. the results of
+a previous run) is provided, scenarios that are slower (or that use more
+memory) than the baseline by more than a given threshold are reported and the
+exit status is non-zero.
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import namgen
+from bench_adapters import write_results
+
+#: The namelist blocks and keys used by the directives
+_BLOCK = namgen.block_name
+_KEY = namgen.key_name
+
+
+class Inputs:
+    """Generate the input files of the benchmarks in **rootdir**.
+
+    :param int nfiles: The number of namelists in the pack
+    :param int nblocks: The number of blocks in each namelist
+    :param int nkeys: The number of keys in each block
+    :param int nactions: The number of actions in the tntstack's todolist
+    :param int nrecipes: The number of tntcompose's recipes
+    :param int ningredients: The number of ingredients in each recipe
+    """
+
+    def __init__(self, rootdir, nfiles=200, nblocks=20, nkeys=50, nactions=40,
+                 nrecipes=10, ningredients=20):
+        self.rootdir = rootdir
+        self.nfiles = nfiles
+        self.nblocks = nblocks
+        self.nkeys = nkeys
+        self.nactions = nactions
+        self.nrecipes = nrecipes
+        self.ningredients = min(ningredients, nfiles)
+        self.pack = os.path.join(rootdir, 'pack')
+        self.pack_after = os.path.join(rootdir, 'pack_after')
+        self.recipes = os.path.join(rootdir, 'recipes')
+        self.files = ['nam{:04d}'.format(i) for i in range(nfiles)]
+        self._generate()
+
+    def _namelist(self, i, seed):
+        return namgen.generate_namelist(nblocks=self.nblocks, nkeys=self.nkeys, array_length=3,
+                                        nattributes=2, nempty=1, seed=seed * 1000 + i)
+
+    def _write(self, path, content):
+        with open(path, 'w') as fhout:
+            fhout.write(content)
+
+    def _generate(self):
+        for dirname in (self.pack, self.pack_after, self.recipes):
+            os.makedirs(dirname)
+        for i, name in enumerate(self.files):
+            self._write(os.path.join(self.pack, name), self._namelist(i, seed=1))
+            # One namelist out of two is modified in the "after" pack
+            self._write(os.path.join(self.pack_after, name), self._namelist(i, seed=1 + i % 2))
+        self._write(os.path.join(self.rootdir, 'directive.yaml'), self._directive_yaml())
+        self._write(os.path.join(self.rootdir, 'stack.yaml'), self._stack_yaml())
+        for i in range(self.nrecipes):
+            self._write(os.path.join(self.recipes, 'recipe{:03d}.yaml'.format(i)), self._recipe_yaml(i))
+
+    def _directive(self, i=0):
+        """A TNT directive (as a dictionary)."""
+        blocks = [_BLOCK(b) for b in range(self.nblocks)]
+        # The removed block is not targeted by the other operations (directives are chained)
+        removed, blocks = blocks[-1], blocks[:-1]
+        return dict(
+            keys_to_set={b: {_KEY(self.nkeys + i): i} for b in blocks[::2]},
+            keys_to_remove={b: [_KEY(k) for k in range(0, self.nkeys, 5)] for b in blocks[1::2]},
+            keys_to_move={blocks[0]: {_KEY(k): {blocks[0]: _KEY(k) + '_MV'} for k in range(1, self.nkeys, 7)}},
+            new_blocks=['NAMNEW{:d}'.format(i), ],
+            blocks_to_remove=[removed, ],
+            namdelta=' &{:s} {:s}=-1, /\n &NAMDELTA{:d} LDELTA=.TRUE., /\n'.format(blocks[1], _KEY(0), i),
+        )
+
+    @staticmethod
+    def _dump(obj):
+        import yaml
+        return yaml.safe_dump(obj, default_flow_style=False)
+
+    def _directive_yaml(self):
+        return self._dump(self._directive())
+
+    def _stack_yaml(self):
+        directives = {'dir{:d}'.format(i): self._directive(i) for i in range(5)}
+        chunk = max(1, self.nfiles // 10)
+        todolist = list()
+        created = list()
+        for i in range(self.nactions):
+            kind = i % 5
+            files = self.files[(i * chunk) % self.nfiles:(i * chunk) % self.nfiles + chunk]
+            if kind == 0 or (kind == 3 and not created):
+                todolist.append(dict(action='tnt', namelist=files, directive=['dir{:d}'.format(i % 5), ]))
+            elif kind == 1:
+                created.append('created{:03d}'.format(i))
+                todolist.append(dict(action='create', target=created[-1], namelist=files[0],
+                                     directive=['dir{:d}'.format(i % 5), 'dir{:d}'.format((i + 1) % 5)]))
+            elif kind == 2:
+                todolist.append(dict(action='create', target='copy{:03d}'.format(i), copy=files[0]))
+            elif kind == 3:
+                todolist.append(dict(action='move', target='moved{:03d}'.format(i), namelist=created.pop()))
+            else:
+                todolist.append(dict(action='link', target='link{:03d}'.format(i), namelist=files[0]))
+        todolist.append(dict(action='touch', namelist='nam*'))
+        todolist.append(dict(action='clean_untouched'))
+        return self._dump(dict(directives=directives, todolist=todolist))
+
+    def _recipe_yaml(self, i):
+        lines = ['__initial__:', '  {:s}: {{{:s}: 1}}'.format(_BLOCK(0), _KEY(0))]
+        for j in range(self.ningredients):
+            source = self.files[(i + j * 7) % self.nfiles]
+            if j % 2:
+                lines.append('{:s}/+:'.format(source))
+                lines.extend(['  - {:s}'.format(_BLOCK(b)) for b in range(j % self.nblocks, self.nblocks, 3)])
+            else:
+                lines.append('{:s}/-:'.format(source))
+                lines.append('  - {:s}/-: [{:s}, {:s}]'.format(_BLOCK(j % self.nblocks), _KEY(0), _KEY(1)))
+        return '\n'.join(lines) + '\n'
+
+    def scenarios(self, jobs=1):
+        """Return the benchmark scenarios.
+
+        :return: A dictionary: scenario name -> (entry point module, command
+                 line arguments, input files and directories to copy, working
+                 directory).
+        """
+        jobs_opt = ['-j', str(jobs)] if jobs > 1 else []
+        return dict(
+            tnt=('tnt', ['-d', 'directive.yaml', '-i'] + jobs_opt + [os.path.join('pack', f) for f in self.files],
+                 ['pack', 'directive.yaml'], '.'),
+            tntstack=('tntstack', ['-d', 'stack.yaml'] + jobs_opt, ['pack', 'stack.yaml'], 'pack'),
+            tntcompose=('tntcompose', ['-d', 'pack'] + jobs_opt +
+                        [os.path.join('recipes', r) for r in sorted(os.listdir(self.recipes))],
+                        ['pack', 'recipes'], '.'),
+            tntdiff=('tntdiff', ['-b', os.path.join('pack', self.files[1]),
+                                 '-a', os.path.join('pack_after', self.files[1])],
+                     ['pack', 'pack_after'], '.'),
+            tntdiffpack=('tntdiffpack', ['-b', 'pack', '-a', 'pack_after'] + jobs_opt,
+                         ['pack', 'pack_after'], '.'),
+        )
+
+    def prepare(self, rundir, inputs):
+        """Copy the **inputs** in **rundir**."""
+        os.makedirs(rundir)
+        for item in inputs:
+            source = os.path.join(self.rootdir, item)
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(rundir, item))
+            elif item == 'stack.yaml':
+                # The tntstack's directive lies in the pack
+                shutil.copy(source, os.path.join(rundir, 'pack', item))
+            else:
+                shutil.copy(source, os.path.join(rundir, item))
+
+
+def _child(module, argv, rundir, trace, fhout):
+    """Run the **module**'s main function (in a forked process)."""
+    import importlib
+    os.chdir(rundir)
+    entrypoint = importlib.import_module('thenamelisttool.entrypoints.' + module)
+    sys.argv = [module + '.py'] + argv
+    status = 0
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        sys.stderr = io.StringIO()
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            entrypoint.main()
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            status = '{:s}: {!s}'.format(type(e).__name__, e)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace else None
+        errors = sys.stderr.getvalue()
+    fhout.write(json.dumps(dict(elapsed=elapsed, status=status, tracemalloc_peak=peak,
+                                stderr=errors[-2000:])))
+
+
+def run_main(module, argv, rundir, trace=False):
+    """Run the **module**'s main function in a forked process.
+
+    :return: A dictionary with the elapsed time, the exit status, the peak
+             memory usage (maximum resident set size, in kiB) of the process
+             and (if **trace** is True) the peak of the memory allocated by
+             Python (see :mod:`tracemalloc`).
+    """
+    rfd, wfd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            os.close(rfd)
+            with os.fdopen(wfd, 'w') as fhout:
+                _child(module, argv, rundir, trace, fhout)
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+    os.close(wfd)
+    with os.fdopen(rfd) as fhin:
+        output = fhin.read()
+    _, _, rusage = os.wait4(pid, 0)
+    result = json.loads(output) if output else dict(elapsed=None, status='crashed', tracemalloc_peak=None)
+    result['peak_rss_kib'] = rusage.ru_maxrss
+    return result
+
+
+def run(inputs, scenarios, repeat=3, jobs=1, trace=False):
+    """Run the **scenarios** and return the list of results (as dictionaries)."""
+    results = list()
+    available = inputs.scenarios(jobs=jobs)
+    for name in scenarios:
+        module, argv, needed, workdir = available[name]
+        measures = list()
+        for i in range(repeat):
+            rundir = os.path.join(inputs.rootdir, 'run_{:s}_{:d}'.format(name, i))
+            inputs.prepare(rundir, needed)
+            measures.append(run_main(module, argv, os.path.join(rundir, workdir), trace=trace))
+            shutil.rmtree(rundir)
+        failed = [m for m in measures if m['status'] != 0]
+        elapsed = [m['elapsed'] for m in measures if m['elapsed'] is not None]
+        result = dict(scenario=name, repeat=repeat, jobs=jobs,
+                      status=failed[0]['status'] if failed else 0,
+                      best=min(elapsed) if elapsed else None,
+                      median=statistics.median(elapsed) if elapsed else None,
+                      peak_rss_kib=max([m['peak_rss_kib'] for m in measures]),
+                      tracemalloc_peak=max([m['tracemalloc_peak'] or 0 for m in measures]) if trace else None,
+                      nfiles=inputs.nfiles, nblocks=inputs.nblocks, nkeys=inputs.nkeys)
+        if failed:
+            result['stderr'] = failed[0].get('stderr', '')
+        results.append(result)
+        print('{:12s} {:>10s}  {:10d} kiB  {!s}'
+              .format(name, '{:.3f}s'.format(result['best']) if elapsed else '-',
+                      result['peak_rss_kib'], 'ok' if not failed else 'FAILED ({!s})'.format(result['status'])),
+              file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold=0.2):
+    """Compare **results** with the **baseline** ones.
+
+    :param float threshold: The tolerated relative increase of the elapsed
+                            time or of the peak memory usage
+    :return: The list of regressions (as dictionaries).
+    """
+    regressions = list()
+    reference = {r['scenario']: r for r in baseline}
+    for result in results:
+        ref = reference.get(result['scenario'], None)
+        if ref is None:
+            continue
+        for metric in ('best', 'peak_rss_kib'):
+            if ref.get(metric) and result.get(metric) is not None:
+                ratio = result[metric] / ref[metric]
+                if ratio > 1 + threshold:
+                    regressions.append(dict(scenario=result['scenario'], metric=metric,
+                                            baseline=ref[metric], value=result[metric], ratio=ratio))
+        if result['status'] != 0 and ref.get('status') == 0:
+            regressions.append(dict(scenario=result['scenario'], metric='status',
+                                    baseline=0, value=result['status'], ratio=None))
+    return regressions
+
+
+def main():
+    """Start the end-to-end benchmarks."""
+    parser = argparse.ArgumentParser(description='End-to-end benchmarks of the TNT command line utilities.')
+    parser.add_argument('--scenarios', type=lambda s: s.split(','),
+                        default=['tnt', 'tntstack', 'tntcompose', 'tntdiff', 'tntdiffpack'],
+                        help='comma-separated list of scenarios (default: all).')
+    parser.add_argument('--files', type=int, default=200, help='number of namelists in the pack.')
+    parser.add_argument('--blocks', type=int, default=20, help='number of blocks in each namelist.')
+    parser.add_argument('--keys', type=int, default=50, help='number of keys in each block.')
+    parser.add_argument('--actions', type=int, default=40, help="number of actions in the tntstack's todolist.")
+    parser.add_argument('--recipes', type=int, default=10, help='number of tntcompose recipes.')
+    parser.add_argument('--ingredients', type=int, default=20, help='number of ingredients in each recipe.')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes given to the utilities that support it.')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='number of runs for each scenario.')
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help='also record the peak of the memory allocated by Python (slower).')
+    parser.add_argument('-b', '--baseline', default=None,
+                        help='a JSON file produced by a previous run to compare with.')
+    parser.add_argument('-t', '--threshold', type=float, default=0.2,
+                        help='tolerated relative increase of the elapsed time and memory usage '
+                             '(default: 0.2, i.e. 20%%).')
+    parser.add_argument('-o', '--output', default=None, help='the JSON output file (default: stdout).')
+    parser.add_argument('--keep', action='store_true', help='keep the generated input files.')
+    args = parser.parse_args()
+    if args.blocks < 3:
+        parser.error('at least 3 blocks are needed by the generated directives')
+
+    rootdir = tempfile.mkdtemp(prefix='tnt_bench_')
+    try:
+        inputs = Inputs(rootdir, nfiles=args.files, nblocks=args.blocks, nkeys=args.keys,
+                        nactions=args.actions, nrecipes=args.recipes, ningredients=args.ingredients)
+        unknown = set(args.scenarios) - set(inputs.scenarios())
+        if unknown:
+            parser.error('unknown scenario(s): {:s}'.format(', '.join(sorted(unknown))))
+        results = run(inputs, args.scenarios, repeat=args.repeat, jobs=args.jobs, trace=args.tracemalloc)
+    finally:
+        if args.keep:
+            print('The input files are kept in: {:s}'.format(rootdir), file=sys.stderr)
+        else:
+            shutil.rmtree(rootdir)
+    write_results(results, args.output)
+
+    if args.baseline:
+        with open(args.baseline) as fhbase:
+            baseline = json.load(fhbase)['results']
+        regressions = compare(results, baseline, threshold=args.threshold)
+        for reg in regressions:
+            print('REGRESSION {:12s} {:12s}: {!s} -> {!s}{:s}'
+                  .format(reg['scenario'], reg['metric'], reg['baseline'], reg['value'],
+                          ' (x{:.2f})'.format(reg['ratio']) if reg['ratio'] else ''),
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Generation of synthetic namelists (for benchmarking purposes).
+"""
+
+import random
+
+#: The kinds of namelist entries that are always generated
+_SCALAR_KINDS = ('integer', 'real', 'logical', 'string')
+
+
+def block_name(i):
+    """The name of the **i**-th synthetic namelist block."""
+    return 'NAMBLOCK{:05d}'.format(i)
+
+
+def key_name(i):
+    """The name of the **i**-th synthetic namelist variable."""
+    return 'KEY{:05d}'.format(i)
+
+
+def _key_kinds(array_length, nattributes, nmacros):
+    kinds = list(_SCALAR_KINDS)
+    if array_length:
+        kinds.append('array')
+    if nattributes:
+        kinds.append('dtype')
+    if nmacros:
+        kinds.append('macro')
+    return kinds
+
+
+def _scalar(kind, rng):
+    if kind == 'integer':
+        return str(rng.randint(-1000, 100000))
+    elif kind == 'real':
+        return repr(rng.uniform(-1e3, 1e3))
+    elif kind == 'logical':
+        return rng.choice(('.TRUE.', '.FALSE.'))
+    else:
+        return "'{:s}'".format(''.join([rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ_') for _ in range(8)]))
+
+
+def generate_namelist(nblocks=10, nkeys=100, array_length=0, nattributes=0,
+                      nmacros=0, nempty=0, seed=0):
+    """Return the text of a synthetic namelist.
+
+    The namelist variables are of various kinds (integers, reals, logicals,
+    strings, arrays, derived types and macros): the kind of the **i**-th
+    variable of a block is picked in a round robin fashion amongst the
+    available kinds. Variables of the same name (with possibly different
+    values, depending on **seed**) are generated in every block.
+
+    :param int nblocks: The number of (non-empty) namelist blocks
+    :param int nkeys: The number of variables in each of the blocks
+    :param int array_length: The number of elements of array variables (if 0,
+                             no array is generated)
+    :param int nattributes: The number of attributes of derived type variables
+                            (if 0, no derived type is generated)
+    :param int nmacros: The number of distinct macros (if 0, no macro is
+                        generated)
+    :param int nempty: The number of additional empty blocks
+    :param int seed: The seed of the random values generator
+    """
+    rng = random.Random(seed)
+    kinds = _key_kinds(array_length, nattributes, nmacros)
+    lines = list()
+    for i_b in range(nblocks + nempty):
+        lines.append(' &{:s}'.format(block_name(i_b)))
+        for i_k in range(nkeys if i_b < nblocks else 0):
+            key = key_name(i_k)
+            kind = kinds[i_k % len(kinds)]
+            if kind == 'array':
+                lines.extend(['   {:s}({:d})={:s},'.format(key, i_a + 1, _scalar('integer', rng))
+                              for i_a in range(array_length)])
+            elif kind == 'dtype':
+                lines.extend(['   {:s}%ATTR{:d}={:s},'.format(key, i_a, _scalar('real', rng))
+                              for i_a in range(nattributes)])
+            elif kind == 'macro':
+                lines.append('   {:s}=MACRO{:d},'.format(key, rng.randrange(nmacros)))
+            else:
+                lines.append('   {:s}={:s},'.format(key, _scalar(kind, rng)))
+        lines.append(' /')
+    return '\n'.join(lines) + '\n'
+
+
+def generate_macros(nmacros, seed=0):
+    """Return values for the macros used by :func:`generate_namelist`."""
+    rng = random.Random(seed)
+    return {'MACRO{:d}'.format(i): rng.randint(1, 1000) for i in range(nmacros)}
+
+
+def shape_for(total_keys, nkeys=100):
+    """Return the number of blocks and keys per block that give about **total_keys** keys."""
+    nkeys = min(nkeys, total_keys)
+    return max(1, total_keys // nkeys), nkeys
@@ -9,7 +9,11 @@ entry points to this package are the ``tnt.py``, ``tntdiff.py`` and
 ``tntstack.py`` command line utilities provided in the ``tools`` subdirectory
 (or in your ``$PATH`` when ``pip`` is used).
 These command line utility are provided with an embedded documentation accessible
-with the `-h` option (e.g. ``tnt.py -h``).
+with the `-h` option (e.g. ``tnt.py -h``). The ``tnt`` command gives access to
+all of them through subcommands (e.g. ``tnt diff -h`` is equivalent to
+``tntdiff.py -h``). Shell workflows that call these utilities many times in a
+row may use the ``tntclient.py`` utility together with a TNT daemon (see
+``tntdaemon.py -h``).
 
 The ``tnt.py`` and ``tntstack.py`` command line utilities heavily rely on
 directive files. A template of such directive files can be generated using the
@@ -17,10 +21,22 @@ directive files. A template of such directive files can be generated using the
 files are thoroughly documented and should be regarded as documentation.
 """
 
-from . import config
-from . import namadapter
-from . import util
+import importlib
 
-assert config
-assert namadapter
-assert util
+#: The package's submodules. They are imported on first access (e.g.
+#: ``thenamelisttool.util``), which keeps the start-up of the command line
+#: utilities fast.
+_SUBMODULES = ('config', 'daemon', 'daemonclient', 'incremental', 'instrumentation', 'namadapter', 'nativeparser',
+               'outputs', 'parsecache', 'profiling', 'util', 'workers')
+
+__all__ = list(_SUBMODULES)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES))
@@ -4,16 +4,18 @@ directives.
 """
 
 import collections
+import hashlib
 import io
 import os
-import pprint
 import re
 import string
 import sys
 
 from bronx.fancies import loggers
 from bronx.syntax.decorators import secure_getattr
-from .namadapter import BronxNamelistAdapter
+from . import profiling
+from .namadapter import AbstractNamelistAdapter, LazyNamelistAdapter, namelist_adapter
+from .namadapter import NO_SORTING, FIRST_ORDER_SORTING, SECOND_ORDER_SORTING
 
 tntlog = loggers.getLogger('tntlog')
 
@@ -160,12 +162,98 @@ class TntDirective:
 
     def __init__(self, **kwargs):
         self._internals = dict()
+        self._parsed_namdelta = None
+        self._namdelta_error = None
+        self._plans = dict()
         # Is the directive allowed ?
         for k, v in kwargs.items():
             if k not in self._ALLOWED_DIRECTIVES:
                 raise TntDirectiveUnkownError(k)
             self._internals[k] = getattr(self, '_process_{:s}'.format(k))(v)
 
+    def _get_parsed_namdelta(self):
+        """Parse the namdelta (only once) and return the resulting namelist object."""
+        if self._namdelta_error is not None:
+            raise self._namdelta_error
+        if self._parsed_namdelta is None and self.namdelta is not None:
+            try:
+                self._parsed_namdelta = namelist_adapter(self.namdelta, macros=self.macros)
+            except ValueError as e:
+                tntlog.error("Error while parsing the following namelist's delta:\n%s",
+                             self.namdelta)
+                self._namdelta_error = e
+                raise
+        return self._parsed_namdelta
+
+    def validate(self):
+        """Check the parts of the directive that are not checked at creation time.
+
+        For now, it consists in parsing the namdelta (if any). Any error is
+        logged and raised (only once).
+        """
+        self._get_parsed_namdelta()
+
+    def namdelta_namelist(self):
+        """
+        Return a copy of the parsed namdelta (the parsing is done only once) or
+        ``None`` if there is no namdelta.
+
+        :rtype: thenamelisttool.namadapter.AbstractNamelistAdapter
+        """
+        parsed = self._get_parsed_namdelta()
+        return None if parsed is None else parsed.copy()
+
+    def _compile_steps(self, doctor, keep_index):
+        """Generate the steps of the plan (in the appropriate order !)."""
+        if self.new_blocks is not None:
+            yield TntPlanStep('add_blocks', tuple(sorted(self.new_blocks)), ())
+        if self.blocks_to_move is not None:
+            targets = list(self.blocks_to_move.values())
+            if len(set(targets)) != len(targets):
+                raise TntDirectiveValueError('blocks_to_move', self.blocks_to_move)
+            yield TntPlanStep('move_blocks', tuple(self.blocks_to_move.items()), ())
+        if self.keys_to_move is not None:
+            targets = list(self.keys_to_move.values())
+            if len(set(targets)) != len(targets):
+                raise TntDirectiveValueError('keys_to_move', self.keys_to_move)
+            yield TntPlanStep('move_keys', tuple(self.keys_to_move.items()),
+                              (('doctor', doctor), ('keep_index', keep_index)))
+        if self.keys_to_remove is not None:
+            yield TntPlanStep('remove_keys', tuple(sorted(self.keys_to_remove)), ())
+        if self.keys_to_set is not None:
+            keys_to_set = self.keys_to_set.items()
+            if doctor:
+                keys_to_set = [((b, k), ([AbstractNamelistAdapter._DOCTOR_convert(k, v) for v in value]
+                                         if isinstance(value, list)
+                                         else AbstractNamelistAdapter._DOCTOR_convert(k, value)))
+                               for (b, k), value in keys_to_set]
+            yield TntPlanStep('add_keys', tuple(keys_to_set), ())
+        if self.blocks_to_remove is not None:
+            yield TntPlanStep('remove_blocks', tuple(sorted(self.blocks_to_remove)), ())
+        if self.namdelta is not None:
+            yield TntPlanStep('merge', self._get_parsed_namdelta(), ())
+
+    def compile(self, doctor=False, keep_index=False):
+        """
+        Check the directive and translate it into a :class:`TntDirectivePlan`
+        object that can be applied to any number of namelists.
+
+        The plan is computed only once (for a given set of options).
+
+        :param bool doctor: if True, try to convert values to DOCTOR norm
+                            according type for moved keys and keys to set
+                            (for the latter, conversions are done once and
+                            for all when the plan is compiled).
+        :param bool keep_index: if True, moved keys in identical block keep
+                                the original index of key in block.
+        :rtype: TntDirectivePlan
+        """
+        plan_id = (bool(doctor), bool(keep_index))
+        if plan_id not in self._plans:
+            self._plans[plan_id] = TntDirectivePlan(self._compile_steps(*plan_id),
+                                                    macros=self.macros)
+        return self._plans[plan_id]
+
     @secure_getattr
     def __getattr__(self, item):
         if item not in self._ALLOWED_DIRECTIVES:
@@ -174,16 +262,167 @@ class TntDirective:
             return self._internals.get(item, None)
 
 
+class TntPlanStep(collections.namedtuple('TntPlanStep', ('operation', 'argument', 'options'))):
+    """
+    One step of a :class:`TntDirectivePlan`: the *operation* is the name of the
+    :class:`~thenamelisttool.namadapter.AbstractNamelistAdapter` method to call,
+    *argument* its (frozen) argument and *options* a tuple of (name, value)
+    pairs for its keyword arguments.
+    """
+
+    #: These operations expect a dictionary (frozen as a tuple of items)
+    _MAPPING_OPERATIONS = frozenset(['move_blocks', 'move_keys', 'add_keys'])
+
+    def apply(self, namelist):
+        """Apply this step to a **namelist** object."""
+        if self.operation in self._MAPPING_OPERATIONS:
+            argument = dict(self.argument)
+        elif self.operation == 'merge':
+            argument = self.argument.copy()
+        elif self.operation == 'merge_all':
+            argument = [delta.copy() for delta in self.argument]
+        else:
+            argument = self.argument
+        getattr(namelist, self.operation)(argument, **dict(self.options))
+
+    def describe(self):
+        """A human-readable description of this step."""
+        if self.operation == 'merge':
+            argument = ', '.join(sorted(self.argument.keys()))
+        elif self.operation == 'merge_all':
+            argument = ' | '.join([', '.join(sorted(delta.keys())) for delta in self.argument])
+        elif self.operation in self._MAPPING_OPERATIONS:
+            argument = ', '.join(['{!s} -> {!s}'.format(*item) for item in self.argument])
+        else:
+            argument = ', '.join([str(item) for item in self.argument])
+        options = ''.join([' [{:s}={!s}]'.format(*opt) for opt in self.options])
+        return '{:s}{:s}: {:s}'.format(self.operation, options, argument)
+
+
+class TntDirectivePlan:
+    """An immutable and ordered list of operations generated from TNT directives.
+
+    Plans are generated by the :meth:`TntDirective.compile` method. They can be
+    chained (see :meth:`chain`) and applied to any namelist object (see :meth:`apply`).
+
+    :param steps: An iterable of :class:`TntPlanStep` objects
+    :param dict macros: The macros associated with the directive
+    """
+
+    def __init__(self, steps, macros=None):
+        self._steps = tuple(steps)
+        self._macros = tuple(macros.items()) if macros else None
+
+    @classmethod
+    def chain(cls, plans):
+        """Concatenate several plans (the macros are taken from the first plan).
+
+        Consecutive ``merge`` steps are coalesced into a single ``merge_all``
+        step (see :meth:`~thenamelisttool.namadapter.AbstractNamelistAdapter.merge_all`).
+        """
+        plans = list(plans)
+        if len(plans) == 1:
+            return plans[0]
+        steps = list()
+        for step in [step for plan in plans for step in plan.steps]:
+            if step.operation == 'merge' and steps and steps[-1].operation in ('merge', 'merge_all'):
+                deltas = steps[-1].argument if steps[-1].operation == 'merge_all' else (steps[-1].argument, )
+                steps[-1] = TntPlanStep('merge_all', deltas + (step.argument, ), ())
+            else:
+                steps.append(step)
+        return cls(steps, macros=plans[0].macros if plans else None)
+
+    @property
+    def steps(self):
+        """The tuple of :class:`TntPlanStep` objects."""
+        return self._steps
+
+    @property
+    def macros(self):
+        """The macros associated with the directive (or ``None``)."""
+        return None if self._macros is None else dict(self._macros)
+
+    def __iter__(self):
+        return iter(self._steps)
+
+    def __len__(self):
+        return len(self._steps)
+
+    def apply(self, namelist):
+        """Apply all the steps, in a row, to a **namelist** object.
+
+        :param thenamelisttool.namadapter.AbstractNamelistAdapter namelist: The
+            namelist object to update (in place).
+        """
+        for step in self._steps:
+            step.apply(namelist)
+
+    def describe(self):
+        """A human-readable description of the plan."""
+        return '\n'.join(['{:d}. {:s}'.format(i + 1, step.describe())
+                          for i, step in enumerate(self._steps)])
+
+    def fingerprint(self):
+        """A hash of the plan's content (identical plans have the same fingerprint)."""
+        h = hashlib.sha256(repr(self._macros).encode('utf-8'))
+        for step in self._steps:
+            # NB: Coalesced merges have the same fingerprint as the original merges
+            if step.operation == 'merge_all':
+                for delta in step.argument:
+                    h.update(repr(('merge', delta.dumps(), step.options)).encode('utf-8'))
+                continue
+            argument = step.argument.dumps() if step.operation == 'merge' else step.argument
+            h.update(repr((step.operation, argument, step.options)).encode('utf-8'))
+        return h.hexdigest()
+
+
+def yaml_load(stream):
+    """Load a YAML document (**stream** may be a string or a file object).
+
+    The libyaml based safe loader is used if it is available (it is much faster
+    than the pure Python one).
+    """
+    import yaml
+    return yaml.load(stream, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+
+def load_yaml_file(filename):
+    """Load the **filename** YAML file (see :func:`yaml_load`)."""
+    with profiling.phase(profiling.PHASE_YAML, filename), open(filename, 'rb') as yamlfh:
+        return yaml_load(yamlfh)
+
+
+#: The maximum number of directives kept in memory by :func:`read_directives`
+DIRECTIVES_CACHE_SIZE = 64
+
+#: The directives read so far: real path -> (content digest, TntDirective object)
+_DIRECTIVES_CACHE = collections.OrderedDict()
+
+
+def clear_directives_cache():
+    """Forget about the directives read so far by :func:`read_directives`."""
+    _DIRECTIVES_CACHE.clear()
+
+
 def read_directives(filename):
     """
     Read TNT directives in an external file (**filename**).
 
     For a template of directives, call function *write_directives_template()*.
+
+    The directives are memoized: as long as the file's content does not change,
+    reading it again returns the same :class:`TntDirective` object (together
+    with the plans already compiled from it).
     """
+    realpath = os.path.realpath(filename)
+    with open(filename, 'rb') as fhdir:
+        digest = hashlib.sha1(fhdir.read()).hexdigest()
+    cached = _DIRECTIVES_CACHE.get(realpath, None)
+    if cached is not None and cached[0] == digest:
+        _DIRECTIVES_CACHE.move_to_end(realpath)
+        return cached[1]
     if os.path.splitext(filename)[1] in ('.yaml', '.yml'):
-        import yaml
-        with open(filename) as yamlfh:
-            return TntDirective(**yaml.load(yamlfh, Loader=yaml.SafeLoader))
+        directive = TntDirective(**load_yaml_file(filename))
     else:
         prev_bytecode_flag = sys.dont_write_bytecode
         try:
@@ -201,7 +440,158 @@ def read_directives(filename):
                 m = imp.load_source(filename, os.path.abspath(filename))
         finally:
             sys.dont_write_bytecode = prev_bytecode_flag
-        return TntDirective(**{k: v for k, v in m.__dict__.items() if not k.startswith('_')})
+        directive = TntDirective(**{k: v for k, v in m.__dict__.items() if not k.startswith('_')})
+    directive.validate()
+    _DIRECTIVES_CACHE[realpath] = (digest, directive)
+    while len(_DIRECTIVES_CACHE) > DIRECTIVES_CACHE_SIZE:
+        _DIRECTIVES_CACHE.popitem(last=False)
+    return directive
+
+
+# TNT manifest part
+#
+
+class TntManifestError(ValueError):
+    """Raised when an error is detected in a manifest file."""
+    pass
+
+
+class TntManifestJob(collections.namedtuple('TntManifestJob',
+                                            ('namelist', 'directives', 'namdelta', 'outfilename', 'in_place',
+                                             'sorting', 'doctor', 'keep_index', 'blocks_ref', 'squeeze'))):
+    """
+    One job of a manifest: the *namelist* file is updated using the
+    *directives* file, the *namdelta* file or (if both are ``None``) an empty
+    directive. The other fields are the options of
+    :func:`thenamelisttool.util.process_namelist`.
+    """
+
+    @property
+    def target(self):
+        """The file the updated namelist is written to."""
+        if self.in_place:
+            return self.namelist
+        return self.outfilename or self.namelist + '.tnt'
+
+    @property
+    def source(self):
+        """The kind and path of the directive file (the key used to share it between jobs)."""
+        if self.directives is not None:
+            return ('directives', os.path.realpath(self.directives))
+        if self.namdelta is not None:
+            return ('namdelta', os.path.realpath(self.namdelta))
+        return ('void', None)
+
+
+#: The jobs' default values (the command line options may supersede them)
+MANIFEST_DEFAULTS = dict(directives=None, namdelta=None, outfilename=None, in_place=False,
+                         sorting=NO_SORTING, doctor=False, keep_index=False, blocks_ref=None,
+                         squeeze=False)
+
+#: The sorting options that may be requested in a manifest
+MANIFEST_SORTINGS = dict(none=NO_SORTING, first=FIRST_ORDER_SORTING, second=SECOND_ORDER_SORTING)
+
+#: The manifest's keys that are not named after a :class:`TntManifestJob` field
+_MANIFEST_KEYS_MAP = dict(output='outfilename')
+
+_MANIFEST_PATHS = ('namelist', 'directives', 'namdelta', 'outfilename', 'blocks_ref')
+_MANIFEST_FLAGS = ('in_place', 'doctor', 'keep_index', 'squeeze')
+
+
+def _manifest_entries(filename):
+    """Read the raw content of a manifest: a list of dictionaries and the defaults."""
+    if os.path.splitext(filename)[1] in ('.jsonl', '.ndjson'):
+        import json
+        entries = list()
+        with open(filename) as fhjson:
+            for i, line in enumerate(fhjson):
+                if line.strip() and not line.lstrip().startswith('#'):
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError as e:
+                        raise TntManifestError('{:s}, line {:d}: {!s}'.format(filename, i + 1, e))
+        return entries, dict()
+    content = load_yaml_file(filename)
+    if isinstance(content, dict):
+        extra = set(content.keys()) - {'defaults', 'jobs'}
+        if extra:
+            raise TntManifestError('{:s}: unexpected top-level entries: {:s}'
+                                   .format(filename, ', '.join(sorted(extra))))
+        if not isinstance(content.get('defaults', None) or dict(), dict):
+            raise TntManifestError('{:s}: "defaults" must be a dictionary'.format(filename))
+        return content.get('jobs', None) or list(), content.get('defaults', None) or dict()
+    return content or list(), dict()
+
+
+def _manifest_job(entry, defaults, basedir):
+    """Check a manifest's **entry** and translate it into a :class:`TntManifestJob` object."""
+    if not isinstance(entry, dict):
+        raise TntManifestError('a job must be described by a dictionary (got: {!r})'.format(entry))
+    desc = dict(defaults)
+    for k, v in entry.items():
+        k = _MANIFEST_KEYS_MAP.get(k, k)
+        if k not in TntManifestJob._fields:
+            raise TntManifestError('unknown job option: {!s}'.format(k))
+        desc[k] = v
+    if not desc.get('namelist', None):
+        raise TntManifestError('the namelist file is missing (job: {!r})'.format(entry))
+    if desc['directives'] is not None and desc['namdelta'] is not None:
+        raise TntManifestError('"directives" and "namdelta" are mutually exclusive (job: {!r})'.format(entry))
+    if desc['in_place'] and desc['outfilename'] is not None:
+        raise TntManifestError('"in_place" and "output" are mutually exclusive (job: {!r})'.format(entry))
+    if isinstance(desc['sorting'], str):
+        if desc['sorting'] not in MANIFEST_SORTINGS:
+            raise TntManifestError('invalid sorting {!r} (choose from: {:s})'
+                                   .format(desc['sorting'], ', '.join(MANIFEST_SORTINGS)))
+        desc['sorting'] = MANIFEST_SORTINGS[desc['sorting']]
+    for k in _MANIFEST_FLAGS:
+        if not isinstance(desc[k], bool):
+            raise TntManifestError('"{:s}" must be a boolean (job: {!r})'.format(k, entry))
+    for k in _MANIFEST_PATHS:
+        if desc[k] is not None:
+            desc[k] = os.path.normpath(os.path.join(basedir, str(desc[k])))
+    return TntManifestJob(**desc)
+
+
+def read_manifest(filename, **defaults):
+    """
+    Read the list of jobs described in the **filename** manifest.
+
+    A manifest is either a YAML file or a JSON lines file (``.jsonl`` or
+    ``.ndjson`` extensions). Each job is described by a dictionary whose
+    entries are: ``namelist`` (mandatory), ``directives`` or ``namdelta``,
+    ``output`` or ``in_place``, ``sorting`` (``none``, ``first`` or
+    ``second``), ``doctor``, ``keep_index``, ``blocks_ref`` and ``squeeze``.
+    A YAML manifest is either a list of jobs or a dictionary with a ``jobs``
+    list and some ``defaults`` (that apply to every job). Relative paths are
+    relative to the manifest's directory.
+
+    :param defaults: Default values for the :class:`TntManifestJob` fields
+                     (they are superseded by the manifest's defaults). Relative
+                     paths are relative to the current directory.
+    :rtype: list[TntManifestJob]
+    """
+    entries, m_defaults = _manifest_entries(filename)
+    if not isinstance(entries, list):
+        raise TntManifestError('{:s}: a list of jobs is expected'.format(filename))
+    basedir = os.path.dirname(filename)
+    job_defaults = dict(MANIFEST_DEFAULTS)
+    job_defaults.update(defaults)
+    for k in _MANIFEST_PATHS:
+        if defaults.get(k, None) is not None:
+            job_defaults[k] = os.path.abspath(str(defaults[k]))
+    m_defaults = {_MANIFEST_KEYS_MAP.get(k, k): v for k, v in m_defaults.items()}
+    unknown = set(m_defaults) - set(TntManifestJob._fields)
+    if unknown:
+        raise TntManifestError('{:s}: unknown default option(s): {:s}'.format(filename, ', '.join(sorted(unknown))))
+    job_defaults.update(m_defaults)
+    jobs = list()
+    for i, entry in enumerate(entries):
+        try:
+            jobs.append(_manifest_job(entry, job_defaults, basedir))
+        except TntManifestError as e:
+            raise TntManifestError('{:s}, job #{:d}: {!s}'.format(filename, i + 1, e))
+    return jobs
 
 
 # TNTstack directives part
@@ -235,6 +625,7 @@ class TntStackDirective:
                 newdir = read_directives(os.path.join(self._basedir, v['external']))
             else:
                 newdir = TntDirective(**v)
+                newdir.validate()
             self._directives[k] = newdir
 
     def _checkdict(self, action, values, attr, str_or_list=False):
@@ -323,12 +714,52 @@ class TntStackDirective:
         """The todo's list (as a list of dictionaries)."""
         return self._todolist
 
+    def plan(self, names):
+        """Return the :class:`TntDirectivePlan` object that results from chaining **names** directives.
+
+        :param list[str] names: The names of the directives to apply (in order)
+        """
+        return TntDirectivePlan.chain([self.directives[name].compile() for name in names])
+
 
 class TntRecipeSyntaxError(ValueError):
     """Raised when a syntax error is detected in the recipe file."""
     pass
 
 
+class TntRecipeSources:
+    """
+    The source namelists of one or several recipes.
+
+    Each distinct source namelist (for a given set of macros) is read once:
+    the recipes' ingredients are copies of it that share the parsed blocks
+    (see :meth:`LazyNamelistAdapter.copy`).
+    """
+
+    def __init__(self):
+        self._sources = dict()
+
+    def __len__(self):
+        return len(self._sources)
+
+    def get(self, filename, macros=None):
+        """Return an independent copy of the **filename** source namelist."""
+        key = (os.path.realpath(filename), repr(sorted((macros or dict()).items())))
+        if key not in self._sources:
+            self._sources[key] = LazyNamelistAdapter(filename, macros=macros)
+        return self._sources[key].copy()
+
+    def preload(self, recipe_filename, sourcenam_directory=None):
+        """Read the source namelists used by the **recipe_filename** recipe."""
+        TntRecipe(recipe_filename, sourcenam_directory=sourcenam_directory, sources=self)
+
+    def load(self):
+        """Parse every block of the source namelists read so far."""
+        for (filename, _), source in self._sources.items():
+            with profiling.phase(profiling.PHASE_PARSE, filename):
+                source.load()
+
+
 class TntRecipe:
     """
     A YAML Recipe reader, that collects namelists and possibly filter them,
@@ -338,17 +769,21 @@ class TntRecipe:
     _ingredient_name_re = re.compile(r'(?P<nam>.+?)(?:/(?P<filter>(?:-|\+)))?$')
     _ingredient_item_re = re.compile(r'(?P<block>[^/]+)/(?P<filter>(?:-|\+))$')
 
-    def __init__(self, recipe_filename, sourcenam_directory=None):
+    def __init__(self, recipe_filename, sourcenam_directory=None, sources=None):
         """
         :param recipe_filename: filepath to the YAML recipe
         :param sourcenam_directory: an optional external directory in which to
             pick the ingredient namelists
+        :param TntRecipeSources sources: the source namelists that may be
+            shared with other recipes (if omitted, a new object is created)
         """
         self.sourcenam_directory = sourcenam_directory
+        self._sources = TntRecipeSources() if sources is None else sources
         self._load_recipe(recipe_filename)
 
     def _throw_syntax_err(self, entry, wholeentry, msg):
         """Deal with a syntax error."""
+        import pprint
         tntlog.critical("Syntax error in the '%s' entry: %s.", entry, msg)
         if wholeentry is not None:
             tntlog.critical("The '%s' entry content is:\n%s.", entry,
@@ -356,6 +791,10 @@ class TntRecipe:
         raise TntRecipeSyntaxError('Syntax error in the {:s} entry of the Recipe file.'
                                    .format(entry))
 
+    def _source_namelist(self, filename):
+        """Return an independent copy of the **filename** namelist."""
+        return self._sources.get(filename, macros=self.macros)
+
     def _read_init_final_elements(self, what, ingredient):
         """Read '__initial__' or '__final__' step **ingredient**."""
         if ingredient is not None:
@@ -363,10 +802,10 @@ class TntRecipe:
                 # external namelist
                 if self.sourcenam_directory:
                     ingredient = os.path.join(self.sourcenam_directory, ingredient)
-                nam = BronxNamelistAdapter(ingredient, macros=self.macros)
+                nam = self._source_namelist(ingredient)
             elif isinstance(ingredient, dict):
                 # internal dict/yaml namelist
-                nam = BronxNamelistAdapter(io.StringIO(), macros=self.macros)
+                nam = LazyNamelistAdapter(io.StringIO(), macros=self.macros)
                 nam.add_blocks(list(ingredient.keys()))
                 keys_to_add = {}
                 for b, kv in ingredient.items():
@@ -383,7 +822,7 @@ class TntRecipe:
                 self._throw_syntax_err(what, ingredient,
                                        "Should be 'null', a string or a dictionary")
         else:
-            nam = BronxNamelistAdapter(io.StringIO(), macros=self.macros)
+            nam = LazyNamelistAdapter(io.StringIO(), macros=self.macros)
         return nam
 
     def _process_ingredient(self, input_nam, blocks):
@@ -397,8 +836,8 @@ class TntRecipe:
         if self.sourcenam_directory:
             input_nam_filename = os.path.join(self.sourcenam_directory,
                                               input_nam_filename)
-        ingredient = BronxNamelistAdapter(input_nam_filename,
-                                          macros=self.macros)
+        # NB: The blocks content is only parsed if the block is actually used
+        ingredient = self._source_namelist(input_nam_filename)
         # prepare filtering elements
         blocks_filter = collections.defaultdict(list)
         keys_filter = collections.defaultdict(dict)
@@ -444,7 +883,8 @@ class TntRecipe:
         """Read YAML file and preprocess ingredients."""
         from bronx.datagrip.misc import load_ordered_yaml
         # load yaml
-        recipe = load_ordered_yaml(recipe_filename)
+        with profiling.phase(profiling.PHASE_YAML, recipe_filename):
+            recipe = load_ordered_yaml(recipe_filename)
         if not isinstance(recipe, collections.OrderedDict):
             raise TntRecipeSyntaxError('The recipe must be a dictionary.')
         # specific cases: initialization, finalization, macros
@@ -0,0 +1,232 @@
+"""
+A persistent server that runs the TNT command line utilities on behalf of the
+thin ``tntclient.py`` utility.
+
+Starting a Python interpreter, importing the package and parsing the same
+reference namelists over and over again dominates the run time of shell
+workflows that call ``tnt.py`` in loops. The daemon listens on a Unix domain
+socket (see :mod:`thenamelisttool.daemonclient` for the protocol) and hands
+the requests over to a pool of worker processes that stay alive between
+requests. The worker processes:
+
+* import the command line utilities once and for all;
+* keep the parsed namelists in an in-memory parse cache (see
+  :class:`thenamelisttool.parsecache.MemoryParseCache`), unless a persistent
+  parse cache is configured;
+* run each request in the client's working directory, with the client's
+  umask, and capture its standard output, standard error and log messages.
+  The working directory, the environment and the logging configuration are
+  restored afterwards.
+
+Requests are refused if the ``TNT_*`` environment variables of the client
+differ from the daemon's ones: the client then runs the utility by itself.
+
+The daemon exits when it has been idle for a given amount of time.
+"""
+
+import importlib
+import io
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from bronx.fancies import loggers
+
+from . import daemonclient, parsecache
+from .daemonclient import TOOLS, recv_message, send_message
+
+tntlog = loggers.getLogger('tntlog')
+
+#: The default idle time (in seconds) after which the daemon exits
+DEFAULT_IDLE_TIMEOUT = 3600
+
+
+def _exit_status(code, stderr):
+    """Translate the **code** of a :class:`SystemExit` exception into an exit status."""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    stderr.write('{!s}\n'.format(code))
+    return 1
+
+
+def _init_worker():
+    """Warm a worker process up."""
+    for module in TOOLS.values():
+        importlib.import_module(module)
+    if parsecache.get_default_cache() is None:
+        parsecache.set_default_cache(parsecache.MemoryParseCache())
+
+
+def run_request(tool, argv, cwd, umask):
+    """Run the **tool** utility (in a worker process) and capture its outputs.
+
+    :return: A dictionary with the exit *status*, *stdout* and *stderr*
+    """
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    saved_cwd = os.getcwd()
+    saved_env = dict(os.environ)
+    saved_argv = sys.argv
+    saved_streams = (sys.stdout, sys.stderr)
+    saved_console = loggers.default_console.setStream(stderr)
+    saved_umask = os.umask(umask)
+    sys.stdout, sys.stderr = stdout, stderr
+    status = 0
+    try:
+        os.chdir(cwd)
+        module = importlib.import_module(TOOLS[tool])
+        sys.argv = ['{:s}.py'.format(tool)] + list(argv)
+        module.main()
+    except SystemExit as e:
+        status = _exit_status(e.code, stderr)
+    except Exception:
+        # Skip the present function in the traceback
+        e_type, e_value, e_tb = sys.exc_info()
+        traceback.print_exception(e_type, e_value, e_tb.tb_next, file=stderr)
+        status = 1
+    finally:
+        sys.stdout, sys.stderr = saved_streams
+        sys.argv = saved_argv
+        loggers.default_console.setStream(saved_console)
+        os.umask(saved_umask)
+        os.environ.clear()
+        os.environ.update(saved_env)
+        os.chdir(saved_cwd)
+    return dict(status=status, stdout=stdout.getvalue(), stderr=stderr.getvalue())
+
+
+class TntDaemon:
+    """Serve the requests of the ``tntclient.py`` utility.
+
+    :param str socket_path: The path to the Unix domain socket
+    :param int jobs: The number of worker processes (i.e. the number of
+                     requests that may be processed concurrently)
+    :param float idle_timeout: Exit after that many seconds without any
+                               request (if ``None`` or 0, never exit)
+    """
+
+    def __init__(self, socket_path=None, jobs=1, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.socket_path = socket_path or daemonclient.default_socket_path()
+        self.jobs = max(1, jobs)
+        self.idle_timeout = idle_timeout
+        self._env = daemonclient.client_environment()
+        self._sock = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._threads = list()
+        self._served = 0
+        self._last_activity = time.monotonic()
+        self._stop = threading.Event()
+
+    def bind(self):
+        """Create the listening socket (it is only accessible to the current user)."""
+        if os.path.exists(self.socket_path):
+            try:
+                daemonclient.call(dict(command='ping'), socket_path=self.socket_path)
+            except daemonclient.DaemonUnavailableError:
+                # A leftover from a daemon that did not exit properly
+                os.unlink(self.socket_path)
+            else:
+                raise RuntimeError('A daemon is already listening on: {:s}'.format(self.socket_path))
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            sock.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        sock.listen(max(16, 4 * self.jobs))
+        sock.settimeout(1.)
+        self._sock = sock
+
+    def serve(self):
+        """Process the requests until the daemon is stopped or idle for too long."""
+        import concurrent.futures
+        import multiprocessing
+        if self._sock is None:
+            self.bind()
+        # The connections are handled by threads: the worker processes are
+        # started using "spawn" (forking a multi-threaded process is unsafe)
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.jobs,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+        tntlog.info('TNT daemon listening on %s (pid=%d, %d worker(s)).',
+                    self.socket_path, os.getpid(), self.jobs)
+        try:
+            while not self._stop.is_set():
+                try:
+                    conn, _ = self._sock.accept()
+                except socket.timeout:
+                    if self._idle():
+                        tntlog.info('TNT daemon idle for more than %ds: exiting.', self.idle_timeout)
+                        break
+                    continue
+                conn.settimeout(None)
+                with self._lock:
+                    self._inflight += 1
+                    self._threads = [t for t in self._threads if t.is_alive()]
+                    thread = threading.Thread(target=self._handle, args=(conn, ), daemon=True)
+                    self._threads.append(thread)
+                thread.start()
+        finally:
+            self._sock.close()
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+            # Let the pending requests complete
+            for thread in self._threads:
+                thread.join()
+            self._executor.shutdown(wait=True)
+        tntlog.info('TNT daemon stopped (%d request(s) served).', self._served)
+
+    def stop(self):
+        """Ask the daemon to stop (once the pending requests are processed)."""
+        self._stop.set()
+
+    def _idle(self):
+        with self._lock:
+            return bool(self.idle_timeout and self._inflight == 0 and
+                        time.monotonic() - self._last_activity > self.idle_timeout)
+
+    def _handle(self, conn):
+        try:
+            with conn:
+                try:
+                    request = recv_message(conn)
+                    send_message(conn, self._process(request))
+                except (OSError, EOFError, ValueError) as e:
+                    tntlog.warning('Broken request: %s', str(e))
+                except Exception as e:
+                    tntlog.error('Unable to process a request: %s', str(e))
+                    send_message(conn, dict(error='{:s}: {!s}'.format(type(e).__name__, e)))
+        finally:
+            with self._lock:
+                self._inflight -= 1
+                self._last_activity = time.monotonic()
+
+    def _process(self, request):
+        """Return the reply to **request**."""
+        command = request.get('command', None)
+        if command == 'ping':
+            return dict(pid=os.getpid(), jobs=self.jobs, served=self._served,
+                        socket=self.socket_path)
+        if command == 'stop':
+            self.stop()
+            return dict(pid=os.getpid(), served=self._served)
+        if request.get('tool') not in TOOLS:
+            return dict(error='Unknown utility: {!s}'.format(request.get('tool')))
+        if request.get('env', dict()) != self._env:
+            return dict(error='The TNT environment variables of the client differ from the daemon ones.')
+        reply = self._executor.submit(run_request, request['tool'], request['argv'],
+                                      request['cwd'], request['umask']).result()
+        with self._lock:
+            self._served += 1
+        return reply
@@ -0,0 +1,135 @@
+"""
+The client side of the TNT daemon (see :mod:`thenamelisttool.daemon`).
+
+A request is sent to the daemon through a Unix domain socket. It describes
+the command line utility to run, its arguments and the context of the client
+(current working directory, umask and ``TNT_*`` environment variables). The
+daemon replies with the exit status and the standard output/error of the
+utility.
+
+Messages are JSON documents, each preceded by its length (a 4-byte, big
+endian, unsigned integer).
+
+This module only relies on lightweight standard modules: it is imported by
+the thin ``tntclient.py`` utility, whose start-up must be fast.
+"""
+
+import json
+import os
+import socket
+import struct
+import sys
+
+#: Environment variable that holds the path to the daemon's socket
+SOCKET_ENV = 'TNT_DAEMON_SOCKET'
+
+#: The command line utilities that the daemon can run: name -> entry point module
+TOOLS = dict(tnt='thenamelisttool.entrypoints.tnt',
+             tntdiff='thenamelisttool.entrypoints.tntdiff',
+             tntcompose='thenamelisttool.entrypoints.tntcompose')
+
+#: Environment variables that prefix is sent to the daemon (their values
+#: must be the same in the client and in the daemon)
+ENV_PREFIX = 'TNT_'
+
+_HEADER = struct.Struct('>I')
+
+
+class DaemonUnavailableError(Exception):
+    """The daemon is not running or it cannot process the request."""
+    pass
+
+
+def default_socket_path():
+    """The path to the daemon's socket.
+
+    It is given by the ``TNT_DAEMON_SOCKET`` environment variable or, by
+    default, it lies in ``$XDG_RUNTIME_DIR`` (or in the temporary directory).
+    """
+    path = os.environ.get(SOCKET_ENV, None)
+    if not path:
+        import tempfile
+        path = os.path.join(os.environ.get('XDG_RUNTIME_DIR', None) or tempfile.gettempdir(),
+                            'tnt-daemon-{:d}.sock'.format(os.getuid()))
+    return path
+
+
+def send_message(sock, message):
+    """Send **message** (a JSON serialisable object) on **sock**."""
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = list()
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise EOFError('The connection was closed prematurely.')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock):
+    """Receive a message sent by :func:`send_message` on **sock**."""
+    size, = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return json.loads(_recv_exactly(sock, size).decode('utf-8'))
+
+
+def client_environment():
+    """The part of the environment that must match the daemon's one."""
+    return {k: v for k, v in os.environ.items() if k.startswith(ENV_PREFIX) and k != SOCKET_ENV}
+
+
+def _umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def call(message, socket_path=None, connect_timeout=2.):
+    """Send **message** to the daemon and return its reply.
+
+    :raises DaemonUnavailableError: if the daemon cannot be reached
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(connect_timeout)
+        try:
+            sock.connect(socket_path or default_socket_path())
+        except OSError as e:
+            raise DaemonUnavailableError('Unable to connect to the daemon: {!s}'.format(e))
+        sock.settimeout(None)
+        try:
+            send_message(sock, message)
+            return recv_message(sock)
+        except (OSError, EOFError) as e:
+            raise DaemonUnavailableError('The daemon did not reply: {!s}'.format(e))
+    finally:
+        sock.close()
+
+
+def run_tool(tool, argv, socket_path=None):
+    """Run the **tool** utility (with **argv** arguments) in the daemon.
+
+    :return: The exit status, the standard output and the standard error of
+             the utility (as a tuple)
+    :raises DaemonUnavailableError: if the daemon cannot be reached or if it
+                                    cannot process the request (in such a
+                                    case, nothing was done)
+    """
+    reply = call(dict(tool=tool, argv=list(argv), cwd=os.getcwd(), umask=_umask(),
+                      env=client_environment()),
+                 socket_path=socket_path)
+    if reply.get('error'):
+        raise DaemonUnavailableError(reply['error'])
+    return reply['status'], reply['stdout'], reply['stderr']
+
+
+def run_locally(tool, argv):
+    """Run the **tool** utility (with **argv** arguments) in the current process."""
+    import importlib
+    module = importlib.import_module(TOOLS[tool])
+    sys.argv = ['{:s}.py'.format(tool)] + list(argv)
+    module.main()
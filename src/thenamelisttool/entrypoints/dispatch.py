@@ -0,0 +1,60 @@
+"""
+TNT - The Namelist Tool: a single command that gives access to all the TNT
+utilities.
+
+``tnt SUBCOMMAND [ARGS...]`` is equivalent to the corresponding utility called
+with the same arguments (e.g. ``tnt diff -b nam1 -a nam2`` is equivalent to
+``tntdiff.py -b nam1 -a nam2``). Use ``tnt SUBCOMMAND -h`` to get help on a
+given subcommand.
+"""
+
+import importlib
+import os
+import sys
+
+#: The available subcommands: name -> (entry point module, description)
+SUBCOMMANDS = dict(
+    update=('tnt', 'update namelists according to a set of directives (tnt.py)'),
+    stack=('tntstack', "update a namelist's pack according to a todolist (tntstack.py)"),
+    compose=('tntcompose', 'compose namelists merging parts of others (tntcompose.py)'),
+    diff=('tntdiff', 'compare two namelists (tntdiff.py)'),
+    diffpack=('tntdiffpack', 'compare two namelist packs (tntdiffpack.py)'),
+    daemon=('tntdaemon', 'start or control the TNT daemon (tntdaemon.py)'),
+    client=('tntclient', 'run update, diff or compose through the TNT daemon (tntclient.py)'),
+)
+
+
+def _usage(prog):
+    lines = ['usage: {:s} [-h] SUBCOMMAND [ARGS...]'.format(prog),
+             '',
+             __doc__.strip(),
+             '',
+             'subcommands:']
+    lines.extend(['  {:10s} {:s}'.format(name, desc) for name, (_, desc) in SUBCOMMANDS.items()])
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """Run the TNT utility that corresponds to the first argument (the subcommand)."""
+    prog = os.path.basename(sys.argv[0])
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv:
+        print(_usage(prog), file=sys.stderr)
+        sys.exit(2)
+    if argv[0] in ('-h', '--help'):
+        print(_usage(prog))
+        return
+    if argv[0] not in SUBCOMMANDS:
+        print(_usage(prog).split('\n')[0], file=sys.stderr)
+        print('{:s}: error: invalid subcommand {!r} (choose from {:s})'
+              .format(prog, argv[0], ', '.join(SUBCOMMANDS)), file=sys.stderr)
+        sys.exit(2)
+    # Only the modules needed by the selected subcommand are imported
+    module = importlib.import_module('.' + SUBCOMMANDS[argv[0]][0], __package__)
+    # The utilities parse sys.argv (the subcommand is kept in the program name)
+    sys.argv = ['{:s} {:s}'.format(prog, argv[0])] + argv[1:]
+    module.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,42 @@ TNT - The Namelist Tool: a namelist updater.
 """
 
 import argparse
+import json
 import os
+import sys
+import time
 
 import thenamelisttool as tnt
 
 
+def _process_manifest(args, sorting):
+    """Process the jobs listed in a manifest."""
+    if args.namelists or args.outfilename is not None:
+        raise ValueError('Namelists and arg -o should not be given together with a manifest')
+    start = time.perf_counter()
+    manifest_jobs = tnt.config.read_manifest(args.manifest,
+                                             sorting=sorting,
+                                             in_place=args.in_place,
+                                             doctor=args.doctor,
+                                             keep_index=args.keep_index,
+                                             blocks_ref=args.blocks_ref)
+    reports = tnt.util.process_manifest(manifest_jobs, jobs=args.jobs, verbose=args.verbose)
+    tnt.outputs.get_default_sink().flush()
+    if args.summary is not None:
+        summary = tnt.util.manifest_summary(reports, elapsed=time.perf_counter() - start)
+        summary['manifest'] = args.manifest
+        if args.summary == '-':
+            json.dump(summary, sys.stdout, indent=2)
+            sys.stdout.write('\n')
+        else:
+            with open(args.summary, 'w') as fhsummary:
+                json.dump(summary, fhsummary, indent=2)
+    failures = [r.namelist for r in reports if r.error is not None]
+    if failures:
+        sys.exit('{:d} out of {:d} job(s) failed: {:s}'
+                 .format(len(failures), len(reports), ', '.join(failures)))
+
+
 def main():
     """Start the tnt CLI."""
     _tmpl = 'tmpl_directives.tnt'
@@ -39,6 +70,18 @@ def main():
                                   This option is equivalent to. \
                                   "tnt.py -d void.py -S NAMELIST" with an empty void.py directive file.',
                             default=False)
+    directives.add_argument('-m',
+                            dest='manifest',
+                            type=str,
+                            help='a manifest (YAML or JSON lines file) that lists \
+                                  many jobs, each with its own namelist, directives, \
+                                  output and options. The -i, -S, -s, --doctor, \
+                                  --keep_index and -r options provide default values \
+                                  (the defaults and jobs of the manifest supersede them; \
+                                  -r is relative to the current directory whereas \
+                                  the paths of the manifest are relative to its directory). \
+                                  A failure does not abort the run: errors are \
+                                  summarised at the end.')
     directives.add_argument('--squeeze',
                             dest='squeeze',
                             action='store_true',
@@ -71,7 +114,7 @@ def main():
                         action='store_true',
                         dest='doctor',
                         help='try to convert value to DOCTOR norm according \
-                              type for moved keys',
+                              type for moved keys and keys to set',
                         default=False)
     parser.add_argument('--keep_index',
                         action='store_true',
@@ -86,12 +129,37 @@ def main():
                         help='a (possibly empty) reference namelist, to which the \
                               set of blocks is asserted to be equal.',
                         default=None)
+    parser.add_argument('-j',
+                        dest='jobs',
+                        type=int,
+                        help='number of namelists processed concurrently (by a pool \
+                              of worker processes). With this option, a failure \
+                              does not abort the run: errors are summarised \
+                              at the end.',
+                        default=1)
+    parser.add_argument('--sync',
+                        dest='sync',
+                        choices=tnt.outputs.SYNC_MODES,
+                        help='when to call fsync on the output files: never \
+                              (default), after each file or once for all the \
+                              files at the end of the run (batch). In any case, \
+                              files are replaced atomically and files whose \
+                              content did not change are not rewritten.',
+                        default=tnt.outputs.SYNC_NONE)
+    parser.add_argument('--summary',
+                        dest='summary',
+                        type=str,
+                        help='with -m, write the per-job results to this JSON \
+                              file ("-" for the standard output).',
+                        default=None)
     parser.add_argument('-v',
                         action='store_true',
                         dest='verbose',
                         help='verbose mode.',
                         default=False)
+    tnt.profiling.add_arguments(parser)
     args = parser.parse_args()
+    tnt.outputs.set_default_sync(args.sync)
 
     if args.firstorder_sorting or args.check_namelist:
         sorting = tnt.namadapter.FIRST_ORDER_SORTING
@@ -103,28 +171,45 @@ def main():
     if len(args.namelists) > 1 and args.outfilename is not None:
         raise ValueError('Arg -o should not be used applied to several namelists')
 
+    if args.summary is not None and args.manifest is None:
+        raise ValueError('Arg --summary should only be used with a manifest (-m)')
+
     if args.generate_directives_template:
         tnt.config.write_directives_template(_tmpl + '.py', tplname='tnt-directive.tpl.py')
         print("Template of directives written in: " + os.path.abspath(_tmpl + '.py'))
         tnt.config.write_directives_template(_tmpl + '.yaml', tplname='tnt-directive.tpl.yaml')
         print("Template of directives written in: " + os.path.abspath(_tmpl + '.yaml'))
+    elif args.manifest:
+        with tnt.profiling.cli_profiling(args, 'tnt'):
+            _process_manifest(args, sorting)
     else:
-        assert len(args.namelists) > 0, "no namelists provided to process."
-        if args.directives:
-            directives = tnt.config.read_directives(args.directives)
-        else:
-            if args.check_namelist or args.squeeze:
-                directives = tnt.config.TntDirective()
+        with tnt.profiling.cli_profiling(args, 'tnt'):
+            assert len(args.namelists) > 0, "no namelists provided to process."
+            if args.directives:
+                directives = tnt.config.read_directives(args.directives)
+            else:
+                if args.check_namelist or args.squeeze:
+                    directives = tnt.config.TntDirective()
+                else:
+                    with open(args.namdelta) as fhnam:
+                        directives = tnt.config.TntDirective(namdelta=fhnam.read())
+            # Validate the directives and translate them once and for all
+            plan = directives.compile(doctor=args.doctor, keep_index=args.keep_index)
+            options = dict(sorting=sorting,
+                           in_place=args.in_place,
+                           outfilename=args.outfilename,
+                           blocks_ref=args.blocks_ref,
+                           squeeze=args.squeeze)
+            if args.jobs > 1:
+                failures = tnt.util.process_namelists(args.namelists, plan,
+                                                      jobs=args.jobs, verbose=args.verbose,
+                                                      **options)
+                if failures:
+                    sys.exit('{:d} out of {:d} namelist(s) could not be processed: {:s}'
+                             .format(len(failures), len(args.namelists),
+                                     ', '.join([f for f, _ in failures])))
             else:
-                with open(args.namdelta) as fhnam:
-                    directives = tnt.config.TntDirective(namdelta=fhnam.read())
-        for nam in args.namelists:
-            with tnt.util.set_verbose(args.verbose, nam):
-                tnt.util.process_namelist(nam, directives,
-                                          sorting=sorting,
-                                          in_place=args.in_place,
-                                          outfilename=args.outfilename,
-                                          blocks_ref=args.blocks_ref,
-                                          doctor=args.doctor,
-                                          keep_index=args.keep_index,
-                                          squeeze=args.squeeze)
+                for nam in args.namelists:
+                    with tnt.util.set_verbose(args.verbose, nam):
+                        tnt.util.process_namelist(nam, plan, **options)
+            tnt.outputs.get_default_sink().flush()
@@ -0,0 +1,36 @@
+"""
+TNT client - Run tnt.py, tntdiff.py or tntcompose.py through the TNT daemon.
+
+Usage: tntclient.py {tnt,tntdiff,tntcompose} [ARGS...]
+
+The request is forwarded to the TNT daemon (see tntdaemon.py) that listens on
+$TNT_DAEMON_SOCKET (or $XDG_RUNTIME_DIR/tnt-daemon-UID.sock). The exit status
+and the output are the same as the ones of the utility. If the daemon is not
+running (or if it cannot process the request), the utility is run locally.
+"""
+
+import sys
+
+from thenamelisttool import daemonclient
+
+
+def _interactive(tool, argv):
+    """Some options of the utilities cannot be used through the daemon."""
+    return tool == 'tntdiff' and any([a.startswith('-e') for a in argv])
+
+
+def main():
+    """Run the tntclient CLI."""
+    if len(sys.argv) < 2 or sys.argv[1] not in daemonclient.TOOLS:
+        sys.exit(__doc__.strip())
+    tool, argv = sys.argv[1], sys.argv[2:]
+    if not _interactive(tool, argv):
+        try:
+            status, stdout, stderr = daemonclient.run_tool(tool, argv)
+        except daemonclient.DaemonUnavailableError:
+            pass
+        else:
+            sys.stdout.write(stdout)
+            sys.stderr.write(stderr)
+            sys.exit(status)
+    daemonclient.run_locally(tool, argv)
@@ -4,6 +4,7 @@ TNT - The Namelist Tool - Compose: a namelist composer merging parts of others.
 
 import argparse
 import os
+import sys
 
 import thenamelisttool as tnt
 
@@ -53,6 +54,21 @@ def main():
                         dest='verbose',
                         help='verbose mode.',
                         default=False)
+    parser.add_argument('-j',
+                        dest='jobs',
+                        type=int,
+                        help='number of recipes composed concurrently (by a pool \
+                              of worker processes). With this option, a failure \
+                              does not abort the run: errors are summarised \
+                              at the end.',
+                        default=1)
+    parser.add_argument('--timings',
+                        action='store_true',
+                        dest='timings',
+                        help='print the time spent on each of the recipes \
+                              (a failure does not abort the run).',
+                        default=False)
+    tnt.profiling.add_arguments(parser)
     args = parser.parse_args()
 
     if args.generate_recipe_template:
@@ -61,17 +77,35 @@ def main():
         print("Template of directives written in: " +
               os.path.abspath(_tmpl + '.yaml'))
     else:
-        assert len(args.recipes) > 0, "no namelists provided to process."
-        if args.firstorder_sorting:
-            sorting = tnt.namadapter.FIRST_ORDER_SORTING
-        elif args.secondorder_sorting:
-            sorting = tnt.namadapter.SECOND_ORDER_SORTING
-        else:
-            sorting = tnt.namadapter.NO_SORTING
-        for recipe in args.recipes:
-            with tnt.util.set_verbose(args.verbose, recipe):
-                tnt.util.compose_namelist(recipe,
-                                          sourcenam_directory=args.sourcenam_directory,
-                                          suffix=args.suffix,
-                                          sorting=sorting,
-                                          squeeze=args.squeeze)
+        with tnt.profiling.cli_profiling(args, 'tntcompose'):
+            assert len(args.recipes) > 0, "no namelists provided to process."
+            if args.firstorder_sorting:
+                sorting = tnt.namadapter.FIRST_ORDER_SORTING
+            elif args.secondorder_sorting:
+                sorting = tnt.namadapter.SECOND_ORDER_SORTING
+            else:
+                sorting = tnt.namadapter.NO_SORTING
+            options = dict(sourcenam_directory=args.sourcenam_directory,
+                           suffix=args.suffix,
+                           sorting=sorting,
+                           squeeze=args.squeeze)
+            if args.jobs > 1 or args.timings:
+                reports = tnt.util.compose_namelists(args.recipes, jobs=args.jobs,
+                                                     verbose=args.verbose, **options)
+                if args.timings:
+                    width = max([len(r.recipe) for r in reports])
+                    for report in reports:
+                        print('{:{width}s}  {:s}'.format(report.recipe,
+                                                         'FAILED' if report.error else
+                                                         '{:8.3f}s'.format(report.elapsed),
+                                                         width=width))
+                failures = [r.recipe for r in reports if r.error is not None]
+                if failures:
+                    sys.exit('{:d} out of {:d} recipe(s) could not be composed: {:s}'
+                             .format(len(failures), len(args.recipes), ', '.join(failures)))
+            else:
+                # The source namelists are shared by the successive recipes
+                sources = tnt.config.TntRecipeSources()
+                for recipe in args.recipes:
+                    with tnt.util.set_verbose(args.verbose, recipe):
+                        tnt.util.compose_namelist(recipe, sources=sources, **options)
@@ -0,0 +1,91 @@
+"""
+TNT daemon - Run the TNT utilities on behalf of the tntclient.py utility.
+
+The daemon keeps warm Python interpreters (with the TNT package imported and
+the parsed namelists cached in memory). The ``tntclient.py`` utility forwards
+its requests to the daemon, which saves the start-up cost of the ``tnt.py``,
+``tntdiff.py`` and ``tntcompose.py`` utilities.
+"""
+
+import argparse
+import os
+import sys
+
+
+def _start(args):
+    """Start the daemon (possibly in the background)."""
+    import thenamelisttool as tnt
+    daemon = tnt.daemon.TntDaemon(socket_path=args.socket, jobs=args.jobs,
+                                  idle_timeout=args.idle_timeout)
+    try:
+        daemon.bind()
+    except RuntimeError as e:
+        sys.exit(str(e))
+    if args.detach:
+        # The socket is ready: clients may connect as soon as the parent exits
+        if os.fork():
+            print('TNT daemon listening on: {:s}'.format(daemon.socket_path))
+            os._exit(0)
+        os.setsid()
+        with open(os.devnull, 'r+') as devnull:
+            for stream in (sys.stdin, sys.stdout, sys.stderr):
+                os.dup2(devnull.fileno(), stream.fileno())
+    with tnt.util.set_verbose(args.verbose, 'tntdaemon'):
+        daemon.serve()
+
+
+def main():
+    """Run the tntdaemon CLI."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0],
+                                     epilog='End of help for: %(prog)s')
+    parser.add_argument('-s',
+                        dest='socket',
+                        help='the path to the Unix domain socket (default: $TNT_DAEMON_SOCKET or \
+                              $XDG_RUNTIME_DIR/tnt-daemon-UID.sock).',
+                        default=None)
+    parser.add_argument('-j',
+                        dest='jobs',
+                        type=int,
+                        help='number of worker processes (i.e. the number of requests \
+                              that are processed concurrently).',
+                        default=1)
+    parser.add_argument('--idle-timeout',
+                        dest='idle_timeout',
+                        type=float,
+                        help='exit after that many seconds without any request \
+                              (0 means never; default: %(default)s).',
+                        default=3600)
+    parser.add_argument('--detach',
+                        action='store_true',
+                        dest='detach',
+                        help='run in the background (once the socket is ready).',
+                        default=False)
+    parser.add_argument('-v',
+                        action='store_true',
+                        dest='verbose',
+                        help='verbose mode.',
+                        default=False)
+    control = parser.add_mutually_exclusive_group()
+    control.add_argument('--status',
+                         action='store_true',
+                         dest='status',
+                         help='check whether a daemon is running (exit status 1 otherwise).',
+                         default=False)
+    control.add_argument('--stop',
+                         action='store_true',
+                         dest='stop',
+                         help='stop the running daemon.',
+                         default=False)
+    args = parser.parse_args()
+
+    if args.status or args.stop:
+        from thenamelisttool import daemonclient
+        try:
+            reply = daemonclient.call(dict(command='stop' if args.stop else 'ping'),
+                                      socket_path=args.socket)
+        except daemonclient.DaemonUnavailableError as e:
+            sys.exit(str(e))
+        print('TNT daemon (pid={:d}): {:d} request(s) served{:s}.'
+              .format(reply['pid'], reply['served'], ' (stopping)' if args.stop else ''))
+    else:
+        _start(args)
@@ -88,13 +88,20 @@ def actual_main(before_filename, after_filename, outfilename):
     :param outfilename: output file in which to store directives (.py).
                         Or None if not required.
     """
-    # Read namelists
-    before_namelist = tnt.namadapter.BronxNamelistAdapter(before_filename)
-    after_namelist = tnt.namadapter.BronxNamelistAdapter(after_filename)
-
-    blocks_diff = Tracker(before=before_namelist.keys(), after=after_namelist.keys())
-    keys_diff = MappingTracker(before={(b, k): v for b, bl in before_namelist.items() for k, v in bl.items()},
-                               after={(b, k): v for b, bl in after_namelist.items() for k, v in bl.items()},)
+    # Read namelists (blocks are only parsed when needed)
+    with tnt.profiling.phase(tnt.profiling.PHASE_PARSE, before_filename):
+        before_namelist = tnt.namadapter.LazyNamelistAdapter(before_filename)
+    with tnt.profiling.phase(tnt.profiling.PHASE_PARSE, after_filename):
+        after_namelist = tnt.namadapter.LazyNamelistAdapter(after_filename)
+
+    with tnt.profiling.phase(tnt.profiling.PHASE_DIFF, after_filename):
+        blocks_diff = Tracker(before=before_namelist.keys(), after=after_namelist.keys())
+        # Blocks that are textually identical can not contain any difference
+        compared = [b for b in blocks_diff.unchanged
+                    if before_namelist.block_source(b) != after_namelist.block_source(b)]
+        keys_diff = MappingTracker(before={(b, k): v for b in compared for k, v in before_namelist[b].items()},
+                                   after={(b, k): v for b in compared + sorted(blocks_diff.created)
+                                          for k, v in after_namelist[b].items()},)
 
     # Compare:
     # 7. macros
@@ -137,13 +144,14 @@ def actual_main(before_filename, after_filename, outfilename):
 
     # Write to file
     if outfilename is not None:
-        with open(outfilename, 'w', encoding='utf_8') as outfh:
-            outfh.write(outstr)
+        with tnt.profiling.phase(tnt.profiling.PHASE_WRITE, outfilename):
+            with open(outfilename, 'w', encoding='utf_8') as outfh:
+                outfh.write(outstr)
 
 
 def main():
     """Start the tntdiff CLI."""
-    program_desc = '%(prog)s -- ' + __import__('__main__').__doc__.lstrip('\n')
+    program_desc = '%(prog)s -- ' + __doc__.lstrip('\n')
     parser = argparse.ArgumentParser(description=program_desc, epilog='End of help for: %(prog)s',
                                      formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument('-b', '--before',
@@ -173,14 +181,16 @@ def main():
                         choices=('meld', 'vim'),
                         dest='external',
                         help="Use an external tool to compute and display the diff.")
+    tnt.profiling.add_arguments(parser)
     args = parser.parse_args()
-    if args.html:
-        print("HTML diff file written in: " + os.path.abspath(args.outputfilename + '.html'))
-        htmldiff_view(args.before, args.after, args.outputfilename + '.html')
-    elif args.visual or args.visualbw:
-        visualdiff(args.before, args.after, bw=args.visualbw)
-    elif args.external:
-        extdiff(args.before, args.after, args.external)
-    else:
-        print("Diff directives written in: " + os.path.abspath(args.outputfilename + '.py'))
-        actual_main(args.before, args.after, args.outputfilename + '.py')
+    with tnt.profiling.cli_profiling(args, 'tntdiff'):
+        if args.html:
+            print("HTML diff file written in: " + os.path.abspath(args.outputfilename + '.html'))
+            htmldiff_view(args.before, args.after, args.outputfilename + '.html')
+        elif args.visual or args.visualbw:
+            visualdiff(args.before, args.after, bw=args.visualbw)
+        elif args.external:
+            extdiff(args.before, args.after, args.external)
+        else:
+            print("Diff directives written in: " + os.path.abspath(args.outputfilename + '.py'))
+            actual_main(args.before, args.after, args.outputfilename + '.py')
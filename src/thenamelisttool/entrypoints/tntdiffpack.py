@@ -10,6 +10,10 @@ Beware that TNTdiffpack (purposely) DO NOT take into account:
 * Differences in the formatting of namelist values (e.g 1.0 and 1.0000 are
   considered the same)
 
+By default, the differences are reported block by block: added/removed blocks,
+added/removed keys and modified values. With the --ndiff option, a textual
+diff of the namelists is displayed instead.
+
 The displayed namelists DO NOT necessarily correspond to the original files since,
 prior to be displayed, blocks/keys are ordered alphabetically and values are
 formatted in a "standard" way.
@@ -18,6 +22,7 @@ formatted in a "standard" way.
 
 import argparse
 import difflib
+import hashlib
 import os
 import sys
 
@@ -29,18 +34,114 @@ import thenamelisttool as tnt
 _outfilename = 'tntdiffpack.out'
 
 
-def _compute_diffs(nambefore, namafter, modified):
+def _compute_diffs(nambefore, namafter, modified, structures=None):
     diffs = dict()
     for k in modified:
-        txtB = nambefore[k].split('\n')
-        txtA = namafter[k].split('\n')
-        diffs[k] = difflib.ndiff(txtB, txtA)
+        with tnt.profiling.phase(tnt.profiling.PHASE_DIFF, k):
+            if structures is None:
+                txtB = nambefore[k].split('\n')
+                txtA = namafter[k].split('\n')
+                diffs[k] = list(difflib.ndiff(txtB, txtA))
+            else:
+                diffs[k] = tnt.util.structural_diff(structures[0][k], structures[1][k])
     return diffs
 
 
+def _file_digest(filename):
+    """Compute the hash of a file's raw content."""
+    h = hashlib.sha256()
+    with open(filename, 'rb') as fhin:
+        for chunk in iter(lambda: fhin.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _identical_files(before, after, listcommon):
+    """Find the files that are byte-identical in both packs.
+
+    :return: A dictionary that associates the hash of the file's content to
+             the name of each identical file.
+    """
+    identical = dict()
+    for f in listcommon:
+        before_file = os.path.join(before, f)
+        after_file = os.path.join(after, f)
+        if os.path.getsize(before_file) == os.path.getsize(after_file):
+            digest = _file_digest(before_file)
+            if digest == _file_digest(after_file):
+                identical[f] = 'sha256:' + digest
+    return identical
+
+
+def _read_and_sort(namfile, structural=False):
+    """Read and sort a namelist.
+
+    :return: The sorted namelist's text and, if **structural** is True, its
+             structure (``(None, None)`` is returned if it can't be parsed).
+    """
+    try:
+        with tnt.profiling.phase(tnt.profiling.PHASE_PARSE, namfile):
+            namp = tnt.util.namelist_read(namfile)
+    except ValueError:
+        return None, None
+    with tnt.profiling.phase(tnt.profiling.PHASE_DUMPS, namfile):
+        return (namp.dumps(sorting=tnt.namadapter.FIRST_ORDER_SORTING),
+                tnt.util.namelist_structure(namp) if structural else None)
+
+
+def _parse_and_diff_job(before_file, after_file, structural):
+    """Read, sort and compare two versions of a namelist (in a worker process)."""
+    txtB, structB = _read_and_sort(before_file, structural)
+    txtA, structA = _read_and_sort(after_file, structural)
+    diff = None
+    if txtB is not None and txtA is not None and txtB != txtA:
+        with tnt.profiling.phase(tnt.profiling.PHASE_DIFF, after_file):
+            if structural:
+                diff = tnt.util.structural_diff(structB, structA)
+            else:
+                diff = list(difflib.ndiff(txtB.split('\n'), txtA.split('\n')))
+    return txtB, txtA, diff
+
+
+def _parallel_parse_and_diff(before, after, listbefore, listafter, listcommon, identical, jobs, structural):
+    """Parse and compare the namelists of the two packs using a pool of workers."""
+    todo = sorted(listcommon - set(identical))
+    results = dict()
+    sys.stdout.write('Processing files in {:s} and {:s}: '.format(before, after))
+    outcomes = tnt.workers.map_jobs(_parse_and_diff_job,
+                                    [(os.path.join(before, f), os.path.join(after, f), structural)
+                                     for f in todo],
+                                    jobs=jobs)
+    for i, (f, outcome) in enumerate(zip(todo, outcomes)):
+        printstatus(i + 1, len(todo))
+        tnt.workers.replay_records(outcome.records)
+        if outcome.error is not None:
+            raise OSError('{:s}: {:s}'.format(f, outcome.error))
+        results[f] = outcome.value
+    # Fill the dictionaries in the very same order as the sequential code does
+    # (so that the MappingTracker's sets, and therefore the report, are identical)
+    ko = set()
+    nambefore = dict()
+    namafter = dict()
+    for (targetdict, listdir, ridx) in ((nambefore, listbefore, 0),
+                                        (namafter, listafter, 1)):
+        for f in listdir:
+            if f in identical:
+                targetdict[f] = identical[f]
+            elif f in listcommon:
+                if results[f][ridx] is None:
+                    ko.add(f)
+                else:
+                    targetdict[f] = results[f][ridx]
+            else:
+                targetdict[f] = ''
+    computediffs = {f: r[2] for f, r in results.items() if r[2] is not None}
+    return nambefore, namafter, ko, computediffs
+
+
 def main():
     """Run the tntdiffpack CLI."""
-    program_desc = '%(prog)s -- ' + __import__('__main__').__doc__.lstrip('\n')
+    program_desc = '%(prog)s -- ' + __doc__.lstrip('\n')
     parser = argparse.ArgumentParser(description=program_desc, epilog='End of help for: %(prog)s',
                                      formatter_class=argparse.RawDescriptionHelpFormatter)
 
@@ -54,7 +155,26 @@ def main():
                         default=_outfilename,
                         dest='outputfilename',
                         help="output filename (without any extension). Defaults to %(default)s.")
+    parser.add_argument('-j',
+                        dest='jobs',
+                        type=int,
+                        default=1,
+                        help="number of worker processes used to parse and compare namelists.")
+    parser.add_argument('--ndiff',
+                        action='store_true',
+                        dest='ndiff',
+                        help="display a textual diff of the modified namelists (instead of \
+                              the list of added/removed blocks and keys and of modified values). \
+                              It may be very slow on large namelists.")
+    tnt.profiling.add_arguments(parser)
     args = parser.parse_args()
+    with tnt.profiling.cli_profiling(args, 'tntdiffpack'):
+        _diff_packs(args)
+
+
+def _diff_packs(args):
+    """Compare the two namelist packs and write the report."""
+    structural = not args.ndiff
 
     ko = set()
     nambefore = dict()
@@ -64,34 +184,46 @@ def main():
     listafter = [f for f in os.listdir(args.after)
                  if os.path.isfile(os.path.join(args.after, f))]
     listcommon = set(listbefore) & set(listafter)
-
-    for (targetdict, listdir, inputdir) in ((nambefore, listbefore, args.before),
-                                            (namafter, listafter, args.after)):
-        sys.stdout.write('Processing files in {:s}: '.format(inputdir))
-        for i, f in enumerate(listdir):
-            printstatus(i + 1, len(listdir))
-            if f in listcommon:
-                try:
-                    nparsed = tnt.util.namelist_read_and_sort(os.path.join(inputdir, f))
-                except ValueError:
-                    ko.add(f)
+    # Byte-identical files are not parsed
+    identical = _identical_files(args.before, args.after, listcommon)
+    print('{:d} out of {:d} common file(s) are byte-identical (they will not be parsed).'
+          .format(len(identical), len(listcommon)))
+
+    if args.jobs > 1:
+        nambefore, namafter, ko, computediffs = _parallel_parse_and_diff(args.before, args.after,
+                                                                         listbefore, listafter, listcommon,
+                                                                         identical, args.jobs, structural)
+        tracker = MappingTracker(nambefore, namafter)
+    else:
+        structures = (dict(), dict())
+        for (targetdict, listdir, inputdir, structdict) in ((nambefore, listbefore, args.before, structures[0]),
+                                                            (namafter, listafter, args.after, structures[1])):
+            sys.stdout.write('Processing files in {:s}: '.format(inputdir))
+            for i, f in enumerate(listdir):
+                printstatus(i + 1, len(listdir))
+                if f in identical:
+                    targetdict[f] = identical[f]
+                elif f in listcommon:
+                    nparsed, nstruct = _read_and_sort(os.path.join(inputdir, f), structural)
+                    if nparsed is None:
+                        ko.add(f)
+                    else:
+                        targetdict[f] = nparsed
+                        structdict[f] = nstruct
                 else:
-                    targetdict[f] = nparsed
-            else:
-                targetdict[f] = ''
+                    targetdict[f] = ''
 
-    tracker = MappingTracker(nambefore, namafter)
-    computediffs = _compute_diffs(nambefore, namafter, tracker.updated)
-    # Expand the generator objects into lists
-    print('Creating diff outputs. It may take a while (depending on the amount of changes).')
-    for i, n in enumerate(tracker.updated):
-        computediffs[n] = [line for line in computediffs[n]]
+        tracker = MappingTracker(nambefore, namafter)
+        print('Creating diff outputs. It may take a while (depending on the amount of changes).')
+        computediffs = _compute_diffs(nambefore, namafter, tracker.updated,
+                                      structures=structures if structural else None)
 
     outtpl = tnt.config.get_template('tnt-diffpack-output.tpl', encoding='utf_8')
 
-    with open(args.outputfilename, "w") as fhout:
+    with tnt.profiling.phase(tnt.profiling.PHASE_WRITE, args.outputfilename), open(args.outputfilename, "w") as fhout:
         fhout.write(outtpl.substitute(ref=args.before, new=args.after,
                                       ko='\n'.join(['{:s}'.format(n) for n in sorted(ko)]),
+                                      nidentical=len(identical),
                                       untouched='\n'.join(['{:s}'.format(n) for n in sorted(tracker.unchanged)]),
                                       created='\n'.join(['{:s}'.format(n) for n in sorted(tracker.created)]),
                                       deleted='\n'.join(['{:s}'.format(n) for n in sorted(tracker.deleted)]),
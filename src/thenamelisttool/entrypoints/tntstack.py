@@ -4,7 +4,6 @@ TNT Stack - A namelist's pack updater.
 
 import argparse
 import os
-import yaml
 
 import thenamelisttool as tnt
 from thenamelisttool.namadapter import NO_SORTING, FIRST_ORDER_SORTING, SECOND_ORDER_SORTING
@@ -33,6 +32,44 @@ def main():
                          help='no sorting at all (the default is second_order_sorting, \
                                i.e. sort only within indexes or attributes of the \
                                same key within blocks).')
+    parser.add_argument('-j',
+                        dest='jobs',
+                        type=int,
+                        help='number of worker processes: independent actions of the \
+                              todolist are executed concurrently (the result is \
+                              identical to a sequential run).',
+                        default=1)
+    parser.add_argument('--state',
+                        dest='statefile',
+                        type=str,
+                        help='incremental mode: the state of the run is saved in this \
+                              file. On the next run, the actions that are up to \
+                              date (same directives and input files) and whose \
+                              output files are still in place are skipped.',
+                        default=None)
+    parser.add_argument('--force',
+                        action='store_true',
+                        dest='force',
+                        help='in incremental mode, execute all the actions (regardless \
+                              of the state file content).',
+                        default=False)
+    parser.add_argument('--cache',
+                        dest='cachedir',
+                        type=str,
+                        help='in incremental mode, store the content of the files in \
+                              this directory. The outputs of the up to date actions \
+                              are then restored from it (e.g. when the namelist\'s \
+                              pack is re-created from scratch).',
+                        default=None)
+    parser.add_argument('--sync',
+                        dest='sync',
+                        choices=tnt.outputs.SYNC_MODES,
+                        help='when to call fsync on the output files: never \
+                              (default), after each file or once for all the \
+                              files at the end of the run (batch). In any case, \
+                              files are replaced atomically and files whose \
+                              content did not change are not rewritten.',
+                        default=tnt.outputs.SYNC_NONE)
     directive = parser.add_mutually_exclusive_group(required=True)
     directive.add_argument('-d',
                            dest='directive',
@@ -43,20 +80,31 @@ def main():
                            dest='generate_directive_template',
                            action='store_true',
                            help="generates a directive template written in '{}'.".format(_tmpl))
+    tnt.profiling.add_arguments(parser)
     args = parser.parse_args()
+    if args.force and args.statefile is None:
+        parser.error('--force requires --state')
+    if args.cachedir is not None and args.statefile is None:
+        parser.error('--cache requires --state')
+    tnt.outputs.set_default_sync(args.sync)
 
     if args.generate_directive_template:
         tnt.config.write_directives_template(_tmpl, tplname='tntstack-directive.tpl.yaml')
         print("Template of directives written in: " + os.path.abspath(_tmpl))
     else:
-        # Find the basedir
-        dirpath = os.path.realpath(args.directive)
-        basedir = os.path.dirname(dirpath)
+        with tnt.profiling.cli_profiling(args, 'tntstack'):
+            # Find the basedir
+            dirpath = os.path.realpath(args.directive)
+            basedir = os.path.dirname(dirpath)
 
-        with open(args.directive) as fhyaml:
-            directive = tnt.config.TntStackDirective(basedir, ** yaml.load(fhyaml))
+            directive = tnt.config.TntStackDirective(basedir, **tnt.config.load_yaml_file(args.directive))
 
-        with tnt.util.set_verbose(args.verbose, args.directive):
-            tnt.util.process_tnt_stack(directive,
-                                       sorting=(args.first_order_sorting or args.no_sorting or
-                                                SECOND_ORDER_SORTING + 1) - 1)
+            with tnt.util.set_verbose(args.verbose, args.directive):
+                tnt.util.process_tnt_stack(directive,
+                                           sorting=(args.first_order_sorting or args.no_sorting or
+                                                    SECOND_ORDER_SORTING + 1) - 1,
+                                           jobs=args.jobs,
+                                           statefile=args.statefile,
+                                           force=args.force,
+                                           cachedir=args.cachedir)
+            tnt.outputs.get_default_sink().flush()
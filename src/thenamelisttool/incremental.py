@@ -0,0 +1,245 @@
+"""
+Incremental (make-like) runs of tntstack's todolists.
+
+The state of a run is saved in a JSON file. For each elementary task of the
+todolist (e.g. applying a directive to a given namelist file), it records a
+fingerprint of the task itself (i.e. the directives and options involved), the
+hashes of the files it reads and the hashes of the files it produces. Only
+hashes are stored in the state file.
+
+On the next run, a task whose fingerprint and inputs did not change is not
+executed, provided that the files it produced during the previous run are
+still in place. Consequently, the final content of the directory is always
+identical to the one obtained with a full run on the current content of the
+directory.
+
+A task that modifies a file in place (e.g. a ``tnt`` action) overwrites its
+own input: when the namelist's pack is re-created from scratch, the files it
+produced are not in place anymore. A cache directory can be provided to deal
+with this: the content of the files read and produced by the tasks is stored
+there (one file per distinct content, named after its hash). The files
+produced by the skipped tasks are then restored from the cache. Likewise, a
+file that did not change since the end of the previous run is considered
+"ahead" of the present run (its original content is restored from the cache
+if a task that deals with it needs to be executed). With a cache directory,
+the final content of the directory is therefore identical to the one obtained
+with a full run, whether the namelist's pack has been left as is since the
+previous run or has been re-created from scratch.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from bronx.fancies import loggers
+
+from . import outputs
+from .config import TntDirectivePlan
+
+tntstacklog = loggers.getLogger('tntstacklog')
+
+#: Increment this when the layout of the state file changes
+_STATE_FORMAT = 2
+
+#: The hash of a file that is not yet known (it will be produced by a running task)
+_UNKNOWN = '?'
+
+
+def restore_file(path, content):
+    """Write **content** (bytes) in the **path** file (unless it is already there)."""
+    outputs.write_file(path, content)
+
+
+class TntStackState:
+    """Keep track of the tasks executed by tntstack and of the files they produce.
+
+    :param str statefile: Path to the state file
+    :param bool force: Ignore the content of an existing state file (every task
+                       will be executed)
+    :param str cachedir: Path to the cache directory where the content of the
+                         files is stored (if omitted, the files produced by
+                         the skipped tasks can not be restored)
+    """
+
+    def __init__(self, statefile, force=False, cachedir=None):
+        self._statefile = os.path.abspath(statefile)
+        self._cachedir = None if cachedir is None else os.path.abspath(cachedir)
+        self._previous = dict(final=dict(), initial=dict(), tasks=dict())
+        if not force:
+            self._load()
+        self._blobs = dict()
+        self._tasks = dict()
+        self._initial = dict()
+        self._virtual = dict()
+        self._ondisk = dict()
+        self._executing = dict()
+        self.executed = list()
+        self.skipped = list()
+
+    @property
+    def statefile(self):
+        """The path to the state file."""
+        return self._statefile
+
+    @property
+    def cachedir(self):
+        """The path to the cache directory (``None`` if there is no cache)."""
+        return self._cachedir
+
+    def _load(self):
+        try:
+            with open(self._statefile, encoding='utf-8') as fhstate:
+                previous = json.load(fhstate)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            tntstacklog.warning('Ignoring the unreadable state file "%s": %s', self._statefile, str(e))
+            return
+        if previous.get('version', None) != _STATE_FORMAT:
+            tntstacklog.warning('Ignoring the state file "%s" (incompatible format)', self._statefile)
+            return
+        self._previous = previous
+
+    @staticmethod
+    def _path(path):
+        return os.path.relpath(os.path.realpath(path))
+
+    @staticmethod
+    def task_key(task):
+        """Compute the fingerprint of a task (its function, arguments and options)."""
+        args = [a.fingerprint() if isinstance(a, TntDirectivePlan) else a for a in task.args]
+        return hashlib.sha256(json.dumps([task.func.__module__, task.func.__name__,
+                                          args, sorted(task.kwargs.items())]).encode('utf-8')).hexdigest()
+
+    def _cache_path(self, digest):
+        return os.path.join(self._cachedir, digest[:2], digest)
+
+    def _blob(self, digest):
+        """Return the content associated with a given hash."""
+        if digest not in self._blobs:
+            with open(self._cache_path(digest), 'rb') as fhblob:
+                self._blobs[digest] = fhblob.read()
+        return self._blobs[digest]
+
+    def _has_blob(self, digest):
+        """Whether the content associated with a given hash can be restored."""
+        return self._cachedir is not None and (digest is None or digest in self._blobs or
+                                               os.path.exists(self._cache_path(digest)))
+
+    def _disk_hash(self, path):
+        """Hash the **path** file (and remember its content if there is a cache)."""
+        try:
+            with open(path, 'rb') as fhin:
+                content = fhin.read()
+        except FileNotFoundError:
+            return None
+        digest = hashlib.sha256(content).hexdigest()
+        if self._cachedir is not None:
+            self._blobs[digest] = content
+        return digest
+
+    def _on_disk(self, path):
+        """The hash that **path** will have once the pending tasks are executed."""
+        if path not in self._ondisk:
+            self._ondisk[path] = self._disk_hash(path)
+        return self._ondisk[path]
+
+    def _current(self, path):
+        """The hash that **path** would have at this point of a full run."""
+        if path not in self._virtual:
+            digest = self._on_disk(path)
+            if path not in self._initial:
+                self._initial[path] = digest
+                if (digest is not None and self._previous['final'].get(path, None) == digest and
+                        self._has_blob(self._previous['initial'].get(path, None))):
+                    # The file did not change since the end of the previous
+                    # run: it is "ahead" of the present run.
+                    digest = self._previous['initial'].get(path, None)
+            self._virtual[path] = digest
+        return self._virtual[path]
+
+    def lookup(self, task):
+        """Return the outputs of **task** if it can be skipped (``None`` otherwise).
+
+        The outputs are returned as a list of ``(path, content)`` tuples, where
+        *content* is ``None`` if the file is already in place.
+        """
+        key = self.task_key(task)
+        inputs = {p: self._current(p) for p in map(self._path, task.reads)}
+        previous = self._previous['tasks'].get(key, None)
+        if (_UNKNOWN in inputs.values() or previous is None or previous['inputs'] != inputs or
+                not all([self._on_disk(p) == d or (d is not None and self._has_blob(d))
+                         for p, d in previous['outputs'].items()])):
+            self._executing[id(task)] = (key, inputs)
+            return None
+        self._tasks[key] = previous
+        self._virtual.update(previous['outputs'])
+        self.skipped.append(sorted(previous['outputs'].keys()))
+        restored = [(p, None if self._on_disk(p) == d else self._blob(d))
+                    for p, d in sorted(previous['outputs'].items()) if d is not None]
+        self._ondisk.update(previous['outputs'])
+        return restored
+
+    def restorations(self, paths):
+        """The list of ``(path, content)`` needed to bring **paths** to the state of a full run."""
+        paths = sorted([self._path(p) for p in paths] if paths is not None else self._virtual.keys())
+        restored = [(p, self._blob(self._virtual[p])) for p in paths
+                    if self._virtual.get(p, None) not in (None, _UNKNOWN) and
+                    self._virtual[p] != self._on_disk(p)]
+        self._ondisk.update({p: self._virtual[p] for p, _ in restored})
+        return restored
+
+    def started(self, task):
+        """Must be called when **task** is submitted for execution."""
+        for p in map(self._path, task.writes):
+            self._current(p)  # Remember the initial state of the file
+            self._virtual[p] = _UNKNOWN
+            self._ondisk[p] = _UNKNOWN
+
+    def completed(self, task):
+        """Must be called when **task**'s execution is over."""
+        key, inputs = self._executing.pop(id(task))
+        outputs = dict()
+        for p in map(self._path, task.writes):
+            self._ondisk[p] = self._virtual[p] = outputs[p] = self._disk_hash(p)
+        self._tasks[key] = dict(inputs=inputs, outputs=outputs)
+        self.executed.append(sorted(outputs.keys()))
+
+    def sync(self):
+        """Must be called when the directory content changed (outside of any task)."""
+        self._virtual = dict()
+        self._ondisk = dict()
+
+    def _store_blobs(self):
+        """Store the content of the initial files and of the tasks' outputs in the cache."""
+        needed = set(self._initial.values())
+        for record in self._tasks.values():
+            needed.update(record['outputs'].values())
+        for digest in sorted(needed & set(self._blobs)):
+            if not os.path.exists(self._cache_path(digest)):
+                os.makedirs(os.path.dirname(self._cache_path(digest)), exist_ok=True)
+                outputs.write_file(self._cache_path(digest), self._blobs[digest])
+
+    def save(self):
+        """Write the state file (atomically) and, if any, fill the cache directory."""
+        final = {p: self._disk_hash(p) for p in self._initial}
+        if self._cachedir is not None:
+            self._store_blobs()
+        state = dict(version=_STATE_FORMAT,
+                     final=final,
+                     initial=self._initial,
+                     tasks=self._tasks)
+        fd, tmppath = tempfile.mkstemp(prefix='.tmp_', dir=os.path.dirname(self._statefile))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as fhstate:
+                json.dump(state, fhstate)
+            os.replace(tmppath, self._statefile)
+        except BaseException:
+            os.unlink(tmppath)
+            raise
+
+    def summary(self):
+        """A human-readable summary of the run."""
+        return ('{:d} task(s) executed, {:d} task(s) skipped (up to date).'
+                .format(len(self.executed), len(self.skipped)))
@@ -0,0 +1,163 @@
+"""
+Instrumentation of the namelist adapters' operations.
+
+The public operations of the namelist adapters (see
+:data:`ADAPTER_OPERATIONS`) and the processing of a whole namelist by
+:func:`thenamelisttool.util.process_namelist` report the time they took to the
+registered observers. An observer is any callable that accepts the name of the
+operation and the elapsed time (in seconds), e.g. an
+:class:`OperationCounters` object::
+
+    counters = OperationCounters()
+    with observing(counters):
+        process_namelist('fort.4', directive)
+    print(counters.summary())
+
+Only the outermost adapter operation is reported: the operations that an
+operation relies on internally (e.g. :meth:`move_keys` calls
+:meth:`remove_keys` and :meth:`add_keys`) are not, and their elapsed time is
+accounted for in the outermost operation. Consequently, the counts are the
+numbers of calls made by the adapters' users (e.g. the directives), not the
+total numbers of calls. Nesting is tracked separately in each thread. The
+adapter operations made while a whole namelist is processed are reported (in
+addition to the :data:`OP_PROCESS_NAMELIST` operation). When no observer is
+registered, an instrumented operation costs a single extra test.
+
+When the namelists are processed by worker processes (see
+:mod:`thenamelisttool.workers`), the operations measured in the worker
+processes are reported to the parent process' observers (the worker processes
+are told whether some observers are registered in the parent process, whatever
+the way they are started).
+"""
+
+import collections
+import contextlib
+import functools
+import threading
+import time
+
+#: The public operations of the namelist adapters that are instrumented
+ADAPTER_OPERATIONS = ('add_blocks', 'remove_blocks', 'move_blocks', 'check_blocks',
+                      'add_keys', 'remove_keys', 'move_keys',
+                      'squeeze', 'merge', 'merge_all', 'copy', 'splice_dumps', 'dumps')
+
+#: The operation reported for each namelist processed by ``process_namelist``
+OP_PROCESS_NAMELIST = 'process_namelist'
+
+_OBSERVERS = list()
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+# Its "active" attribute is True while an adapter operation is being measured (in each thread)
+_MEASURING = threading.local()
+
+
+def register_observer(observer):
+    """Register **observer**: it will be called with the name of each operation and its elapsed time."""
+    _OBSERVERS.append(observer)
+
+
+def unregister_observer(observer):
+    """Unregister an observer previously registered with :func:`register_observer`."""
+    _OBSERVERS.remove(observer)
+
+
+def observers():
+    """The list of registered observers."""
+    return list(_OBSERVERS)
+
+
+@contextlib.contextmanager
+def observing(observer):
+    """Register **observer** for the duration of the context."""
+    register_observer(observer)
+    try:
+        yield observer
+    finally:
+        unregister_observer(observer)
+
+
+def notify(operation, elapsed):
+    """Report that **operation** took **elapsed** seconds to the registered observers."""
+    for observer in list(_OBSERVERS):
+        observer(operation, elapsed)
+
+
+def instrumented(func):
+    """Decorate an adapter's method so that its calls are reported to the observers."""
+
+    @functools.wraps(func)
+    def instrumented_operation(*kargs, **kwargs):
+        if not _OBSERVERS or getattr(_MEASURING, 'active', False):
+            return func(*kargs, **kwargs)
+        _MEASURING.active = True
+        start = time.perf_counter()
+        try:
+            return func(*kargs, **kwargs)
+        finally:
+            _MEASURING.active = False
+            notify(func.__name__, time.perf_counter() - start)
+
+    instrumented_operation.tnt_instrumented = True
+    return instrumented_operation
+
+
+@contextlib.contextmanager
+def _measured(operation):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        notify(operation, time.perf_counter() - start)
+
+
+def measure(operation):
+    """Report the time spent within the context as **operation** (if observers are registered)."""
+    if not _OBSERVERS:
+        return _NULL_CONTEXT
+    return _measured(operation)
+
+
+@contextlib.contextmanager
+def recording(record=None):
+    """Record (instead of reporting) the operations made within the context.
+
+    If **record** is True (by default, if observers are registered), the list
+    of ``(operation, elapsed)`` tuples is returned (otherwise ``None``). The
+    registered observers are not called until the end of the context: it is up
+    to the caller to :func:`notify` them (this is used by worker processes,
+    which are told explicitly whether the parent process has observers).
+    """
+    if not (_OBSERVERS if record is None else record):
+        yield None
+        return
+    events = list()
+    saved = list(_OBSERVERS)
+    _OBSERVERS[:] = [lambda operation, elapsed: events.append((operation, elapsed)), ]
+    try:
+        yield events
+    finally:
+        _OBSERVERS[:] = saved
+
+
+class OperationCounters:
+    """An observer that counts the calls to each operation and the time spent in them."""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.elapsed = collections.Counter()
+
+    def __call__(self, operation, elapsed):
+        """Account for a call to **operation** that took **elapsed** seconds."""
+        self.counts[operation] += 1
+        self.elapsed[operation] += elapsed
+
+    def reset(self):
+        """Forget about the operations observed so far."""
+        self.counts.clear()
+        self.elapsed.clear()
+
+    def summary(self):
+        """Return a dictionary: operation -> dict(count=..., elapsed=...)."""
+        return {operation: dict(count=count, elapsed=self.elapsed[operation])
+                for operation, count in sorted(self.counts.items())}
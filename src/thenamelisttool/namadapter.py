@@ -7,10 +7,17 @@ functionalities that fit the needs of TNT utilities.
 
 import abc
 import collections
+import copy
+import io
+import locale
+import mmap
+import os
 import re
 
 from bronx.fancies import loggers
 
+from . import instrumentation, nativeparser, parsecache
+
 tntlog = loggers.getLogger('tntlog')
 
 # Macros List from vortex's common.data.namelists
@@ -33,9 +40,123 @@ FIRST_ORDER_SORTING = 1
 #: Output namelist sorting option: SECOND_ORDER_SORTING. Sort only between indexes.
 SECOND_ORDER_SORTING = 2
 
+# Used to detect whether a string is a namelist or a path to a namelist file
+_NAMELIST_BLOCK_RE = re.compile(r'&.*/', re.IGNORECASE + re.DOTALL)
+
+# The encoding used when namelist files are read
+_LOCALE_ENCODING = locale.getpreferredencoding(False)
+
+
+def _read_namelist_source(namelistsfile):
+    """Return the text of a namelist provided as a string, a filename or a file object."""
+    if isinstance(namelistsfile, str):
+        if _NAMELIST_BLOCK_RE.search(namelistsfile):
+            return namelistsfile
+        with open(namelistsfile.strip()) as fhnam:
+            return fhnam.read()
+    elif hasattr(namelistsfile, 'seek') and hasattr(namelistsfile, 'read'):
+        namelistsfile.seek(0)
+        return namelistsfile.read()
+    else:
+        raise ValueError("Argument {!s} cannot be parsed.".format(namelistsfile))
+
+
+def _blank_lines_span(text, start, end):
+    """Extend the **start**:**end** span to whole lines if nothing else is on these lines."""
+    line_start = text.rfind('\n', 0, start) + 1
+    line_end = text.find('\n', end)
+    line_end = len(text) if line_end == -1 else line_end + 1
+    if text[line_start:start].strip() or text[end:line_end].strip():
+        return start, end
+    return line_start, line_end
+
+
+#: The various parts of a namelist key (e.g. ``KEY(1:3)%ATTR`` gives
+#: ``radical='KEY', indexes='1:3', attribute='ATTR'``)
+KeyParts = collections.namedtuple('KeyParts', ('radical', 'indexes', 'attribute'))
+
+_KEY_PARTS_RE = re.compile(r'(?P<radical>[^(%]*)(?:\((?P<indexes>[^)]*)\))?(?:%(?P<attribute>.*))?$')
+# What may follow a requested key in the name of a matching namelist key
+_KEY_SUFFIX_RE = re.compile(r'(\(.+\)|%.+)*$')
+
+
+def split_key(key):
+    """Split a namelist **key** into a :class:`KeyParts` object."""
+    k_match = _KEY_PARTS_RE.match(key)
+    if k_match is None:
+        return KeyParts(key.split('(')[0].split('%')[0], None, None)
+    return KeyParts(*k_match.group('radical', 'indexes', 'attribute'))
+
+
+class BlockKeysIndex:
+    """An index of the keys of a namelist block, organised by radical.
+
+    Each key is parsed only once (when it is added to the index). Finding the
+    keys that are derived from a given key (i.e. that share its radical and
+    only differ by some indexes and/or attributes) is then a dictionary
+    lookup.
+    """
+
+    def __init__(self, keys=()):
+        self._by_radical = collections.defaultdict(dict)
+        for k in keys:
+            self.add(k)
+
+    def add(self, key):
+        """Add **key** to the index."""
+        parts = split_key(key)
+        self._by_radical[parts.radical][key] = parts
+
+    def discard(self, key):
+        """Remove **key** from the index (if present)."""
+        radical = split_key(key).radical
+        entries = self._by_radical.get(radical, None)
+        if entries is not None:
+            entries.pop(key, None)
+            if not entries:
+                del self._by_radical[radical]
+
+    def __contains__(self, key):
+        return key in self._by_radical.get(split_key(key).radical, ())
+
+    def __len__(self):
+        return sum([len(entries) for entries in self._by_radical.values()])
+
+    def expand(self, key):
+        """
+        Find all the indexed keys that correspond to **key**, due to
+        attributes and/or indexes (e.g. ``KEY`` gives ``KEY``, ``KEY(1)``,
+        ``KEY%ATTR``, ...).
+
+        :rtype: list[str]
+        """
+        candidates = self._by_radical.get(split_key(key).radical, ())
+        lkey = len(key)
+        return [nk for nk in candidates
+                if nk.startswith(key) and _KEY_SUFFIX_RE.match(nk, lkey)]
+
+
+class _BlockDumpsUnavailable(Exception):
+    """Raised by adapters that can not re-generate a single namelist block."""
+    pass
+
 
 class AbstractNamelistAdapter(collections.abc.Mapping, metaclass=abc.ABCMeta):
-    """Every Namelist adapter must derive from this abstract class."""
+    """Every Namelist adapter must derive from this abstract class.
+
+    The public operations listed in
+    :data:`thenamelisttool.instrumentation.ADAPTER_OPERATIONS` (including
+    the ones overridden by subclasses) are reported to the observers
+    registered in :mod:`thenamelisttool.instrumentation`.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for operation in instrumentation.ADAPTER_OPERATIONS:
+            method = cls.__dict__.get(operation)
+            if (method is not None and not getattr(method, 'tnt_instrumented', False) and
+                    not getattr(method, '__isabstractmethod__', False)):
+                setattr(cls, operation, instrumentation.instrumented(method))
 
     @abc.abstractmethod
     def __init__(self, namelistsfile, macros=None):  # @UnusedVariable
@@ -43,6 +164,11 @@ class AbstractNamelistAdapter(collections.abc.Mapping, metaclass=abc.ABCMeta):
         :param str namelistsfile: The namelist itself or a path to a namelist file.
         """
         self._parser = None
+        self._keys_index = dict()
+        # The original text of the namelist and the blocks modified since then
+        self._source = None
+        self._source_blocks = frozenset()
+        self._dirty = set()
 
     @property
     def parser(self):
@@ -51,6 +177,7 @@ class AbstractNamelistAdapter(collections.abc.Mapping, metaclass=abc.ABCMeta):
 
     # Public methods that operates on namelist's blocks
 
+    @instrumentation.instrumented
     def add_blocks(self, blocks):
         """Add a set of new blocks in the present namelist's set.
 
@@ -59,9 +186,11 @@ class AbstractNamelistAdapter(collections.abc.Mapping, metaclass=abc.ABCMeta):
         for b in blocks:
             if b not in self:
                 self._actual_newblock(b)
+                self._dirty.add(b.upper())
             else:
                 tntlog.info('block "%s" is already present.', b)
 
+    @instrumentation.instrumented
     def remove_blocks(self, blocks):
         """Remove a set of blocks from the present namelist's set.
 
@@ -70,9 +199,11 @@ class AbstractNamelistAdapter(collections.abc.Mapping, metaclass=abc.ABCMeta):
         for b in blocks:
             if b in self:
                 self._actual_rmblock(b)
+                self._keys_index.pop(b.upper(), None)
             else:
                 tntlog.info('block "%s" to be removed but already missing.', b)
 
+    @instrumentation.instrumented
     def move_blocks(self, blocks):
         """Move/Rename a set of blocks within the present namelist's set.
 
@@ -82,12 +213,17 @@ class AbstractNamelistAdapter(collections.abc.Mapping, metaclass=abc.ABCMeta):
             if old_b in self:
                 if new_b not in self:
                     self._actual_mvblock(old_b, new_b)
+                    self._dirty.add(new_b.upper())
+                    b_index = self._keys_index.pop(old_b.upper(), None)
+                    if b_index is not None:
+                        self._keys_index[new_b.upper()] = b_index
                 else:
                     raise ValueError('block "{:s} already present'.format(new_b))
             else:
                 tntlog.warning('block "%s" to be moved but missing from namelist: ignored.',
                                old_b)
 
+    @instrumentation.instrumented
     def check_blocks(self, another, macros=None):
         """
         Check that the present namelist's set contains the same set of blocks as
@@ -103,11 +239,13 @@ class AbstractNamelistAdapter(collections.abc.Mapping, metaclass=abc.ABCMeta):
         :return set: The set of blocks that differ.
         """
         if not isinstance(another, AbstractNamelistAdapter):
-            another = self.__class__(another, macros=macros)
+            # Only the block names are needed
+            another = LazyNamelistAdapter(another, macros=macros)
         return set(self.keys()).symmetric_difference(set(another.keys()))
 
     # Public methods that operates on namelist's keys
 
+    @instrumentation.instrumented
     def add_keys(self, keys, doctor=False, indexes=None):
         """Set a set of keys in the present namelist's set.
 
@@ -124,10 +262,14 @@ class AbstractNamelistAdapter(collections.abc.Mapping, metaclass=abc.ABCMeta):
                 self._actual_newkey(b, k,
                                     self._DOCTOR_convert(k, v) if doctor else v,
                                     index=idx)
+                self._dirty.add(b.upper())
+                if b.upper() in self._keys_index:
+                    self._keys_index[b.upper()].add(self._canonical_key(k))
             else:
                 raise KeyError('block "{:s}" is missing: cannot set its "{:s}" key'
                                .format(b, k))
 
+    @instrumentation.instrumented
     def remove_keys(self, keys):
         """Remove a set of keys from the present namelist's set.
 
@@ -137,6 +279,9 @@ class AbstractNamelistAdapter(collections.abc.Mapping, metaclass=abc.ABCMeta):
             if b in self:
                 if k in self[b]:
                     self._actual_rmkey(b, k)
+                    self._dirty.add(b.upper())
+                    if b.upper() in self._keys_index:
+                        self._keys_index[b.upper()].discard(self._canonical_key(k))
                 else:
                     tntlog.info(('key "%s" to be removed but already missing from block "%s".',
                                  k, b))
@@ -144,6 +289,7 @@ class AbstractNamelistAdapter(collections.abc.Mapping, metaclass=abc.ABCMeta):
                 tntlog.info('block "%s" missing: cannot remove its "%s" key.',
                             b, k)
 
+    @instrumentation.instrumented
     def move_keys(self, keys, doctor=False, keep_index=False):
         """
         Move a set of keys within the present namelist's set.
@@ -187,12 +333,103 @@ class AbstractNamelistAdapter(collections.abc.Mapping, metaclass=abc.ABCMeta):
             else:
                 tntlog.warning('block "%s" missing: cannot move its key "%s".', ob, ok)
 
+    @instrumentation.instrumented
     def squeeze(self):
         """Squeeze the namelist: remove empty blocks."""
         self._actual_squeeze()
+        for b in [b for b in self._keys_index if b not in self]:
+            del self._keys_index[b]
+
+    @instrumentation.instrumented
+    def merge_all(self, others):
+        """Merge several namelists in the current one.
+
+        The result is the same as successive calls to :meth:`merge` (the
+        last namelist wins) but, whenever possible, each block of the
+        current namelist is dealt with only once.
+
+        :param list[AbstractNamelistAdapter] others: The namelists to merge in
+                                                     (in that order).
+        """
+        others = list(others)
+        self._actual_merge_all(others)
+        self._merged(others)
+
+    @instrumentation.instrumented
+    def copy(self):
+        """Return an independent copy of the present namelist's set."""
+        return copy.deepcopy(self)
+
+    @instrumentation.instrumented
+    def splice_dumps(self, sorting=NO_SORTING):
+        """
+        Like :meth:`dumps` but, when **sorting** is NO_SORTING, the blocks that
+        were not modified (through the present object's public methods) are
+        copied verbatim from the original namelist's text.
+
+        Modified blocks are re-generated in place, removed blocks are dropped
+        and new blocks are appended (in alphabetical order). Consequently, the
+        formatting and the comments of the untouched blocks are preserved.
+        Adapters that can not re-generate a single block fall back to
+        :meth:`dumps`.
+
+        :param int sorting: The kind of sorting to apply within blocks
+        """
+        if sorting != NO_SORTING or self._source is None:
+            return self.dumps(sorting=sorting)
+        text = self._source
+        spans = [(name.upper(), start, end) for name, start, end in nativeparser.scan_blocks(text)]
+        names = [name for name, _, _ in spans]
+        if len(set(names)) != len(names) or set(names) != self._source_blocks:
+            # Duplicated blocks or weird syntax: play safe
+            return self.dumps(sorting=sorting)
+        pieces = list()
+        pos = 0
+        try:
+            for name, start, end in spans:
+                if name not in self:
+                    start, end = _blank_lines_span(text, start, end)
+                pieces.append(text[pos:start])
+                if name in self:
+                    pieces.append(text[start:end] if name not in self._dirty
+                                  else self._actual_dumps_block(name, sorting).strip())
+                pos = end
+            pieces.append(text[pos:])
+            namout = ''.join(pieces)
+            new_blocks = sorted(set(self.keys()) - set(names))
+            if new_blocks:
+                if namout and not namout.endswith('\n'):
+                    namout += '\n'
+                namout += ''.join([self._actual_dumps_block(b, sorting) for b in new_blocks])
+        except _BlockDumpsUnavailable:
+            return self.dumps(sorting=sorting)
+        return namout
 
     # Generic utility methods
 
+    def _track_source(self, text, macros):
+        """Remember the original **text** of the namelist (see :meth:`splice_dumps`).
+
+        Blocks where some of the **macros** are substituted are considered
+        modified.
+        """
+        self._source = text
+        self._source_blocks = frozenset([b.upper() for b in self.keys()])
+        substituted = {m for m, v in macros.items() if v is not None}
+        self._dirty = {b.upper() for b in self.keys()
+                       if any([m in substituted for m in self[b].macros()])}
+
+    def _merged(self, others):
+        """Forget the keys index of the blocks modified by merging **others** in.
+
+        It must be called by the concrete implementations of :meth:`merge`
+        (it also marks these blocks as modified, see :meth:`splice_dumps`).
+        """
+        for other in others:
+            for b in other:
+                self._keys_index.pop(b.upper(), None)
+                self._dirty.add(b.upper())
+
     @staticmethod
     def _all_macros(arg_macros):
         macros = {k: None for k in KNOWN_NAMELIST_MACROS}
@@ -200,6 +437,23 @@ class AbstractNamelistAdapter(collections.abc.Mapping, metaclass=abc.ABCMeta):
             macros.update(arg_macros)
         return macros
 
+    @staticmethod
+    def _canonical_key(key):
+        """The name of **key** as stored in the namelist (namelists are not case-sensitive)."""
+        return key.upper()
+
+    def _block_keys_index(self, block):
+        """The :class:`BlockKeysIndex` object associated with **block** (created on demand).
+
+        The index is kept up-to-date as long as the namelist is modified through
+        the adapter's public methods. Like block names, it is not case-sensitive.
+        """
+        b_index = self._keys_index.get(block.upper(), None)
+        if b_index is None:
+            b_index = BlockKeysIndex(self[block].keys())
+            self._keys_index[block.upper()] = b_index
+        return b_index
+
     def _expand_keys(self, keys, radics=False):
         """
         Find all entries corresponding to the given keys,
@@ -212,8 +466,7 @@ class AbstractNamelistAdapter(collections.abc.Mapping, metaclass=abc.ABCMeta):
         expanded_keys = []
         for (b, k) in keys:
             if b in self:
-                ek = [(b, nk) for nk in self[b].keys()
-                      if re.match(k.replace('(', r'\(').replace(')', r'\)') + r'(\(.+\)|%.+)*$', nk)]
+                ek = [(b, nk) for nk in self._block_keys_index(b).expand(k)]
                 if radics:
                     ek = [(b, k, nk) for (b, nk) in ek]
                 expanded_keys.extend(ek)
@@ -331,6 +584,18 @@ class AbstractNamelistAdapter(collections.abc.Mapping, metaclass=abc.ABCMeta):
         """
         pass
 
+    def _actual_merge_all(self, others):
+        """Merge several namelists in the current one (one at a time)."""
+        for other in others:
+            self.merge(other)
+
+    def _actual_dumps_block(self, block, sorting=NO_SORTING):
+        """Returns a string that represent a given namelist block.
+
+        If not implemented, :meth:`splice_dumps` falls back to :meth:`dumps`.
+        """
+        raise _BlockDumpsUnavailable()
+
 
 class AbstractMapableNamelistAdapter(AbstractNamelistAdapter):
     """
@@ -369,21 +634,74 @@ class AbstractMapableNamelistAdapter(AbstractNamelistAdapter):
         self._assert_mapping(self._parser)
         return len(self._parser)
 
+    def _writable_block(self, item):
+        """Retrieve a namelist block that is about to be modified in place."""
+        return self[item]
+
+    def _actual_merge_all(self, others):
+        # Gather the deltas of each block (blocks are kept in order of appearance)
+        deltas = collections.OrderedDict()
+        for other in others:
+            for b in other:
+                deltas.setdefault(b, list()).append(other[b])
+        for b, b_deltas in deltas.items():
+            if b in self:
+                block = self._writable_block(b)
+            else:
+                block = copy.deepcopy(b_deltas.pop(0))
+                self._parser[b] = block
+            for delta in b_deltas:
+                block.merge(delta)
+
 
 class BronxNamelistAdapter(AbstractMapableNamelistAdapter):
     """
     A NamelistAdapter that relies on the namelist parser provided by the
     :mod:`bronx` package.
+
+    If a parse cache is configured (see :mod:`thenamelisttool.parsecache`), the
+    parsed namelist is looked for in the cache prior to calling the
+    :mod:`bronx` parser.
     """
 
+    _CACHE_NAMESPACE = None
+
     def __init__(self, namelistsfile, macros=None):
         super().__init__(namelistsfile)
+        actual_macros = self._all_macros(macros)
+        text = _read_namelist_source(namelistsfile)
+        cache = parsecache.get_default_cache()
+        if cache is None:
+            self._parser = self._parse(io.StringIO(text), actual_macros)
+        else:
+            key = cache.key(text, actual_macros, namespace=self._cache_namespace())
+            self._parser = cache.get(key)
+            if self._parser is None:
+                self._parser = self._parse(io.StringIO(text), actual_macros)
+                cache.put(key, self._parser)
+        self._track_source(text, actual_macros)
+
+    @staticmethod
+    def _parse(namelistsfile, actual_macros):
+        """Actually parse the namelist and set the macros values."""
         # Delay the import of the bronx library since one may want to use another backend
         from bronx.datagrip import namelist
-        actual_macros = self._all_macros(macros)
-        self._parser = namelist.namparse(namelistsfile, macros=actual_macros)
+        parsed = namelist.namparse(namelistsfile, macros=actual_macros)
         for macro, value in actual_macros.items():
-            self._parser.setmacro(macro, value)
+            parsed.setmacro(macro, value)
+        return parsed
+
+    @classmethod
+    def _cache_namespace(cls):
+        """Identify the parser in the parse cache keys."""
+        if cls._CACHE_NAMESPACE is None:
+            try:
+                from importlib import metadata
+                version = metadata.version('bronx')
+            except Exception:  # Python < 3.8 or weird installation
+                version = 'unknown'
+            cls._CACHE_NAMESPACE = '{:s}-bronx-{:s}'.format(cls.__name__, version)
+        return cls._CACHE_NAMESPACE
 
     def _actual_newblock(self, item):
         self.parser.newblock(item)
@@ -420,3 +738,340 @@ class BronxNamelistAdapter(AbstractMapableNamelistAdapter):
         """
         assert isinstance(other, self.__class__)
         self.parser.merge(other.parser)
+        self._merged([other, ])
+
+    def _actual_dumps_block(self, block, sorting=NO_SORTING):
+        return self[block].dumps(sorting=sorting)
+
+
+class NativeNamelistAdapter(AbstractMapableNamelistAdapter):
+    """
+    A NamelistAdapter that relies on the pure-Python namelist parser provided
+    by :mod:`thenamelisttool.nativeparser`.
+
+    The namelist's syntax, the Python objects used to represent namelist's
+    values and the output are identical to those of the
+    :class:`BronxNamelistAdapter` class.
+    """
+
+    def __init__(self, namelistsfile, macros=None):
+        super().__init__(namelistsfile)
+        actual_macros = self._all_macros(macros)
+        text = _read_namelist_source(namelistsfile)
+        self._parser = nativeparser.parse(text, macros=actual_macros)
+        for macro, value in actual_macros.items():
+            self._parser.setmacro(macro, value)
+        self._track_source(text, actual_macros)
+
+    def _actual_newblock(self, item):
+        self.parser.newblock(item)
+
+    def _actual_rmblock(self, item):
+        del self.parser[item]
+
+    def _actual_mvblock(self, item, targetitem):
+        self.parser.mvblock(item, targetitem)
+
+    def _actual_newkey(self, block, key, value, index=None):
+        self[block].setvar(key, value, index=index)
+
+    def _actual_rmkey(self, block, key):
+        del self[block][key]
+
+    def _actual_squeeze(self):
+        for b in [b for b, nb in self.parser.items() if len(nb) == 0]:
+            self._actual_rmblock(b)
+
+    def dumps(self, sorting=NO_SORTING):
+        """Returns a string that represent the namelist's set."""
+        return self.parser.dumps(sorting=sorting)
+
+    def merge(self, other):
+        """Merge another namelist in the current one.
+
+        :param AbstractNamelistAdapter other: Another namelist to merge in.
+        """
+        assert isinstance(other, self.__class__)
+        self.parser.merge(other.parser)
+        self._merged([other, ])
+
+    def _actual_dumps_block(self, block, sorting=NO_SORTING):
+        return self[block].dumps(sorting=sorting)
+
+
+#: Environment variable that holds the name of the default namelist's backend
+BACKEND_ENV = 'TNT_NAMELIST_BACKEND'
+
+#: The available namelist's backends
+NAMELIST_BACKENDS = dict(bronx=BronxNamelistAdapter,
+                         native=NativeNamelistAdapter)
+
+_DEFAULT_ADAPTER_CLASS = None
+
+
+def set_default_adapter_class(adapter_class):
+    """Set (or reset if **adapter_class** is ``None``) the adapter class used by default.
+
+    :param adapter_class: A subclass of :class:`AbstractNamelistAdapter` or
+                          the name of a backend (see :data:`NAMELIST_BACKENDS`)
+    """
+    global _DEFAULT_ADAPTER_CLASS
+    if isinstance(adapter_class, str):
+        try:
+            adapter_class = NAMELIST_BACKENDS[adapter_class]
+        except KeyError:
+            raise ValueError('Unknown namelist backend: {:s}'.format(adapter_class))
+    assert adapter_class is None or issubclass(adapter_class, AbstractNamelistAdapter)
+    _DEFAULT_ADAPTER_CLASS = adapter_class
+
+
+def get_default_adapter_class():
+    """Return the adapter class used by default.
+
+    Unless :func:`set_default_adapter_class` was called before, it is chosen
+    using the ``TNT_NAMELIST_BACKEND`` environment variable (the
+    :class:`BronxNamelistAdapter` class is used if it is not set).
+    """
+    if _DEFAULT_ADAPTER_CLASS is None:
+        set_default_adapter_class(os.environ.get(BACKEND_ENV, None) or 'bronx')
+    return _DEFAULT_ADAPTER_CLASS
+
+
+def namelist_adapter(namelistsfile, macros=None):
+    """Parse a namelist using the default adapter class (see :func:`get_default_adapter_class`).
+
+    :param str namelistsfile: The namelist itself or a path to a namelist file.
+    :param dict macros: Values of the namelist's macros
+    """
+    return get_default_adapter_class()(namelistsfile, macros=macros)
+
+
+class _LazyNamelistSet(collections.abc.Mapping):
+    """The blocks of a :class:`LazyNamelistAdapter` (parsed on demand).
+
+    Once :meth:`share` has been called, the sets that derive from the same
+    source also share a cache of parsed blocks: a given block is parsed only
+    once and the resulting object is shared until one of the sets needs to
+    modify it (see :meth:`own`).
+    """
+
+    def __init__(self, source, backend, macros):
+        self._source = source
+        self._backend = backend
+        self._macros = macros
+        self._cache = None
+        self._shared = set()
+        self._blocks = collections.OrderedDict()
+        for name, start, end in nativeparser.scan_blocks(source):
+            # NB: With duplicated blocks, the last one wins (but the first one's position is kept)
+            self._blocks[name.upper()] = slice(start, end)
+
+    def __getstate__(self):
+        # A memory-mapped file can not be pickled...
+        self._parse(list(self._blocks))
+        state = dict(self.__dict__)
+        state['_source'] = None
+        state['_cache'] = None
+        state['_shared'] = set()
+        return state
+
+    def __deepcopy__(self, memo):
+        # The source (and the cache of pristine blocks) is read-only: it can be shared
+        new = copy.copy(self)
+        new._blocks = collections.OrderedDict([(b, v if isinstance(v, slice) else copy.deepcopy(v, memo))
+                                               for b, v in self._blocks.items()])
+        new._shared = set()
+        return new
+
+    def __contains__(self, item):
+        return item.upper() in self._blocks
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def __iter__(self):
+        return iter(self._blocks)
+
+    def __getitem__(self, item):
+        item = item.upper()
+        if isinstance(self._blocks[item], slice):
+            self._parse([item, ])
+        return self._blocks[item]
+
+    def __setitem__(self, item, value):
+        self._blocks[item.upper()] = value
+        self._shared.discard(item.upper())
+
+    def __delitem__(self, item):
+        del self._blocks[item.upper()]
+        self._shared.discard(item.upper())
+
+    def share(self):
+        """Return a copy of this set that shares the namelist blocks with it."""
+        if self._cache is None:
+            self._cache = dict()
+        new = copy.copy(self)
+        new._blocks = collections.OrderedDict(self._blocks)
+        self._shared.update([b for b, v in self._blocks.items() if not isinstance(v, slice)])
+        new._shared = set(self._shared)
+        return new
+
+    def own(self, item):
+        """Return the **item** block, making sure that it is not shared with another set."""
+        item = item.upper()
+        block = self[item]
+        if item in self._shared:
+            block = copy.deepcopy(block)
+            self[item] = block
+        return block
+
+    def source(self, item):
+        """The text of the **item** block (``None`` if it has been parsed)."""
+        chunk = self._blocks[item.upper()]
+        if not isinstance(chunk, slice):
+            return None
+        chunk = self._source[chunk]
+        return chunk if isinstance(chunk, str) else chunk.decode(_LOCALE_ENCODING)
+
+    def _parse(self, items):
+        """Parse the **items** blocks (all at once)."""
+        pending = [b for b in items if isinstance(self._blocks[b], slice)]
+        if self._cache is not None:
+            # Blocks that were already parsed by another set
+            for b in [b for b in pending if self._blocks[b].start in self._cache]:
+                self._blocks[b] = self._cache[self._blocks[b].start]
+                self._shared.add(b)
+            pending = [b for b in pending if isinstance(self._blocks[b], slice)]
+        pending.sort(key=lambda b: self._blocks[b].start)
+        if pending:
+            parsed = self._backend(io.StringIO('\n'.join([self.source(b) for b in pending])),
+                                   macros=self._macros)
+            for b in pending:
+                if self._cache is not None:
+                    self._cache[self._blocks[b].start] = parsed[b]
+                    self._shared.add(b)
+                self._blocks[b] = parsed[b]
+
+
+class LazyNamelistAdapter(AbstractMapableNamelistAdapter):
+    """
+    A NamelistAdapter that parses the namelist's blocks on demand.
+
+    When created, only the boundaries of the namelist's blocks are looked for
+    (namelist files are memory-mapped). The content of a given block is
+    actually parsed (using the **backend** adapter class) when it is first
+    accessed. Consequently, operations that only deal with block names (e.g.
+    :meth:`check_blocks`, :meth:`add_blocks` or :meth:`remove_blocks`) are
+    very cheap.
+
+    The namelist file must not be modified while the adapter is in use.
+
+    :meth:`copy` is cheap: the copies share the source and the parsed blocks
+    (a shared block is only copied when one of the adapters modifies it). The
+    blocks returned by ``adapter[block]`` must therefore be considered as
+    read-only: modifications should go through the adapter's methods.
+
+    :param backend: The adapter class used to parse the namelist blocks (if
+                    omitted, see :func:`get_default_adapter_class`)
+    """
+
+    def __init__(self, namelistsfile, macros=None, backend=None):
+        super().__init__(namelistsfile)
+        self._backend = backend or get_default_adapter_class()
+        self._parser = _LazyNamelistSet(self._map_source(namelistsfile), self._backend, macros)
+
+    @staticmethod
+    def _map_source(namelistsfile):
+        """Return the namelist's text (or a memory-map of the namelist file)."""
+        if isinstance(namelistsfile, str) and not _NAMELIST_BLOCK_RE.search(namelistsfile):
+            with open(namelistsfile.strip(), 'rb') as fhnam:
+                try:
+                    return mmap.mmap(fhnam.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:  # Empty files can't be mapped
+                    return b''
+        return _read_namelist_source(namelistsfile)
+
+    @property
+    def backend(self):
+        """The adapter class used to parse the namelist blocks."""
+        return self._backend
+
+    def block_source(self, item):
+        """The original text of the **item** block (``None`` if it was parsed in the meantime)."""
+        return self.parser.source(item)
+
+    def load(self):
+        """Parse all the namelist blocks now (instead of on demand)."""
+        self.parser._parse(list(self))
+
+    def copy(self):
+        """Return an independent copy of the present namelist's set.
+
+        The source and the parsed blocks are shared (copy-on-write).
+        """
+        new = copy.copy(self)
+        new._parser = self.parser.share()
+        new._keys_index = dict()
+        new._dirty = set(self._dirty)
+        return new
+
+    def materialize(self):
+        """Return a genuine **backend** adapter object with the same content.
+
+        The namelist blocks are shared between the two objects (except the
+        blocks that are shared with copies of this adapter).
+        """
+        return self._backend_adapter(self.parser.own)
+
+    def _backend_adapter(self, getblock):
+        """Build a **backend** adapter object with the blocks returned by **getblock**."""
+        self.parser._parse(list(self))
+        nam = self._backend(io.StringIO(), macros=self.parser._macros)
+        for b in self:
+            nam.parser[b] = getblock(b)
+        return nam
+
+    def _actual_newblock(self, item):
+        self.parser[item] = self._backend(io.StringIO(' &{:s}\n /\n'.format(item.upper())))[item]
+
+    def _actual_rmblock(self, item):
+        del self.parser[item]
+
+    def _actual_mvblock(self, item, targetitem):
+        block = self.parser.own(item)
+        del self.parser[item]
+        block.set_name(targetitem)
+        self.parser[targetitem] = block
+
+    def _actual_newkey(self, block, key, value, index=None):
+        self.parser.own(block).setvar(key, value, index=index)
+
+    def _actual_rmkey(self, block, key):
+        del self.parser.own(block)[key]
+
+    def _actual_squeeze(self):
+        for b in [b for b in self if len(self[b]) == 0]:
+            self._actual_rmblock(b)
+
+    def dumps(self, sorting=NO_SORTING):
+        """Returns a string that represent the namelist's set."""
+        # NB: dumps is read-only: there is no need to copy the shared blocks
+        return self._backend_adapter(self.parser.__getitem__).dumps(sorting=sorting)
+
+    def _writable_block(self, item):
+        return self.parser.own(item)
+
+    def merge(self, other):
+        """Merge another namelist in the current one.
+
+        :param AbstractNamelistAdapter other: Another namelist to merge in.
+        """
+        for b in other:
+            if b in self:
+                self.parser.own(b).merge(other[b])
+            else:
+                self.parser[b] = copy.deepcopy(other[b])
+        self._merged([other, ])
+
+    def _actual_dumps_block(self, block, sorting=NO_SORTING):
+        return self[block].dumps(sorting=sorting)
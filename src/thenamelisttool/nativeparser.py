@@ -0,0 +1,703 @@
+"""
+A fast, pure-Python, namelist parser.
+
+It is meant to be a drop-in replacement for the :mod:`bronx.datagrip.namelist`
+parser: the same syntax is accepted, the same Python objects are created for
+namelist values and namelists are dumped identically. However:
+
+* The tokenizer reads the namelist in a single pass (the source text is never
+  copied or re-sliced);
+* Namelist blocks store their keys in a dictionary (membership tests are done
+  in constant time). The keys ordering is only stored separately when it
+  diverges from the insertion order (i.e. when a key is inserted at a given
+  index).
+
+See :class:`thenamelisttool.namadapter.NativeNamelistAdapter` for the adapter
+class that relies on this parser.
+"""
+
+import collections
+import copy
+import re
+from decimal import Decimal
+
+try:
+    import numpy as np
+    _NUMPY_FOUND = True
+except ImportError:
+    _NUMPY_FOUND = False
+
+#: Sorting option: do not sort anything
+NO_SORTING = 0
+#: Sorting option: sort all keys
+FIRST_ORDER_SORTING = 1
+#: Sorting option: sort only within indexes or attributes of the same key
+SECOND_ORDER_SORTING = 2
+
+# The namelist's grammar (this is the same as in bronx.datagrip.namelist)
+
+_RE_FLAGS = re.IGNORECASE + re.DOTALL
+
+_DIGIT_STRING = '[0-9]+'
+_SIGNED_DIGIT_STRING = '[+-]?' + _DIGIT_STRING
+_KIND_PARAM = '[A-Z0-9]+'
+_SIGNED_INT_LITERAL_CONSTANT = '[+-]?' + _DIGIT_STRING + '(?:_' + _KIND_PARAM + ')?'
+_BOZ_LITERAL_CONSTANT = ('(?:' + 'B(?:\'|")[0-1]+(?:\'|")' + '|' + 'O(?:\'|")[0-7]+(?:\'|")' + '|' +
+                         'Z(?:\'|")[ABCDEF0-9]+(?:\'|")' + ')')
+_SIGNIFICAND = '(?:' + _DIGIT_STRING + r'\.' + '(?:' + _DIGIT_STRING + ')?' + '|' + r'\.' + _DIGIT_STRING + ')'
+_REAL_LITERAL_CONSTANT = ('(?:' + _SIGNIFICAND + '(?:[DE]' + _SIGNED_DIGIT_STRING + ')?' +
+                          '(?:_' + _KIND_PARAM + ')?' + '|' + _DIGIT_STRING +
+                          '[DE]' + _SIGNED_DIGIT_STRING + '(?:_' + _KIND_PARAM + ')?' + ')')
+_SIGNED_REAL_LITERAL_CONSTANT = '[+-]?' + _REAL_LITERAL_CONSTANT
+_COMPLEX_PART = '(?:' + _SIGNED_INT_LITERAL_CONSTANT + '|' + _SIGNED_REAL_LITERAL_CONSTANT + ')'
+_COMPLEX_LITERAL_CONSTANT = '[(]' + _COMPLEX_PART + ',' + _COMPLEX_PART + '[)]'
+_CHAR_LITERAL_CONSTANT = ('(?:' + '(?:' + _KIND_PARAM + '_)?' + "'[^']*'" + '|' +
+                          '(?:' + _KIND_PARAM + '_)?' + '"[^"]*"' + ')')
+_LOGICAL_LITERAL_CONSTANT = ('(?:' + r'\.TRUE\.' + '(?:_' + _KIND_PARAM + ')?' + '|' +
+                             r'\.FALSE\.' + '(?:_' + _KIND_PARAM + ')?' + '|' + '[TF]' + ')')
+
+_LETTER = '[A-Z]'
+_NAME = _LETTER + '[A-Z0-9_]*'
+_STRDELIM_B = '(?P<STRB>[\'"])'
+_STRDELIM_E = '(?(STRB)[\'"])'
+_MACRONAME = _STRDELIM_B + r'?\$?' + '(?P<NAME>[A-Z_][A-Z0-9_]*)' + _STRDELIM_E
+_FREEMACRONAME = _STRDELIM_B + '?' + '[_]{2}' + '(?P<NAME>[A-Z][A-Z0-9_]*)' + '[_]{2}' + _STRDELIM_E
+_ENDOL = r'(?=\s*(,|/|\n))'
+
+# Tokens (they are always matched at a given position of the source text)
+_CLEAN_RE = re.compile(r'(?:\s+|![^\n]*\n)*', _RE_FLAGS)
+_CLEAN_FIRST_RE = re.compile(r'\s|![^\n]*\n', _RE_FLAGS)
+_CLEAN_ENDBLOCK_RE = re.compile(r'(?:\s+|![^\n]*\n|/(?:end)?)*', _RE_FLAGS)
+_BNAME_RE = re.compile(_NAME, _RE_FLAGS)
+_ENTRY_RE = re.compile(_LETTER + r'[ A-Z0-9_,\%\(\):]*' + r'(?=\s*=)', _RE_FLAGS)
+_ENDBLOCK_RE = re.compile(r'/(end)?', _RE_FLAGS)
+_DELADD_RE = re.compile(r'\-+' + _ENDOL, _RE_FLAGS)
+_COMMA_RE = re.compile(r'\s*,', _RE_FLAGS)
+_FREEMACRO_EOL_RE = re.compile(_FREEMACRONAME + _ENDOL, _RE_FLAGS)
+_MACRO_EOL_RE = re.compile(_MACRONAME + _ENDOL, _RE_FLAGS)
+_INT_LCRE = re.compile(_SIGNED_INT_LITERAL_CONSTANT + _ENDOL, _RE_FLAGS)
+_BOZ_LCRE = re.compile(_BOZ_LITERAL_CONSTANT + _ENDOL, _RE_FLAGS)
+_REAL_LCRE = re.compile(_SIGNED_REAL_LITERAL_CONSTANT + _ENDOL, _RE_FLAGS)
+_COMPLEX_LCRE = re.compile(_COMPLEX_LITERAL_CONSTANT + _ENDOL, _RE_FLAGS)
+_CHAR_LCRE = re.compile(_CHAR_LITERAL_CONSTANT + _ENDOL, _RE_FLAGS)
+_LOGICAL_LCRE = re.compile(_LOGICAL_LITERAL_CONSTANT + _ENDOL, _RE_FLAGS)
+
+# Literals
+_INTEGER_RE = re.compile('^' + _SIGNED_INT_LITERAL_CONSTANT + '$', _RE_FLAGS)
+_TRUE_RE = re.compile(r'\.T(?:RUE)?\.|T', _RE_FLAGS)
+_FALSE_RE = re.compile(r'\.F(?:ALSE)?\.|F', _RE_FLAGS)
+# NB: the third argument of re.sub is the *count*: the flags value is used
+# on purpose, since this is what bronx does (for the sake of compatibility).
+_KIND_SUFFIX = '_' + _KIND_PARAM
+_KIND_PREFIX = '^' + _KIND_PARAM + '_'
+
+# Block boundaries (strings and comments are matched so that their content is skipped)
+_SCAN_PATTERN = ('\'[^\']*\'|"[^"]*"|![^\n]*|' +
+                 '(?P<block>&(?P<name>' + _NAME + '))|' +
+                 '(?P<end>/(?:end)?)')
+_SCAN_RE = re.compile(_SCAN_PATTERN, _RE_FLAGS)
+_SCAN_BYTES_RE = re.compile(_SCAN_PATTERN.encode('ascii'), _RE_FLAGS)
+
+_RE_FREEMACRO = re.compile(r'^' + _FREEMACRONAME + r'$')
+_STR2TUP_RE = re.compile(r'(?P<radic>\w+)\((?P<indexes>.+)\)')
+
+
+def parse_integer(string):
+    """Convert a FORTRAN integer literal."""
+    return int(re.sub(_KIND_SUFFIX, '', string, _RE_FLAGS))
+
+
+def parse_boz(string):
+    """Convert a FORTRAN binary, octal or hexadecimal literal."""
+    base = dict(B=2, O=8, Z=16).get(string[0], None)
+    if base is None:
+        raise ValueError("Literal %s doesn't represent a FORTRAN boz" % string)
+    return int(string[2:-1], base)
+
+
+def parse_real(string):
+    """Convert a FORTRAN real literal (into a :class:`decimal.Decimal` object)."""
+    string = re.sub(_KIND_SUFFIX, '', string, _RE_FLAGS)
+    return Decimal(re.sub('d|D', 'E', string, _RE_FLAGS))
+
+
+def parse_complex(string):
+    """Convert a FORTRAN complex literal."""
+    parts = [parse_integer(p) if _INTEGER_RE.match(p) else parse_real(p)
+             for p in string[1:-1].split(',')]
+    return complex(*parts)
+
+
+def parse_character(string):
+    """Convert a FORTRAN character literal."""
+    return re.sub(_KIND_PREFIX, '', string, _RE_FLAGS)[1:-1]
+
+
+def parse_logical(string):
+    """Convert a FORTRAN logical literal."""
+    string = re.sub(_KIND_SUFFIX, '', string, _RE_FLAGS)
+    if _TRUE_RE.match(string):
+        return True
+    elif _FALSE_RE.match(string):
+        return False
+    raise ValueError("Literal %s is a weirdFORTRAN logical" % string)
+
+
+_INT_TYPES = [int]
+_F16_TYPES = []
+_F32_TYPES = []
+_F64_TYPES = [float, Decimal]
+_C64_TYPES = []
+_C128_TYPES = [complex]
+if _NUMPY_FOUND:
+    _INT_TYPES.extend([np.int8, np.int16, np.int32, np.int64,
+                       np.uint8, np.uint16, np.uint32, np.uint64, ])
+    _F16_TYPES.append(np.float16)
+    _F32_TYPES.append(np.float32)
+    _F64_TYPES.append(np.float64)
+    _C64_TYPES.append(np.complex64)
+    _C128_TYPES.append(np.complex128)
+_INT_TYPES = tuple(_INT_TYPES)
+_F16_TYPES = tuple(_F16_TYPES)
+_F32_TYPES = tuple(_F32_TYPES)
+_F64_TYPES = tuple(_F64_TYPES)
+_C64_TYPES = tuple(_C64_TYPES)
+_C128_TYPES = tuple(_C128_TYPES)
+
+
+def encode_real(value, fmt='{0:.15G}'):
+    """Returns the FORTRAN string form of the real ``value``."""
+    if value == 0.:
+        return '0.'
+    real = fmt.format(value).replace('E', 'D')
+    if '.' not in real:
+        real = real.replace('D', '.0D')
+        if '.' not in real:
+            real += '.'
+    return real if 'D' in real else real.rstrip('0')
+
+
+def encode_character(value):
+    """Returns the FORTRAN string form of the character string ``value``."""
+    if "'" in value:
+        return '"{:s}"'.format(value.replace('"', '""') if '"' in value else value)
+    return "'{:s}'".format(value)
+
+
+def encode(value):
+    """Returns the FORTRAN string form of ``value`` (according to its type)."""
+    if isinstance(value, bool):
+        return '.TRUE.' if value else '.FALSE.'
+    elif isinstance(value, _INT_TYPES):
+        return str(value)
+    elif isinstance(value, _F16_TYPES):
+        return encode_real(value, fmt='{0:.3G}')
+    elif isinstance(value, _F32_TYPES):
+        return encode_real(value, fmt='{0:.7G}')
+    elif isinstance(value, _F64_TYPES):
+        return encode_real(value)
+    elif isinstance(value, _C64_TYPES):
+        return '({:s},{:s})'.format(encode_real(value.real, fmt='{0:.7G}'),
+                                    encode_real(value.imag, fmt='{0:.7G}'))
+    elif isinstance(value, _C128_TYPES):
+        return '({:s},{:s})'.format(encode_real(value.real), encode_real(value.imag))
+    elif isinstance(value, str):
+        return encode_character(value)
+    raise ValueError("Type %s cannot be FORTRAN encoded" % type(value))
+
+
+def _str2tup(k):
+    """Split a key into a tuple (that is used when sorting keys)."""
+    split_k = []
+    for a in k.split('%'):
+        table = _STR2TUP_RE.match(a)
+        if table is None:  # scalar
+            split_k.append(a)
+        else:
+            split_k.append(table.group('radic'))
+            strindexes = table.group('indexes')
+            if ':' in strindexes and ',' in strindexes:
+                raise NotImplementedError("both ':' and ',' in array indexes")
+            elif ':' in strindexes:
+                split_k.extend([int(i) for i in strindexes.split(':')])
+            elif ',' in strindexes:
+                split_k.extend([int(i) for i in strindexes.split(',')])
+            else:
+                split_k.append(int(strindexes))
+    return tuple(split_k)
+
+
+class NativeNamelistBlock(collections.abc.MutableMapping):
+    """A namelist block.
+
+    Like with :class:`bronx.datagrip.namelist.NamelistBlock`, keys are not
+    case-sensitive and getting an item returns a single value or a list of
+    values (if there are several of them). On the contrary, :meth:`items` and
+    :meth:`values` iterate over lists of values.
+
+    :param str name: The name of the namelist block
+    """
+
+    __slots__ = ('_name', '_pool', '_order', '_dels', '_subs', '_declared_subs')
+
+    def __init__(self, name='UNKNOWN'):
+        self._name = name.upper()
+        # Key -> list of values. The insertion order is the keys ordering...
+        self._pool = dict()
+        # ...unless a key was inserted at a given index
+        self._order = None
+        self._dels = set()
+        self._subs = dict()
+        self._declared_subs = set()
+
+    def __getstate__(self):
+        return {s: getattr(self, s) for s in self.__slots__}
+
+    def __setstate__(self, state):
+        for s, v in state.items():
+            setattr(self, s, v)
+
+    def __deepcopy__(self, memo):
+        new = self.__class__.__new__(self.__class__)
+        new._name = self._name
+        new._pool = {k: copy.deepcopy(v, memo) for k, v in self._pool.items()}
+        new._order = None if self._order is None else list(self._order)
+        new._dels = set(self._dels)
+        new._subs = copy.deepcopy(self._subs, memo)
+        new._declared_subs = set(self._declared_subs)
+        return new
+
+    @property
+    def name(self):
+        """The namelist block name."""
+        return self._name
+
+    def set_name(self, name):
+        """Change the namelist block name."""
+        self._name = name.upper()
+
+    def __repr__(self):
+        return '<{:s} | name={:s} len={:d}>'.format(self.__class__.__name__, self.name, len(self))
+
+    def __str__(self):
+        return self.dumps()
+
+    def setvar(self, varname, value, index=None):
+        """
+        Insert or change a namelist block variable.
+
+        :param str varname: the variable name
+        :param value: the variable value
+        :param int index: if given, set the key to the given index in block.
+        """
+        varname = varname.upper()
+        if not isinstance(value, list):
+            value = [value, ]
+        # Automatically add free macros to the macro list
+        for v in value:
+            if isinstance(v, str):
+                v_match = _RE_FREEMACRO.match(v)
+                if v_match and v_match.group('NAME') not in self._subs:
+                    self._subs[v_match.group('NAME')] = None
+        if varname not in self._pool:
+            if index is not None:
+                self._fix_order()
+                self._order.insert(index, varname)
+            elif self._order is not None:
+                self._order.append(varname)
+        elif index is not None:
+            self._fix_order()
+            self._order.remove(varname)
+            self._order.insert(index, varname)
+        self._pool[varname] = value
+        self._dels.discard(varname)
+
+    def _fix_order(self):
+        if self._order is None:
+            self._order = list(self._pool)
+
+    __setitem__ = setvar
+
+    def __getitem__(self, varname):
+        """Get ``varname`` variable's value (this is not case sensitive)."""
+        try:
+            value = self._pool[varname.upper()]
+        except KeyError:
+            raise AttributeError("Unknown Namelist variable")
+        return value[0] if len(value) == 1 else value
+
+    def delvar(self, varname):
+        """Delete the specified ``varname`` variable from this block."""
+        varname = varname.upper()
+        if varname in self._pool:
+            del self._pool[varname]
+            if self._order is not None:
+                self._order.remove(varname)
+
+    __delitem__ = delvar
+
+    def __len__(self):
+        return len(self._pool)
+
+    def __iter__(self):
+        return iter(self._pool if self._order is None else self._order)
+
+    def keys(self):
+        """Returns the ordered variable names of the namelist block."""
+        return iter(self)
+
+    def __contains__(self, item):
+        return item.upper() in self._pool
+
+    def values(self):
+        """Returns the lists of values of the namelist block's variables."""
+        return self._pool.values()
+
+    def items(self):
+        """Iterate over the namelist block's variables (and the lists of values)."""
+        for k in self:
+            yield k, self._pool[k]
+
+    def pool(self):
+        """Returns the reference of the internal pool of variables."""
+        return self._pool
+
+    def get(self, *args):
+        """Proxy to the dictionary ``get`` mechanism on the internal pool of variables."""
+        return self._pool.get(*args)
+
+    def update(self, dico):
+        """Updates the pool of keys, and keeps as much as possible the initial order."""
+        for var, value in dico.items():
+            self.setvar(var, value)
+
+    def clear(self, rmkeys=None):
+        """Remove specified keys (**rmkeys**) or completely clear the namelist block."""
+        if rmkeys:
+            for k in rmkeys:
+                self.delvar(k)
+        else:
+            self._pool = dict()
+            self._order = None
+
+    def todelete(self, varname):
+        """Register a key to be deleted."""
+        self._dels.add(varname.upper())
+
+    def rmkeys(self):
+        """Returns a set of key to be deleted in a merge."""
+        return self._dels
+
+    def macros(self):
+        """Returns the list of the macros used in this block."""
+        return self._subs.keys()
+
+    def declaredmacros(self):
+        """Returns the list of old-style declared macros in this block."""
+        return self._declared_subs
+
+    def addmacro(self, macro, value=None):
+        """Add a new macro to this definition block, and/or set a value."""
+        self._subs[macro] = value
+
+    def add_declaredmacro(self, macro, value=None):
+        """Add a new old-style declared macro to this definition block, and/or set a value."""
+        self._subs[macro] = value
+        self._declared_subs.add(macro)
+
+    def possible_macroname(self, item):
+        """Find whether *item* is a macro or not."""
+        if item in self._declared_subs:
+            return item
+        elif isinstance(item, str):
+            fm_match = _RE_FREEMACRO.match(item)
+            if fm_match:
+                return fm_match.group('NAME')
+        return None
+
+    def _xdetect_macroname(self, item):
+        if isinstance(item, str):
+            # Ignore quotes and the dollar sign when matching macro's name
+            if len(item) >= 1 and item[0] in '\'"' and item[-1] == item[0]:
+                item = item[1:-1]
+            if item.startswith('$'):
+                item = item[1:]
+        return self.possible_macroname(item)
+
+    def nice(self, item):
+        """Nice encoded value of the item, possibly substituted with macros."""
+        if isinstance(item, str) or self._declared_subs:
+            macroname = self._xdetect_macroname(item)
+            if macroname is not None:
+                macrovalue = self._subs.get(macroname, None)
+                if macrovalue is None:
+                    return item
+                elif isinstance(macrovalue, (list, tuple)):
+                    return ','.join([encode(value) for value in macrovalue])
+                else:
+                    return encode(macrovalue)
+        return encode(item)
+
+    def dumps_values(self, key):
+        """Nice encoded values (incl. list of)."""
+        return ','.join([self.nice(value) for value in self._pool[key]])
+
+    def sorted_keys(self, sorting=NO_SORTING):
+        """The list of keys, sorted according to **sorting**."""
+        if sorting == NO_SORTING:
+            return list(self)
+        elif sorting == FIRST_ORDER_SORTING:
+            return sorted(self, key=_str2tup)
+        elif sorting == SECOND_ORDER_SORTING:
+            byradics = collections.OrderedDict()
+            for k in self:
+                t = _str2tup(k)
+                byradics.setdefault(t[0], list()).append((t[1:], k))
+            keylist = list()
+            for entries in byradics.values():
+                keylist.extend([k for _, k in sorted(entries, key=lambda x: x[0])])
+            return keylist
+        else:
+            raise ValueError('unknown value for **sorting**:' + str(sorting))
+
+    def dumps(self, sorting=NO_SORTING):
+        """Returns a string of the namelist block that will be readable by fortran parsers."""
+        return ''.join([' &{:s}\n'.format(self._name)] +
+                       ['   {:s}={:s},\n'.format(key, self.dumps_values(key))
+                        for key in self.sorted_keys(sorting)] +
+                       [' /\n', ])
+
+    def merge(self, delta):
+        """Merge the delta provided to the current block.
+
+        :param NativeNamelistBlock delta: The namelist block to merge in.
+        """
+        self.update(delta.pool())
+        for dkey in [x for x in delta.rmkeys() if x in self]:
+            self.delvar(dkey)
+        for dkey in delta.rmkeys():
+            self.todelete(dkey)
+        # Preserve macros
+        for skey in delta.macros():
+            self._subs[skey] = delta._subs[skey]
+            self._declared_subs.update(delta._declared_subs)
+
+
+class NativeNamelistSet(collections.abc.Mapping):
+    """A set of namelist blocks (see :class:`NativeNamelistBlock`).
+
+    Block names are not case-sensitive.
+
+    :param list[NativeNamelistBlock] blocks_set: A list of namelist blocks
+    """
+
+    def __init__(self, blocks_set=()):
+        self._blocks = dict()
+        for nb in blocks_set:
+            self._blocks[nb.name] = nb
+
+    def __contains__(self, key):
+        return key.upper() in self._blocks
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def __iter__(self):
+        return iter(self._blocks)
+
+    def __getitem__(self, key):
+        return self._blocks[key.upper()]
+
+    def __setitem__(self, key, value):
+        assert isinstance(value, NativeNamelistBlock)
+        key = key.upper()
+        if value.name != key:
+            value = copy.deepcopy(value)
+            value.set_name(key)
+        self._blocks[key] = value
+
+    def __delitem__(self, key):
+        del self._blocks[key.upper()]
+
+    def add(self, namblock):
+        """Add a namelist block object to the present namelist set."""
+        self[namblock.name] = namblock
+
+    def newblock(self, name):
+        """Construct a new block (if it does not already exist)."""
+        if name not in self:
+            self[name] = NativeNamelistBlock(name=name)
+        return self[name]
+
+    def mvblock(self, sourcename, destname):
+        """Rename a namelist block."""
+        assert destname not in self, "Block {:s} already exists".format(destname)
+        block = self[sourcename]
+        del self[sourcename]
+        self[destname] = block
+
+    def setmacro(self, item, value):
+        """Set macro value for further substitution (in all of the namelist blocks)."""
+        for namblock in self._blocks.values():
+            if item in namblock.macros():
+                namblock.addmacro(item, value)
+
+    def merge(self, delta):
+        """Merge of the current namelist set with the set of namelist blocks provided."""
+        for namblock in delta.values():
+            if namblock.name in self._blocks:
+                self._blocks[namblock.name].merge(namblock)
+            else:
+                self.add(copy.deepcopy(namblock))
+
+    def dumps(self, sorting=NO_SORTING, block_sorting=True):
+        """Join the fortran's strings dumped by each namelist block.
+
+        :param sorting: Sorting option (for keys)
+        :param bool block_sorting: if True, namelist blocks are ordered based
+                                   on their name.
+        """
+        blocks = sorted(self._blocks) if block_sorting else self._blocks
+        return ''.join([self._blocks[b].dumps(sorting=sorting) for b in blocks])
+
+
+class NativeNamelistParser:
+    """Parse a namelist's text in a single pass.
+
+    :param macros: The names of the declared macros
+    """
+
+    def __init__(self, macros=None):
+        self._declaredmacros = set(macros) if macros else set()
+
+    def parse(self, text):
+        """Parse a namelist **text** and return a :class:`NativeNamelistSet` object."""
+        blocks = list()
+        last_slash = text.rfind('/')
+        pos = 0
+        while pos < len(text):
+            amp = text.find('&', pos)
+            if amp == -1 or amp > last_slash:
+                break
+            block, pos = self._parse_block(text, pos)
+            blocks.append(block)
+        return NativeNamelistSet(blocks)
+
+    @staticmethod
+    def _clean(text, pos):
+        """Skip spaces and comments."""
+        return _CLEAN_RE.match(text, pos).end()
+
+    def _skip_value(self, text, pos, item):
+        """Skip a value, and the following comma if present."""
+        pos = self._clean(text, pos + len(item))
+        c_match = _COMMA_RE.match(text, pos)
+        if c_match:
+            pos = self._clean(text, c_match.end())
+        return pos
+
+    def _parse_block(self, text, pos):
+        """Parse a block of namelist that starts at **pos**."""
+        if _CLEAN_FIRST_RE.match(text, pos):
+            pos = _CLEAN_ENDBLOCK_RE.match(text, pos).end()
+        b_match = _BNAME_RE.match(text, pos + 1)
+        if b_match is None:
+            raise ValueError("Badly formatted FORTRAN namelist: [[%s]]" % text[pos:pos + 32])
+        namelist = NativeNamelistBlock(b_match.group(0))
+        pos = self._clean(text, b_match.end())
+
+        current = None
+        values = list()
+        declared = self._declaredmacros
+
+        while pos < len(text):
+
+            e_match = _ENTRY_RE.match(text, pos)
+            if e_match and not _LOGICAL_LCRE.match(text, pos):
+                # Got a new entry in the namelist block
+                if current:
+                    namelist.setvar(current, values)
+                current = e_match.group(0).strip()
+                values = list()
+                pos = self._clean(text, pos + len(current))
+                # Removes equal
+                pos = self._clean(text, pos + 1)
+                continue
+
+            eb_match = _ENDBLOCK_RE.match(text, pos)
+            if eb_match:
+                if current:
+                    namelist.setvar(current, values)
+                pos = eb_match.end()
+                break
+
+            d_match = _DELADD_RE.match(text, pos)
+            if d_match:
+                if current is None:
+                    raise ValueError("Badly formatted FORTRAN namelist: [[%s]]" % text[pos:pos + 32])
+                namelist.todelete(current)
+                current = None
+                pos = self._skip_value(text, pos, d_match.group(0))
+                continue
+
+            m_match = _FREEMACRO_EOL_RE.match(text, pos)
+            if m_match:
+                values.append(m_match.group(0))
+                pos = self._skip_value(text, pos, m_match.group(0))
+                continue
+
+            m_match = _MACRO_EOL_RE.match(text, pos)
+            if m_match and m_match.group('NAME') in declared:
+                namelist.add_declaredmacro(m_match.group('NAME'), None)
+                values.append(m_match.group(0))
+                pos = self._skip_value(text, pos, m_match.group(0))
+                continue
+
+            for lcre, converter in ((_INT_LCRE, parse_integer),
+                                    (_BOZ_LCRE, parse_boz),
+                                    (_REAL_LCRE, parse_real),
+                                    (_COMPLEX_LCRE, parse_complex),
+                                    (_CHAR_LCRE, parse_character),
+                                    (_LOGICAL_LCRE, parse_logical)):
+                l_match = lcre.match(text, pos)
+                if l_match:
+                    values.append(converter(l_match.group(0)))
+                    pos = self._skip_value(text, pos, l_match.group(0))
+                    break
+            else:
+                raise ValueError("Badly formatted FORTRAN namelist: [[%s]]" % text[pos:pos + 32])
+
+        return namelist, pos
+
+
+def scan_blocks(data):
+    """Find the boundaries of the namelist blocks in **data** (without parsing their content).
+
+    :param data: The namelist's text (a string or any bytes-like object, e.g. a
+                 :class:`mmap.mmap` object)
+    :return: The list of ``(name, start, end)`` tuples that describe each of
+             the namelist blocks (the block's text is ``data[start:end]``)
+    """
+    scan_re = _SCAN_RE if isinstance(data, str) else _SCAN_BYTES_RE
+    blocks = list()
+    current = None
+    for t_match in scan_re.finditer(data):
+        if current is None:
+            if t_match.group('block') is not None:
+                current = (t_match.group('name'), t_match.start())
+        elif t_match.group('end') is not None:
+            blocks.append(current + (t_match.end(), ))
+            current = None
+    if current is not None:
+        blocks.append(current + (len(data), ))
+    if not isinstance(data, str):
+        blocks = [(name.decode('ascii'), start, end) for name, start, end in blocks]
+    return blocks
+
+
+def parse(text, macros=None):
+    """Parse a namelist **text** and return a :class:`NativeNamelistSet` object.
+
+    :param macros: The names of the declared macros
+    """
+    return NativeNamelistParser(macros=macros).parse(text)
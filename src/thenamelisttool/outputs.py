@@ -0,0 +1,182 @@
+"""
+Atomic, change-aware, writing of the output files.
+
+All the TNT utilities write their output files through an :class:`OutputSink`
+object:
+
+* If the target file already exists and has exactly the same content, nothing
+  is written (the modification time of the file is preserved, which matters
+  for the incremental builds that may run downstream);
+* Otherwise, the content is written in a temporary file (in the same
+  directory) that is then renamed. Consequently, readers never see a partially
+  written file. When the target is a symbolic link, the file it points to is
+  replaced.
+
+By default, ``fsync`` is never called. It can be called for each of the files
+(``each``) or once for all the files written during a run (``batch``, see
+:meth:`OutputSink.flush`). The default sink is configured using
+:func:`set_default_sync` or the ``TNT_OUTPUT_SYNC`` environment variable (the
+worker processes of :mod:`thenamelisttool.workers` use the same fsync mode as
+their parent process).
+"""
+
+import hashlib
+import os
+import tempfile
+
+from bronx.fancies import loggers
+
+tntlog = loggers.getLogger('tntlog')
+
+#: Environment variable that holds the ``fsync`` mode of the default sink
+SYNC_ENV = 'TNT_OUTPUT_SYNC'
+
+#: Never call fsync
+SYNC_NONE = 'none'
+#: Call fsync each time a file is written
+SYNC_EACH = 'each'
+#: Call fsync for all the files written during the run (see :meth:`OutputSink.flush`)
+SYNC_BATCH = 'batch'
+#: The available fsync modes
+SYNC_MODES = (SYNC_NONE, SYNC_EACH, SYNC_BATCH)
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _file_digest(path):
+    """The SHA256 digest of the **path** file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fhin:
+        for chunk in iter(lambda: fhin.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _fsync_path(path):
+    """Call fsync on a file or a directory."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _default_mode():
+    """The permissions of a newly created file (according to the umask)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+class OutputSink:
+    """Write files atomically, unless their content did not change.
+
+    :param str sync: The fsync mode (one of :data:`SYNC_MODES`)
+    """
+
+    def __init__(self, sync=SYNC_NONE):
+        if sync not in SYNC_MODES:
+            raise ValueError('Unknown fsync mode: {!s}'.format(sync))
+        self._sync = sync
+        self._pending = list()
+        self.nwritten = 0
+        self.nunchanged = 0
+
+    @property
+    def sync(self):
+        """The fsync mode."""
+        return self._sync
+
+    def write(self, path, content, encoding='ascii'):
+        """Write **content** (a string or bytes) in the **path** file.
+
+        :return: ``True`` if the file was actually written, ``False`` if it
+                 already had the right content.
+        """
+        if isinstance(content, str):
+            content = content.encode(encoding)
+        target = os.path.realpath(path)
+        try:
+            t_stat = os.stat(target)
+        except FileNotFoundError:
+            t_stat = None
+        if (t_stat is not None and t_stat.st_size == len(content) and
+                _file_digest(target) == hashlib.sha256(content).digest()):
+            tntlog.debug('"%s" is unchanged: not written.', path)
+            self.nunchanged += 1
+            return False
+        dirname = os.path.dirname(target)
+        fd, tmppath = tempfile.mkstemp(prefix='.' + os.path.basename(target) + '.', dir=dirname)
+        try:
+            with os.fdopen(fd, 'wb') as fhout:
+                fhout.write(content)
+                if self._sync == SYNC_EACH:
+                    fhout.flush()
+                    os.fsync(fhout.fileno())
+            os.chmod(tmppath, t_stat.st_mode & 0o7777 if t_stat is not None else _default_mode())
+            os.replace(tmppath, target)
+        except BaseException:
+            os.unlink(tmppath)
+            raise
+        if self._sync == SYNC_EACH:
+            _fsync_path(dirname)
+        elif self._sync == SYNC_BATCH:
+            self._pending.append(target)
+        self.nwritten += 1
+        return True
+
+    def take_pending(self):
+        """Return (and forget) the list of files that are waiting to be synced.
+
+        This is meant to be used in worker processes (the list is then given
+        to the parent process's sink using :meth:`add_pending`).
+        """
+        pending = self._pending
+        self._pending = list()
+        return pending
+
+    def add_pending(self, paths):
+        """Add **paths** to the list of files that are waiting to be synced."""
+        if self._sync == SYNC_BATCH:
+            self._pending.extend(paths)
+
+    def flush(self):
+        """In ``batch`` mode, call fsync on the files written so far (and on their directories)."""
+        pending = self.take_pending()
+        directories = set()
+        for path in sorted(set(pending)):
+            try:
+                _fsync_path(path)
+            except FileNotFoundError:
+                continue  # It has been removed in the meantime
+            directories.add(os.path.dirname(path))
+        for dirname in sorted(directories):
+            _fsync_path(dirname)
+        if pending:
+            tntlog.debug('fsync called on %d file(s).', len(pending))
+
+
+_DEFAULT_SINK = None
+
+
+def set_default_sync(sync):
+    """Set the fsync mode of the default sink."""
+    global _DEFAULT_SINK
+    _DEFAULT_SINK = OutputSink(sync)
+
+
+def get_default_sink():
+    """Return the default :class:`OutputSink` object.
+
+    Unless :func:`set_default_sync` was called before, it is configured using
+    the ``TNT_OUTPUT_SYNC`` environment variable.
+    """
+    global _DEFAULT_SINK
+    if _DEFAULT_SINK is None:
+        _DEFAULT_SINK = OutputSink(os.environ.get(SYNC_ENV, None) or SYNC_NONE)
+    return _DEFAULT_SINK
+
+
+def write_file(path, content, encoding='ascii'):
+    """Write **content** in the **path** file using the default sink (see :meth:`OutputSink.write`)."""
+    return get_default_sink().write(path, content, encoding=encoding)
@@ -0,0 +1,292 @@
+"""
+A persistent, content-addressed, cache of parsed namelists.
+
+Parsing a namelist file is by far the most expensive operation performed by
+the TNT utilities. Since the same reference namelists tend to be parsed over
+and over again, the result of the parsing can be stored on the local disk and
+re-used later on.
+
+Cache entries are keyed by a hash of the namelist's text and of the effective
+set of macros. Consequently, any modification of the namelist file (or of the
+macros) automatically leads to a cache miss. The total size of the cache
+directory is bounded: when it is exceeded, the least recently used entries are
+removed.
+
+An in-memory cache (see :class:`MemoryParseCache`) is also available: it is
+useful for long-running processes (e.g. the TNT daemon). Both derive from
+:class:`AbstractParseCache`.
+
+The cache is opt-in. It is activated either programmatically (see
+:func:`set_default_cache`) or by setting the ``TNT_PARSE_CACHE`` environment
+variable to the path of the cache directory (the maximum size of the cache, in
+bytes, can be specified using the ``TNT_PARSE_CACHE_MAXSIZE`` environment
+variable).
+"""
+
+import abc
+import collections
+import hashlib
+import os
+import tempfile
+
+from bronx.fancies import loggers
+
+tntlog = loggers.getLogger('tntlog')
+
+#: Environment variable that holds the path to the cache directory
+CACHE_DIR_ENV = 'TNT_PARSE_CACHE'
+#: Environment variable that holds the maximum size of the cache (in bytes)
+CACHE_MAXSIZE_ENV = 'TNT_PARSE_CACHE_MAXSIZE'
+#: The default maximum size of the cache (in bytes)
+DEFAULT_MAXSIZE = 256 * 1024 * 1024
+
+#: Increment this when the layout of the cached objects changes
+_CACHE_FORMAT = 1
+_CACHE_SUFFIX = '.pickle'
+
+
+class AbstractParseCache(metaclass=abc.ABCMeta):
+    """Every parse cache must derive from this abstract class.
+
+    :param int maxsize: The maximum size of the cache (in bytes)
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self._maxsize = int(maxsize)
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def maxsize(self):
+        """The maximum size of the cache (in bytes)."""
+        return self._maxsize
+
+    @property
+    def hits(self):
+        """The number of successful lookups (since the object creation)."""
+        return self._hits
+
+    @property
+    def misses(self):
+        """The number of unsuccessful lookups (since the object creation)."""
+        return self._misses
+
+    @property
+    def evictions(self):
+        """The number of entries removed by the LRU policy (since the object creation)."""
+        return self._evictions
+
+    def stats(self):
+        """Return a dictionary that summarises the cache activity."""
+        return dict(hits=self.hits, misses=self.misses, evictions=self.evictions)
+
+    def reset_stats(self):
+        """Reset the hit/miss/eviction counters."""
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def key(text, macros=None, namespace=''):
+        """Compute the cache key associated with a namelist **text** and **macros**.
+
+        :param str text: The namelist's content
+        :param dict macros: The effective set of macros
+        :param str namespace: An additional string that should be part of the
+                              key (e.g. the name and version of the namelist's parser)
+        """
+        h = hashlib.sha256()
+        h.update('{:d}|{:s}|'.format(_CACHE_FORMAT, namespace).encode('utf-8'))
+        h.update(text.encode('utf-8', errors='surrogateescape'))
+        for m, v in sorted((macros or dict()).items()):
+            h.update('|{:s}={!r}'.format(m, v).encode('utf-8'))
+        return h.hexdigest()
+
+    @abc.abstractmethod
+    def get(self, key):
+        """Return the object associated with **key** (or ``None`` on cache miss)."""
+        pass
+
+    @abc.abstractmethod
+    def put(self, key, obj):
+        """Store **obj** in the cache (and evict old entries if necessary)."""
+        pass
+
+    @abc.abstractmethod
+    def clear(self):
+        """Remove all the cache entries."""
+        pass
+
+
+class NamelistParseCache(AbstractParseCache):
+    """Store parsed namelist's objects on disk (with LRU eviction).
+
+    :param str cachedir: The directory where cache entries are stored
+    :param int maxsize: The maximum size of the cache directory (in bytes)
+    """
+
+    def __init__(self, cachedir, maxsize=DEFAULT_MAXSIZE):
+        super().__init__(maxsize)
+        self._cachedir = os.path.abspath(cachedir)
+        os.makedirs(self._cachedir, exist_ok=True)
+
+    @property
+    def cachedir(self):
+        """The directory where cache entries are stored."""
+        return self._cachedir
+
+    def _entry_path(self, key):
+        return os.path.join(self._cachedir, key + _CACHE_SUFFIX)
+
+    def get(self, key):
+        """Return the object associated with **key** (or ``None`` on cache miss)."""
+        import pickle
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as fhc:
+                obj = pickle.load(fhc)
+        except FileNotFoundError:
+            self._misses += 1
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as e:
+            tntlog.warning('Discarding the corrupted parse cache entry "%s": %s', path, str(e))
+            self._discard(path)
+            self._misses += 1
+            return None
+        try:
+            # Refresh the access time (this is what the LRU policy relies on)
+            os.utime(path)
+        except OSError:
+            pass
+        self._hits += 1
+        return obj
+
+    def put(self, key, obj):
+        """Store **obj** in the cache (and evict old entries if necessary)."""
+        import pickle
+        fd, tmppath = tempfile.mkstemp(prefix='.tmp_', suffix=_CACHE_SUFFIX, dir=self._cachedir)
+        try:
+            with os.fdopen(fd, 'wb') as fhc:
+                pickle.dump(obj, fhc, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmppath, self._entry_path(key))
+        except BaseException:
+            self._discard(tmppath)
+            raise
+        self._evict()
+
+    def clear(self):
+        """Remove all the cache entries."""
+        for entry in self._entries():
+            self._discard(entry.path)
+
+    def _entries(self):
+        with os.scandir(self._cachedir) as it:
+            return [e for e in it
+                    if e.is_file() and not e.name.startswith('.') and e.name.endswith(_CACHE_SUFFIX)]
+
+    @staticmethod
+    def _discard(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Remove the least recently used entries until the size limit is met."""
+        entries = list()
+        for e in self._entries():
+            try:
+                st = e.stat()
+            except FileNotFoundError:
+                continue  # Removed by a concurrent process
+            entries.append((st.st_mtime, st.st_size, e.path))
+        total = sum([e[1] for e in entries])
+        for _, size, path in sorted(entries):
+            if total <= self._maxsize:
+                break
+            self._discard(path)
+            total -= size
+            self._evictions += 1
+
+
+class MemoryParseCache(AbstractParseCache):
+    """Store parsed namelist's objects in memory (with LRU eviction).
+
+    Objects are stored pickled (each :meth:`get` returns a new object).
+
+    :param int maxsize: The maximum size of the pickled objects (in bytes)
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        super().__init__(maxsize)
+        self._data = collections.OrderedDict()
+        self._size = 0
+
+    def get(self, key):
+        """Return the object associated with **key** (or ``None`` on cache miss)."""
+        import pickle
+        data = self._data.get(key, None)
+        if data is None:
+            self._misses += 1
+            return None
+        self._data.move_to_end(key)
+        self._hits += 1
+        return pickle.loads(data)
+
+    def put(self, key, obj):
+        """Store **obj** in the cache (and evict old entries if necessary)."""
+        import pickle
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        previous = self._data.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+        self._data[key] = data
+        self._size += len(data)
+        self._evict()
+
+    def clear(self):
+        """Remove all the cache entries."""
+        self._data.clear()
+        self._size = 0
+
+    def _evict(self):
+        """Remove the least recently used entries until the size limit is met."""
+        while self._size > self._maxsize and self._data:
+            _, data = self._data.popitem(last=False)
+            self._size -= len(data)
+            self._evictions += 1
+
+
+_DEFAULT_CACHE = None
+_DEFAULT_CACHE_INITIALISED = False
+
+
+def set_default_cache(cache):
+    """Set (or unset if **cache** is ``None``) the parse cache used by default.
+
+    :param AbstractParseCache cache: The parse cache (on disk or in memory)
+    """
+    global _DEFAULT_CACHE, _DEFAULT_CACHE_INITIALISED
+    assert cache is None or isinstance(cache, AbstractParseCache)
+    _DEFAULT_CACHE = cache
+    _DEFAULT_CACHE_INITIALISED = True
+
+
+def get_default_cache():
+    """Return the parse cache used by default (``None`` if caching is disabled).
+
+    Unless :func:`set_default_cache` was called before, the cache is configured
+    using the ``TNT_PARSE_CACHE`` and ``TNT_PARSE_CACHE_MAXSIZE`` environment
+    variables.
+    """
+    global _DEFAULT_CACHE, _DEFAULT_CACHE_INITIALISED
+    if not _DEFAULT_CACHE_INITIALISED:
+        cachedir = os.environ.get(CACHE_DIR_ENV, None)
+        if cachedir:
+            _DEFAULT_CACHE = NamelistParseCache(
+                cachedir,
+                maxsize=int(os.environ.get(CACHE_MAXSIZE_ENV, DEFAULT_MAXSIZE))
+            )
+        _DEFAULT_CACHE_INITIALISED = True
+    return _DEFAULT_CACHE
@@ -0,0 +1,226 @@
+"""
+Profiling of the TNT utilities (see the ``--profile`` option of the command
+line utilities).
+
+The time spent in the various phases of a run (YAML loading, namelists
+parsing, directives application, namelists serialisation and files writing)
+is recorded for each of the processed files (or tntstack's actions), together
+with the peak of the memory allocated by Python during each phase (if
+:mod:`tracemalloc` is tracing).
+
+When profiling is not enabled, :func:`phase` returns a no-op context manager:
+the overhead is negligible (and the modules needed for profiling are not even
+imported).
+"""
+
+import collections
+import contextlib
+import os
+import sys
+import time
+
+#: Loading of a YAML file (directives, recipes, ...)
+PHASE_YAML = 'yaml'
+#: Parsing of a namelist
+PHASE_PARSE = 'parse'
+#: Application of directives (or merge of ingredients)
+PHASE_APPLY = 'apply'
+#: Serialisation (and sorting) of a namelist
+PHASE_DUMPS = 'dumps'
+#: Writing of an output file
+PHASE_WRITE = 'write'
+#: Comparison of namelists
+PHASE_DIFF = 'diff'
+#: A tntstack's action (as a whole)
+PHASE_ACTION = 'action'
+
+#: A measure: the time spent in a *phase* (for a given *item*) and the peak
+#: of the memory allocated during the phase (``None`` if not traced)
+ProfileRecord = collections.namedtuple('ProfileRecord', ('phase', 'item', 'elapsed', 'peak'))
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+def _reset_peak():
+    import tracemalloc
+    # tracemalloc.reset_peak is only available with Python >= 3.9
+    reset = getattr(tracemalloc, 'reset_peak', None)
+    if reset is not None:
+        reset()
+
+
+class Profiler:
+    """Record the time (and memory) spent in the various phases of a run."""
+
+    def __init__(self):
+        self.records = list()
+        self._peaks = list()
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name, item=None):
+        """Measure the code executed within the context (see :data:`ProfileRecord`)."""
+        import tracemalloc
+        traced = tracemalloc.is_tracing()
+        if traced:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                # Save the peak of the enclosing phase before resetting it
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            _reset_peak()
+            self._peaks.append(current)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = None
+            if traced:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+            self.records.append(ProfileRecord(name, item, elapsed, peak))
+
+    def mark(self):
+        """Return a marker that can be given to :meth:`records_since`."""
+        return len(self.records)
+
+    def records_since(self, mark):
+        """The list of records made since **mark** was obtained (see :meth:`mark`)."""
+        return self.records[mark:]
+
+    def add_records(self, records):
+        """Add **records** (e.g. made by worker processes)."""
+        self.records.extend([ProfileRecord(*r) for r in records])
+
+    def summary(self):
+        """Return a summary of the records (as a JSON serialisable dictionary)."""
+        import tracemalloc
+        phases = collections.OrderedDict()
+        for record in self.records:
+            p_summary = phases.setdefault(record.phase, dict(count=0, total=0., max=0., peak=None))
+            p_summary['count'] += 1
+            p_summary['total'] += record.elapsed
+            p_summary['max'] = max(p_summary['max'], record.elapsed)
+            if record.peak is not None:
+                p_summary['peak'] = max(p_summary['peak'] or 0, record.peak)
+        return dict(elapsed=time.perf_counter() - self._start,
+                    tracemalloc_peak=tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None,
+                    phases=phases,
+                    records=[r._asdict() for r in self.records])
+
+    def table(self, top=10):
+        """Return a human-readable report: the time spent per phase and the **top** slowest records."""
+        summary = self.summary()
+        lines = ['{:10s} {:>7s} {:>10s} {:>10s} {:>12s}'
+                 .format('phase', 'count', 'total (s)', 'max (s)', 'peak (kiB)')]
+        for name, p_summary in sorted(summary['phases'].items(), key=lambda item: -item[1]['total']):
+            lines.append('{:10s} {:7d} {:10.4f} {:10.4f} {:>12s}'
+                         .format(name, p_summary['count'], p_summary['total'], p_summary['max'],
+                                 _kib(p_summary['peak'])))
+        lines.append('')
+        lines.append('Top {:d} (slowest):'.format(top))
+        for record in sorted(self.records, key=lambda r: -r.elapsed)[:top]:
+            lines.append('{:10s} {:10.4f}s {:>12s} kiB  {!s}'
+                         .format(record.phase, record.elapsed, _kib(record.peak), record.item or ''))
+        lines.append('Total elapsed time: {:.4f}s'.format(summary['elapsed']))
+        return '\n'.join(lines)
+
+
+def _kib(value):
+    return '-' if value is None else '{:d}'.format(value // 1024)
+
+
+_PROFILER = None
+
+
+def enable():
+    """Create and activate a new :class:`Profiler` object (it is returned)."""
+    global _PROFILER
+    _PROFILER = Profiler()
+    return _PROFILER
+
+
+def disable():
+    """Deactivate profiling."""
+    global _PROFILER
+    _PROFILER = None
+
+
+def get_profiler():
+    """Return the active :class:`Profiler` object (or ``None``)."""
+    return _PROFILER
+
+
+def phase(name, item=None):
+    """Measure the code executed within the context (if profiling is enabled)."""
+    if _PROFILER is None:
+        return _NULL_CONTEXT
+    return _PROFILER.phase(name, item)
+
+
+# Command line utilities support
+#
+
+def add_arguments(parser):
+    """Add the profiling options to an :class:`argparse.ArgumentParser` object."""
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--profile',
+                       dest='profile',
+                       action='store_true',
+                       help='time the various phases of the run (YAML loading, parsing, \
+                             directives application, dumps, writing) for each file and \
+                             record memory peaks. A JSON summary is written and the \
+                             slowest phases are displayed.',
+                       default=False)
+    group.add_argument('--profile-output',
+                       dest='profile_output',
+                       help='the JSON summary file (default: PROG.profile.json).',
+                       default=None)
+    group.add_argument('--profile-top',
+                       dest='profile_top',
+                       type=int,
+                       help='the number of records displayed (default: 10).',
+                       default=10)
+    group.add_argument('--profile-cprofile',
+                       dest='profile_cprofile',
+                       help='also dump cProfile statistics in this file (implies --profile).',
+                       default=None)
+
+
+@contextlib.contextmanager
+def cli_profiling(args, prog):
+    """Profile the code executed within the context, according to the **args** options.
+
+    :param args: The :class:`argparse.Namespace` object (see :func:`add_arguments`)
+    :param str prog: The name of the command line utility
+    """
+    if not (args.profile or args.profile_cprofile):
+        yield None
+        return
+    import cProfile
+    import json
+    import tracemalloc
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    profiler = enable()
+    cprofiler = None
+    if args.profile_cprofile:
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+    try:
+        yield profiler
+    finally:
+        if cprofiler is not None:
+            cprofiler.disable()
+            cprofiler.dump_stats(args.profile_cprofile)
+        disable()
+        summary = profiler.summary()
+        if not was_tracing:
+            tracemalloc.stop()
+        output = args.profile_output or '{:s}.profile.json'.format(prog)
+        with open(output, 'w') as fhout:
+            json.dump(summary, fhout, indent=2)
+        sys.stderr.write(profiler.table(top=args.profile_top) + '\n')
+        sys.stderr.write('Profile summary written in: {:s}\n'.format(os.path.abspath(output)))
@@ -12,6 +12,8 @@ $ko
 UNCHANGED NAMELISTS
 -------------------
 
+($nidentical of them are byte-identical and were not parsed)
+
 $untouched
 
 -------------
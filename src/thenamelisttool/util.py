@@ -2,16 +2,20 @@
 Utility methods widely used in the various TNT utilities.
 """
 
+import collections
 import contextlib
+import fnmatch
 import glob
 import logging
 import os
 import shutil
+import time
 
 from bronx.fancies import loggers
 from bronx.fancies.colors import termcolors
-from .namadapter import BronxNamelistAdapter, NO_SORTING, FIRST_ORDER_SORTING, SECOND_ORDER_SORTING
-from .config import TntRecipe
+from .namadapter import namelist_adapter, NO_SORTING, FIRST_ORDER_SORTING, SECOND_ORDER_SORTING
+from .config import TntDirective, TntDirectivePlan, TntRecipe, TntRecipeSources, read_directives
+from . import incremental, instrumentation, outputs, profiling, workers
 
 tntlog = loggers.getLogger('tntlog')
 tntstacklog = loggers.getLogger('tntstacklog')
@@ -65,159 +69,526 @@ def process_namelist(filename, directives,
                      if not given as **outfilename**.
     :param outfilename: target file for out namelist
     :param sorting: Sorting option (from bronx.datagrip.namelist):
-                    NO_SORTING;
+                    NO_SORTING => the blocks that are not modified are
+                    copied verbatim from the original file;
                     FIRST_ORDER_SORTING => sort all keys within blocks;
                     SECOND_ORDER_SORTING => sort only within indexes or
                     attributes of the same key, within blocks.
     :param blocks_ref: if not None, defines the path for a reference namelist to
                        which the set of blocks is asserted to be equal.
     :param doctor: if True, try to convert value to DOCTOR norm according type
-                   for moved keys
+                   for moved keys and keys to set
     :param keep_index: if True, moved keys in identical block keep the original
                        index of key in block (except a sorting is requested
                        later on.
     :param squeeze: squeeze the namelist: remove empty blocks.
-    """
-    if not isinstance(directives, (list, tuple)):
-        directives = [directives, ]
 
-    # The initial namelist
-    initial_nam = BronxNamelistAdapter(filename, macros=directives[0].macros)
+    **directives** may be a :class:`~thenamelisttool.config.TntDirective`
+    object, a list of such objects or an already compiled
+    :class:`~thenamelisttool.config.TntDirectivePlan` object (in the latter
+    case, the **doctor** and **keep_index** options are ignored since they
+    were provided when the plan was compiled).
 
-    # Target namelist file
-    if not in_place:
-        target_namfile = outfilename or filename + '.tnt'
+    The time spent is reported to the observers registered in
+    :mod:`thenamelisttool.instrumentation` (as a ``process_namelist``
+    operation), together with the namelist's operations.
+    """
+    with instrumentation.measure(instrumentation.OP_PROCESS_NAMELIST):
+        if isinstance(directives, TntDirectivePlan):
+            plan = directives
+        else:
+            if not isinstance(directives, (list, tuple)):
+                directives = [directives, ]
+            plan = TntDirectivePlan.chain([d.compile(doctor=doctor, keep_index=keep_index)
+                                           for d in directives])
+
+        # The initial namelist
+        with profiling.phase(profiling.PHASE_PARSE, filename):
+            initial_nam = namelist_adapter(filename, macros=plan.macros)
+
+        # Target namelist file
+        if not in_place:
+            target_namfile = outfilename or filename + '.tnt'
+        else:
+            target_namfile = filename
+            if outfilename is not None:
+                raise ValueError("Incompatibility between arguments *outfilename* and *in_place*.")
+
+        with profiling.phase(profiling.PHASE_APPLY, filename):
+            plan.apply(initial_nam)
+
+            if squeeze:
+                initial_nam.squeeze()
+
+            if blocks_ref is not None:
+                cb = initial_nam.check_blocks(blocks_ref, plan.macros)
+                if len(cb) != 0:
+                    tntlog.warning('Set of blocks is different from reference: ' + blocks_ref)
+                    tntlog.warning('diff: ' + str(cb))
+
+        # Untouched blocks are copied verbatim (unless non-ASCII comments would
+        # be copied along with them)
+        with profiling.phase(profiling.PHASE_DUMPS, filename):
+            namout = initial_nam.splice_dumps(sorting=sorting)
+            if not namout.isascii():
+                tntlog.warning('%s: non-ASCII characters in the untouched blocks. ' +
+                               'The whole namelist is re-generated (comments are lost).', filename)
+                namout = initial_nam.dumps(sorting=sorting)
+        with profiling.phase(profiling.PHASE_WRITE, target_namfile):
+            outputs.write_file(target_namfile, namout)
+
+
+def _process_namelist_job(filename, directives, verbose, options):
+    """Process a single namelist (in a worker process)."""
+    with set_verbose(verbose, filename):
+        process_namelist(filename, directives, **options)
+    return outputs.get_default_sink().take_pending()
+
+
+def process_namelists(filenames, directives, jobs=1, verbose=False, **options):
+    """
+    Apply **directives** to several namelist files, concurrently, using a pool
+    of **jobs** worker processes.
+
+    The log messages issued while processing a given namelist are displayed
+    all at once, in the order of **filenames**. Contrary to
+    :func:`process_namelist`, an error does not abort the whole run: it is
+    logged and processing continues with the next namelist.
+
+    :param list[str] filenames: The list of namelist files to process
+    :param directives: The directives to apply (see :func:`process_namelist`)
+    :param int jobs: The number of worker processes
+    :param bool verbose: Verbosity of the log messages
+    :param options: Any option accepted by :func:`process_namelist`
+    :return: The list of ``(filename, error_message)`` tuples for the namelists
+             that could not be processed.
+    """
+    failures = list()
+    outcomes = workers.map_jobs(_process_namelist_job,
+                                [(f, directives, verbose, options) for f in filenames],
+                                jobs=jobs)
+    for filename, outcome in zip(filenames, outcomes):
+        with set_verbose(verbose, filename):
+            workers.replay_records(outcome.records)
+            outputs.get_default_sink().add_pending(outcome.value or ())
+            if outcome.error is not None:
+                tntlog.error("Namelist '%s' could not be processed: %s", filename, outcome.error)
+                failures.append((filename, outcome.error))
+    return failures
+
+
+#: The result of a manifest's job: the *namelist* file, the *target* file it
+#: was written to, the time it took (in seconds) or the error message (see
+#: :func:`process_manifest`)
+ManifestReport = collections.namedtuple('ManifestReport', ('namelist', 'target', 'elapsed', 'error'))
+
+
+def _read_manifest_directive(job):
+    """Read the directive used by a manifest's **job**."""
+    kind, _ = job.source
+    if kind == 'directives':
+        return read_directives(job.directives)
+    elif kind == 'namdelta':
+        with open(job.namdelta) as fhnam:
+            return TntDirective(namdelta=fhnam.read())
     else:
-        target_namfile = filename
-        if outfilename is not None:
-            raise ValueError("Incompatibility between arguments *outfilename* and *in_place*.")
-
-    for d in directives:
-        # process (in the appropriate order !)
-        if d.new_blocks is not None:
-            initial_nam.add_blocks(d.new_blocks)
-        if d.blocks_to_move is not None:
-            initial_nam.move_blocks(d.blocks_to_move)
-        if d.keys_to_move is not None:
-            initial_nam.move_keys(d.keys_to_move,
-                                  doctor=doctor, keep_index=keep_index)
-        if d.keys_to_remove is not None:
-            initial_nam.remove_keys(d.keys_to_remove)
-        if d.keys_to_set is not None:
-            initial_nam.add_keys(d.keys_to_set)
-        if d.blocks_to_remove is not None:
-            initial_nam.remove_blocks(d.blocks_to_remove)
-        if d.namdelta is not None:
-            try:
-                ndelta = BronxNamelistAdapter(d.namdelta, macros=d.macros)
-            except ValueError:
-                tntlog.error("Error while parsing the following namelist's delta:\n%s",
-                             d.namdelta)
-                raise
-            initial_nam.merge(ndelta)
-
-    if squeeze:
-        initial_nam.squeeze()
-
-    if blocks_ref is not None:
-        cb = initial_nam.check_blocks(blocks_ref, directives[0].macros)
-        if len(cb) != 0:
-            tntlog.warning('Set of blocks is different from reference: ' + blocks_ref)
-            tntlog.warning('diff: ' + str(cb))
-
-    with open(target_namfile, 'w', encoding='ascii') as fh_namout:
-        fh_namout.write(initial_nam.dumps(sorting=sorting))
-
-
-def process_tnt_stack(directive, sorting=SECOND_ORDER_SORTING):
-    """Apply *directive* to the current working directory.
+        return TntDirective()
 
-    :param TntStackDirective directive: The tntstack directive to apply
-    :param sorting: Sorting option (from bronx.datagrip.namelist):
-                    NO_SORTING;
-                    FIRST_ORDER_SORTING => sort all keys within blocks;
-                    SECOND_ORDER_SORTING => sort only within indexes or
-                    attributes of the same key, within blocks.
+
+def _process_manifest_job(job, plan, verbose):
+    """Process a manifest's job (in a worker process)."""
+    start = time.perf_counter()
+    with set_verbose(verbose, job.namelist):
+        process_namelist(job.namelist, plan,
+                         sorting=job.sorting,
+                         blocks_ref=job.blocks_ref,
+                         in_place=job.in_place,
+                         outfilename=job.outfilename,
+                         squeeze=job.squeeze)
+    return time.perf_counter() - start, outputs.get_default_sink().take_pending()
+
+
+def process_manifest(manifest_jobs, jobs=1, verbose=False):
+    """
+    Process the jobs of a manifest (see :func:`thenamelisttool.config.read_manifest`),
+    concurrently, using a pool of **jobs** worker processes.
+
+    Each distinct directive file is read once and each distinct plan (i.e. a
+    directive file with a given set of **doctor** and **keep_index** options)
+    is compiled once (before the worker processes are started). Like with
+    :func:`process_namelists`, an error does not abort the whole run: the
+    jobs that rely on unreadable directives are not processed but the other
+    ones are.
+
+    :param list[thenamelisttool.config.TntManifestJob] manifest_jobs: The jobs to process
+    :param int jobs: The number of worker processes
+    :param bool verbose: Verbosity of the log messages
+    :return: The list of :class:`ManifestReport` objects (one for each job).
     """
-    # Record the list of file contained in the directory
-    initial_files = set()
-    initial_subdirectories = set()
-    for root, directories, files in os.walk('.'):
-        for f in files:
-            initial_files.add(os.path.normpath(os.path.join(root, f)))
-        for d in directories:
-            initial_subdirectories.add(os.path.normpath(os.path.join(root, d)))
-
-    # Process the todolist
-    for todo in directive.todolist:
+    start = time.perf_counter()
+    sources = dict()
+    plans = list()
+    for job in manifest_jobs:
+        if job.source not in sources:
+            outcome = workers.captured_call(_read_manifest_directive, job)
+            with set_verbose(verbose, job.source[1] or 'manifest'):
+                workers.replay_records(outcome.records)
+                if outcome.error is not None:
+                    tntlog.error("Directives '%s' could not be read: %s", job.directives or job.namdelta, outcome.error)
+            sources[job.source] = outcome
+        outcome = sources[job.source]
+        if outcome.error is None:
+            outcome = workers.captured_call(outcome.value.compile, doctor=job.doctor, keep_index=job.keep_index)
+        plans.append(outcome)
+    with set_verbose(verbose, 'manifest'):
+        tntlog.info('%d distinct directive(s) loaded in %.3fs.', len(sources), time.perf_counter() - start)
+    todo = [(job, plan.value, verbose) for job, plan in zip(manifest_jobs, plans) if plan.error is None]
+    outcomes = workers.map_jobs(_process_manifest_job, todo, jobs=jobs)
+    reports = list()
+    for job, plan in zip(manifest_jobs, plans):
+        outcome = plan if plan.error is not None else next(outcomes)
+        with set_verbose(verbose, job.namelist):
+            workers.replay_records(outcome.records)
+            if outcome.error is not None:
+                tntlog.error("Namelist '%s' could not be processed: %s", job.namelist, outcome.error)
+                reports.append(ManifestReport(job.namelist, job.target, None, outcome.error))
+            else:
+                outputs.get_default_sink().add_pending(outcome.value[1])
+                reports.append(ManifestReport(job.namelist, job.target, outcome.value[0], None))
+    return reports
+
+
+def manifest_summary(reports, elapsed=None):
+    """Summarise the **reports** returned by :func:`process_manifest` (as a JSON serialisable dictionary)."""
+    return dict(jobs=len(reports),
+                failed=len([r for r in reports if r.error is not None]),
+                elapsed=elapsed,
+                results=[dict(namelist=r.namelist,
+                              output=r.target,
+                              status='failed' if r.error is not None else 'ok',
+                              elapsed=r.elapsed,
+                              error=r.error) for r in reports])
+
+
+#: The tntstack's actions that can not be run concurrently with other actions
+_STACK_BARRIER_ACTIONS = frozenset(['delete', 'link', 'move', 'clean_untouched'])
+
+#: An elementary task generated by a tntstack's action: *func* is called with
+#: *args* and *kwargs*. *reads* and *writes* are the sets of files it depends on
+#: and *created* is the file it creates (if any).
+_StackTask = collections.namedtuple('_StackTask', ('func', 'args', 'kwargs', 'reads', 'writes', 'created'))
+
+
+def _stack_task_job(func, args, kwargs, log_levels):
+    """Run a tntstack's task (in a worker process)."""
+    tntlog.setLevel(log_levels[0])
+    tntstacklog.setLevel(log_levels[1])
+    func(*args, **kwargs)
+    return outputs.get_default_sink().take_pending()
+
+
+class _TntStackRunner:
+    """Run the actions of a tntstack's todolist.
+
+    When a pool of processes is available, the ``tnt``, ``create`` and ``touch``
+    actions are not executed right away. Instead, their tasks are accumulated
+    and sorted in levels, depending on the files they read and write: a task
+    is always placed in a higher level than the tasks it depends on. Once a
+    barrier action is met (see :data:`_STACK_BARRIER_ACTIONS`), the pending
+    tasks are executed (level by level, tasks of a given level being run
+    concurrently) and the barrier action is executed in the main process.
+
+    When a :class:`~thenamelisttool.incremental.TntStackState` object is
+    provided, up to date tasks are not executed: the files they produced
+    during the previous run are left in place (or restored from the cache).
+    """
+
+    def __init__(self, directive, sorting, executor=None, state=None):
+        self._directive = directive
+        self._sorting = sorting
+        self._executor = executor
+        self._state = state
+        self._wave = list()
+        self._pending_targets = set()
+        # Record the list of file contained in the directory
+        self._initial_files = set()
+        self._initial_subdirectories = set()
+        for root, directories, files in os.walk('.'):
+            if state is not None and state.cachedir is not None:
+                directories[:] = [d for d in directories
+                                  if os.path.realpath(os.path.join(root, d)) != os.path.realpath(state.cachedir)]
+            for f in files:
+                self._initial_files.add(os.path.normpath(os.path.join(root, f)))
+            for d in directories:
+                self._initial_subdirectories.add(os.path.normpath(os.path.join(root, d)))
+        if state is not None:
+            self._initial_files.discard(os.path.relpath(state.statefile))
+
+    def run(self):
+        """Process the whole todolist."""
+        for i, todo in enumerate(self._directive.todolist):
+            with profiling.phase(profiling.PHASE_ACTION, '{:d}. {:s}'.format(i + 1, todo['action'])):
+                if todo['action'] in _STACK_BARRIER_ACTIONS:
+                    self._sync()
+                    self._barrier_action(todo)
+                    if self._state is not None:
+                        self._state.sync()
+                else:
+                    for task in self._action_tasks(todo):
+                        self._submit(task)
+        self._sync()
+        if self._state is not None:
+            self._state.save()
+            tntstacklog.info('Incremental run: %s', self._state.summary())
+
+    def _sync(self):
+        """Execute the pending tasks and bring the directory up to date."""
+        self.flush()
+        if self._state is not None:
+            for path, content in self._state.restorations(None):
+                incremental.restore_file(path, content)
+
+    def _glob(self, pattern):
+        """Expand **pattern**, taking into account the files pending tasks will create."""
+        found = glob.glob(pattern)
+        if self._pending_targets:
+            n_pattern = os.path.normpath(pattern)
+            hidden = os.path.basename(n_pattern).startswith('.')
+            found = set([os.path.normpath(f) for f in found])
+            found.update([t for t in self._pending_targets
+                          if fnmatch.fnmatchcase(t, n_pattern) and
+                          (hidden or not os.path.basename(t).startswith('.'))])
+            found = sorted(found)
+        return found
+
+    @staticmethod
+    def _fileset(*paths):
+        return frozenset([os.path.realpath(p) for p in paths])
+
+    def _action_tasks(self, todo):
+        """Generate the tasks associated with a ``tnt``, ``create`` or ``touch`` action."""
         action = todo['action']
 
         if action == 'tnt':
+            plan = self._directive.plan(todo['directive'])
             for nam in todo['namelist']:
-                for realnam in glob.glob(nam):
+                for realnam in self._glob(nam):
                     tntstacklog.info("Namelist '%s': applying the following directives: %s",
                                      realnam, ",".join(todo['directive']))
-                    process_namelist(realnam,
-                                     [directive.directives[name] for name in todo['directive']],
-                                     in_place=True, sorting=sorting)
-                    initial_files.discard(os.path.normpath(realnam))
+                    yield _StackTask(process_namelist, (realnam, plan),
+                                     dict(in_place=True, sorting=self._sorting),
+                                     self._fileset(realnam), self._fileset(realnam), None)
+                    self._initial_files.discard(os.path.normpath(realnam))
 
         elif action == 'create':
             if 'external' in todo:
                 tntstacklog.info("Creating namelist '%s' from external file '%s'", todo['target'], todo['external'])
-                shutil.copy(todo['external'], todo['target'])
+                yield _StackTask(shutil.copy, (todo['external'], todo['target']), dict(),
+                                 self._fileset(todo['external']), self._fileset(todo['target']), todo['target'])
             elif 'copy' in todo:
                 tntstacklog.info("Creating namelist '%s' from file '%s'", todo['target'], todo['copy'])
-                shutil.copy(todo['copy'], todo['target'])
+                yield _StackTask(shutil.copy, (todo['copy'], todo['target']), dict(),
+                                 self._fileset(todo['copy']), self._fileset(todo['target']), todo['target'])
             else:
                 tntstacklog.info("Creating namelist '%s' from namelist '%s' by applying the following directives: %s",
                                  todo['target'], todo['namelist'], ",".join(todo['directive']))
-                process_namelist(todo['namelist'],
-                                 [directive.directives[name] for name in todo['directive']],
-                                 outfilename=todo['target'], sorting=sorting)
-            initial_files.discard(os.path.normpath(todo['target']))
+                yield _StackTask(process_namelist, (todo['namelist'], self._directive.plan(todo['directive'])),
+                                 dict(outfilename=todo['target'], sorting=self._sorting),
+                                 self._fileset(todo['namelist']), self._fileset(todo['target']), todo['target'])
+            self._initial_files.discard(os.path.normpath(todo['target']))
 
-        elif action in ('delete', 'touch'):
+        elif action == 'touch':
+            for nam in todo['namelist']:
+                for realnam in self._glob(nam):
+                    tntstacklog.info("Marking file '%s' as touched'", realnam)
+                    self._initial_files.discard(os.path.normpath(realnam))
+
+    def _submit(self, task):
+        """Execute **task**, schedule it or skip it (if it is up to date)."""
+        if self._state is not None:
+            outputs = self._state.lookup(task)
+            if outputs is not None:
+                tntstacklog.info("Up to date (skipped): %s", ", ".join([p for p, _ in outputs]))
+                for path, content in outputs:
+                    if content is not None:
+                        self._schedule(self._restore_task(path, content, created=True))
+                return
+            for path, content in self._state.restorations(task.reads):
+                self._schedule(self._restore_task(path, content))
+            self._state.started(task)
+        self._schedule(task)
+
+    def _restore_task(self, path, content, created=False):
+        return _StackTask(incremental.restore_file, (path, content), dict(),
+                          self._fileset(path), self._fileset(path), path if created else None)
+
+    def _completed(self, task):
+        if self._state is not None and task.func is not incremental.restore_file:
+            self._state.completed(task)
+
+    def _schedule(self, task):
+        """Execute **task** or, if a pool of processes is available, schedule it."""
+        if self._executor is None:
+            task.func(*task.args, **task.kwargs)
+            self._completed(task)
+        else:
+            level = max([t_level + 1 for t_level, t in self._wave
+                         if t.writes & (task.reads | task.writes) or task.writes & t.reads],
+                        default=0)
+            self._wave.append((level, task))
+            if task.created is not None:
+                self._pending_targets.add(os.path.normpath(task.created))
+
+    def flush(self):
+        """Execute the pending tasks."""
+        log_levels = (tntlog.level, tntstacklog.level)
+        errors = list()
+        for level in range(max([t_level for t_level, _ in self._wave], default=-1) + 1):
+            tasks = [t for t_level, t in self._wave if t_level == level]
+            outcomes = workers.map_jobs(_stack_task_job,
+                                        [(t.func, t.args, t.kwargs, log_levels) for t in tasks],
+                                        executor=self._executor)
+            for task, outcome in zip(tasks, outcomes):
+                workers.replay_records(outcome.records)
+                outputs.get_default_sink().add_pending(outcome.value or ())
+                if outcome.error is not None:
+                    tntstacklog.error("Error while processing '%s' (%s): %s",
+                                      task.args[0], task.func.__name__, outcome.error)
+                    errors.append(outcome.error)
+            if errors:
+                raise RuntimeError('{:d} tntstack task(s) failed. The first error is: {:s}'
+                                   .format(len(errors), errors[0]))
+            for task in tasks:
+                self._completed(task)
+        self._wave = list()
+        self._pending_targets = set()
+
+    def _barrier_action(self, todo):
+        """Execute the ``delete``, ``link``, ``move`` or ``clean_untouched`` actions."""
+        action = todo['action']
+
+        if action == 'delete':
             for nam in todo['namelist']:
                 for realnam in glob.glob(nam):
-                    if action == 'delete':
-                        tntstacklog.info("Deleting namelist '%s'", realnam)
-                        os.unlink(realnam)
-                    elif action == 'touch':
-                        tntstacklog.info("Marking file '%s' as touched'", realnam)
-                    initial_files.discard(os.path.normpath(realnam))
+                    tntstacklog.info("Deleting namelist '%s'", realnam)
+                    os.unlink(realnam)
+                    self._initial_files.discard(os.path.normpath(realnam))
 
         elif action == 'link':
             tntstacklog.info("Linking '%s' -> '%s'", todo['target'], todo['namelist'])
             os.symlink(todo['namelist'], todo['target'])
-            initial_files.discard(os.path.normpath(todo['namelist']))
+            self._initial_files.discard(os.path.normpath(todo['namelist']))
 
         elif action == 'move':
             tntstacklog.info("Moving '%s' to '%s'", todo['namelist'], todo['target'])
             shutil.move(todo['namelist'], todo['target'])
-            initial_files.discard(os.path.normpath(todo['namelist']))
-            initial_files.discard(os.path.normpath(todo['target']))
+            self._initial_files.discard(os.path.normpath(todo['namelist']))
+            self._initial_files.discard(os.path.normpath(todo['target']))
 
         elif action == 'clean_untouched':
-            for f in initial_files:
+            for f in self._initial_files:
                 tntstacklog.info("Deleting file '%s'", f)
                 os.unlink(f)
-            for d in [d for d in initial_subdirectories if not os.listdir(d)]:
+            for d in [d for d in self._initial_subdirectories if not os.listdir(d)]:
                 # Remove empty directories
                 tntstacklog.info("Deleting empty directory '%s'", d)
                 os.rmdir(d)
 
 
-def namelist_read_and_sort(namfile):
-    """Read a namelist and return it as a sorted string."""
+def process_tnt_stack(directive, sorting=SECOND_ORDER_SORTING, jobs=1, statefile=None, force=False,
+                      cachedir=None):
+    """Apply *directive* to the current working directory.
+
+    :param TntStackDirective directive: The tntstack directive to apply
+    :param sorting: Sorting option (from bronx.datagrip.namelist):
+                    NO_SORTING;
+                    FIRST_ORDER_SORTING => sort all keys within blocks;
+                    SECOND_ORDER_SORTING => sort only within indexes or
+                    attributes of the same key, within blocks.
+    :param int jobs: The number of worker processes. If greater than 1, the
+                     independent actions of the todolist are executed
+                     concurrently (the ``delete``, ``link``, ``move`` and
+                     ``clean_untouched`` actions act as barriers). In any
+                     case, the result is identical to a sequential run.
+    :param str statefile: If provided, incremental mode is activated: the
+                          tasks that are up to date with respect to the
+                          **statefile** content are skipped (see
+                          :mod:`thenamelisttool.incremental`).
+    :param bool force: In incremental mode, execute all the tasks (regardless
+                       of the **statefile** content).
+    :param str cachedir: In incremental mode, the cache directory where the
+                         content of the files is stored (it allows to skip the
+                         tasks whose output files are not in place anymore).
+    :return: In incremental mode, the :class:`~thenamelisttool.incremental.TntStackState`
+             object that describes the run (``None`` otherwise).
+    """
+    state = incremental.TntStackState(statefile, force=force, cachedir=cachedir) if statefile else None
+    with workers.pool(jobs) as executor:
+        _TntStackRunner(directive, sorting, executor=executor, state=state).run()
+    return state
+
+
+def namelist_read(namfile):
+    """Read a namelist (and check that it is not empty)."""
     try:
-        namp = BronxNamelistAdapter(namfile)
+        namp = namelist_adapter(namfile)
     except (ValueError, OSError):
         tntlog.error("Something went wrong will reading: %s", namfile)
         raise
     if not len(namp):
         raise ValueError('Nothing to read in "{:s}": Is it a namelist ?'.format(namfile))
-    return namp.dumps(sorting=FIRST_ORDER_SORTING)
+    return namp
+
+
+def namelist_read_and_sort(namfile):
+    """Read a namelist and return it as a sorted string."""
+    return namelist_read(namfile).dumps(sorting=FIRST_ORDER_SORTING)
+
+
+def namelist_structure(namp):
+    """Summarise a namelist object as a ``{block: {key: formatted_value}}`` dictionary.
+
+    The namelist's blocks must provide a ``dumps_values`` method (that formats
+    the value of a given key).
+    """
+    return {b: {k: bl.dumps_values(k) for k in bl.keys()}
+            for b, bl in namp.items()}
+
+
+def structural_diff(before, after):
+    """Compare two namelist's structures (see :func:`namelist_structure`).
+
+    Blocks are compared first, then keys within common blocks and finally the
+    values of common keys. The work is proportional to the size of the
+    namelists (whatever the amount of differences is).
+
+    :return: A list of lines that describe the differences (removed items are
+             prefixed with ``-``, added ones with ``+`` and modified values
+             with ``~``).
+    """
+    lines = list()
+    for b in sorted(set(before) | set(after)):
+        if b not in after:
+            lines.append('- &{:s}'.format(b))
+            lines.extend(['-     {:s}={:s},'.format(k, v) for k, v in sorted(before[b].items())])
+        elif b not in before:
+            lines.append('+ &{:s}'.format(b))
+            lines.extend(['+     {:s}={:s},'.format(k, v) for k, v in sorted(after[b].items())])
+        else:
+            blines = list()
+            b_before = before[b]
+            b_after = after[b]
+            for k in sorted(set(b_before) | set(b_after)):
+                if k not in b_after:
+                    blines.append('-     {:s}={:s},'.format(k, b_before[k]))
+                elif k not in b_before:
+                    blines.append('+     {:s}={:s},'.format(k, b_after[k]))
+                elif b_before[k] != b_after[k]:
+                    blines.append('~     {:s}: {:s} => {:s}'.format(k, b_before[k], b_after[k]))
+            if blines:
+                lines.append('  &{:s}'.format(b))
+                lines.extend(blines)
+    return lines
 
 
 def _check_diffline(line, expected):
@@ -257,7 +628,8 @@ def compose_namelist(recipe_filename,
                      suffix='.nam',
                      sorting=NO_SORTING,
                      squeeze=False,
-                     fhoutput=None):
+                     fhoutput=None,
+                     sources=None):
     """
     Compose a namelist from a **recipe_filename**. For the syntax of recipe,
     see template recipe.
@@ -275,19 +647,100 @@ def compose_namelist(recipe_filename,
     :param squeeze: squeeze the namelist: remove empty blocks.
     :param fhoutput: a file object where the result is written (if None, a
                      new file named `basename(recipe_filename)` is created).
+    :param sources: a :class:`~thenamelisttool.config.TntRecipeSources` object
+                    holding the source namelists shared with other recipes.
     """
     # read
-    recipe = TntRecipe(recipe_filename, sourcenam_directory=sourcenam_directory)
+    with profiling.phase(profiling.PHASE_PARSE, recipe_filename):
+        recipe = TntRecipe(recipe_filename, sourcenam_directory=sourcenam_directory, sources=sources)
     # merge
-    nam = recipe.ingredients[0]
-    for ingredient in recipe.ingredients[1:]:
-        nam.merge(ingredient)
-    if squeeze:
-        nam.squeeze()
+    with profiling.phase(profiling.PHASE_APPLY, recipe_filename):
+        nam = recipe.ingredients[0]
+        nam.merge_all(recipe.ingredients[1:])
+        if squeeze:
+            nam.squeeze()
     # write
-    if fhoutput is None:
-        namelistname = os.path.basename(recipe_filename.replace('.yaml', suffix))
-        with open(namelistname, 'w', encoding='ascii') as fh_namout:
-            fh_namout.write(nam.dumps(sorting=sorting))
-    else:
-        fhoutput.write(nam.dumps(sorting=sorting))
+    with profiling.phase(profiling.PHASE_DUMPS, recipe_filename):
+        namout = nam.dumps(sorting=sorting)
+    with profiling.phase(profiling.PHASE_WRITE, recipe_filename):
+        if fhoutput is None:
+            namelistname = os.path.basename(recipe_filename.replace('.yaml', suffix))
+            outputs.write_file(namelistname, namout)
+        else:
+            fhoutput.write(namout)
+
+
+#: The result of a recipe's composition: the time it took (in seconds) or the
+#: error message (see :func:`compose_namelists`)
+ComposeReport = collections.namedtuple('ComposeReport', ('recipe', 'elapsed', 'error'))
+
+#: The source namelists shared by the recipes of a batch (see :func:`compose_namelists`)
+_BATCH_SOURCES = None
+
+
+def _set_batch_sources(sources):
+    """Receive the source namelists shared by the recipes of a batch (in a worker process)."""
+    global _BATCH_SOURCES
+    _BATCH_SOURCES = sources
+
+
+def _compose_namelist_job(recipe_filename, verbose, options):
+    """Compose a single namelist (in a worker process)."""
+    global _BATCH_SOURCES
+    if _BATCH_SOURCES is None:
+        # Not started by compose_namelists: each worker process has its own sources
+        _BATCH_SOURCES = TntRecipeSources()
+    start = time.perf_counter()
+    with set_verbose(verbose, recipe_filename):
+        compose_namelist(recipe_filename, sources=_BATCH_SOURCES, **options)
+    return time.perf_counter() - start, outputs.get_default_sink().take_pending()
+
+
+def compose_namelists(recipe_filenames, jobs=1, verbose=False, **options):
+    """
+    Compose several namelists, concurrently, using a pool of **jobs** worker
+    processes.
+
+    The source namelists mentioned in the recipes are read and parsed once
+    (before the worker processes are started): they are shared by all the
+    recipes. They are handed over to the worker processes by the pool's
+    initializer: with the ``fork`` start method, they are simply inherited;
+    with ``spawn`` or ``forkserver``, they are pickled once for each worker
+    process (which is still much cheaper than parsing them again). Like with
+    :func:`process_namelists`, an error does not abort the whole run.
+
+    :param list[str] recipe_filenames: The list of recipe files
+    :param int jobs: The number of worker processes
+    :param bool verbose: Verbosity of the log messages
+    :param options: Any option accepted by :func:`compose_namelist` (except
+                    **fhoutput** and **sources**)
+    :return: The list of :class:`ComposeReport` objects (one for each recipe).
+    """
+    global _BATCH_SOURCES
+    _BATCH_SOURCES = TntRecipeSources()
+    reports = list()
+    try:
+        start = time.perf_counter()
+        for recipe_filename in recipe_filenames:
+            # NB: Errors (if any) will be reported when the recipe is actually composed
+            workers.captured_call(_BATCH_SOURCES.preload, recipe_filename,
+                                  sourcenam_directory=options.get('sourcenam_directory', None))
+        _BATCH_SOURCES.load()
+        with set_verbose(verbose, 'sources'):
+            tntlog.info('%d source namelist(s) loaded in %.3fs.', len(_BATCH_SOURCES), time.perf_counter() - start)
+        outcomes = workers.map_jobs(_compose_namelist_job,
+                                    [(r, verbose, options) for r in recipe_filenames],
+                                    jobs=jobs, initializer=_set_batch_sources, initargs=(_BATCH_SOURCES, ))
+        for recipe_filename, outcome in zip(recipe_filenames, outcomes):
+            with set_verbose(verbose, recipe_filename):
+                workers.replay_records(outcome.records)
+                if outcome.error is not None:
+                    tntlog.error("Recipe '%s' could not be composed: %s", recipe_filename, outcome.error)
+                    reports.append(ComposeReport(recipe_filename, None, outcome.error))
+                else:
+                    outputs.get_default_sink().add_pending(outcome.value[1])
+                    tntlog.info("Recipe '%s' composed in %.3fs.", recipe_filename, outcome.value[0])
+                    reports.append(ComposeReport(recipe_filename, outcome.value[0], None))
+    finally:
+        _BATCH_SOURCES = None
+    return reports
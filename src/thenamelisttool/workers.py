@@ -0,0 +1,179 @@
+"""
+Run TNT jobs concurrently on a pool of worker processes.
+
+Log records emitted by a job are not printed by the worker process. Instead,
+they are collected and sent back to the parent process, together with the
+job's result or error message. It is then up to the caller to replay them (see
+:func:`replay_records`), which allows to display the logs of the various jobs
+in a deterministic order.
+
+Likewise, when profiling is enabled (see :mod:`thenamelisttool.profiling`),
+the measures made in the worker processes are sent back to the parent process.
+Whether profiling is enabled, whether observers are registered and the fsync
+mode of the default output sink (see :mod:`thenamelisttool.outputs`) are sent
+along with each job (so that it works whatever the way the worker processes
+are started).
+So are the operations observed in the worker processes (see
+:mod:`thenamelisttool.instrumentation`): they are reported to the parent
+process' observers.
+"""
+
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import logging
+import traceback
+
+from bronx.fancies import loggers
+
+from . import instrumentation, outputs, profiling
+
+tntlog = loggers.getLogger('tntlog')
+
+#: The outcome of a job: its return *value* or its *error* message (if an
+#: exception was raised), the list of log *records* it produced and the
+#: *profile* records made in a worker process (if profiling is enabled) and
+#: the *operations* observed in a worker process (if observers are registered).
+JobOutcome = collections.namedtuple('JobOutcome', ('value', 'error', 'records', 'profile', 'operations'),
+                                    defaults=(None, None))
+
+
+def captured_call(func, *kargs, **kwargs):
+    """Call **func** and return a :class:`JobOutcome` object.
+
+    Exceptions are caught and log records are collected (instead of being
+    printed).
+    """
+    records = list()
+    slurp = loggers.SlurpHandler(records)
+    r_logger = logging.getLogger()
+    r_handlers = list(r_logger.handlers)
+    for a_handler in r_handlers:
+        r_logger.removeHandler(a_handler)
+    r_logger.addHandler(slurp)
+    value = None
+    error = None
+    try:
+        value = func(*kargs, **kwargs)
+    except Exception as e:
+        tntlog.debug('Traceback:\n%s', traceback.format_exc())
+        error = '{:s}: {!s}'.format(type(e).__name__, e)
+    finally:
+        r_logger.removeHandler(slurp)
+        for a_handler in r_handlers:
+            r_logger.addHandler(a_handler)
+    return JobOutcome(value, error, records)
+
+
+def _job_context():
+    """The state of the parent process that is reproduced in the worker processes.
+
+    It is sent with each job: the worker processes do not inherit the parent
+    process' globals if they are not forked (i.e. with the ``spawn`` or
+    ``forkserver`` start methods).
+    """
+    profiler = profiling.get_profiler()
+    trace = False
+    if profiler is not None:
+        import tracemalloc
+        trace = tracemalloc.is_tracing()
+    return dict(profile=profiler is not None, trace=trace, record=bool(instrumentation.observers()),
+                sync=outputs.get_default_sink().sync)
+
+
+@contextlib.contextmanager
+def _worker_profiler(profile, trace):
+    """Provide a profiler in a worker process if **profile** is True (``None`` otherwise)."""
+    profiler = profiling.get_profiler()
+    if not profile or profiler is not None:
+        # Profiling is disabled or the profiler was inherited from the parent process
+        yield profiler if profile else None
+        return
+    import tracemalloc
+    started = trace and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    profiler = profiling.enable()
+    try:
+        yield profiler
+    finally:
+        profiling.disable()
+        if started:
+            tracemalloc.stop()
+
+
+def _captured_star_call(func, kargs, context):
+    if outputs.get_default_sink().sync != context['sync']:
+        outputs.set_default_sync(context['sync'])
+    with _worker_profiler(context['profile'], context['trace']) as profiler:
+        mark = None if profiler is None else profiler.mark()
+        with instrumentation.recording(context['record']) as operations:
+            outcome = captured_call(func, *kargs)
+    if operations:
+        outcome = outcome._replace(operations=operations)
+    if profiler is not None:
+        outcome = outcome._replace(profile=[tuple(r) for r in profiler.records_since(mark)])
+    return outcome
+
+
+def _pooled(outcomes):
+    """Collect the profile records and the operations observed in the worker processes."""
+    for outcome in outcomes:
+        if outcome.profile:
+            profiling.get_profiler().add_records(outcome.profile)
+        for operation, elapsed in outcome.operations or ():
+            instrumentation.notify(operation, elapsed)
+        yield outcome
+
+
+def replay_records(records):
+    """Emit log records that were collected in a worker process."""
+    for record in records:
+        logging.getLogger(record.name).handle(record)
+
+
+@contextlib.contextmanager
+def pool(jobs):
+    """Create a pool of **jobs** worker processes that can be given to :func:`map_jobs`.
+
+    This is useful when :func:`map_jobs` is called many times in a row (it
+    avoids the creation of a new pool of processes each time). If **jobs** is
+    lower than 2, ``None`` is returned (i.e. no pool is created).
+    """
+    if jobs <= 1:
+        yield None
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            yield executor
+
+
+def map_jobs(func, jobs_args, jobs=1, executor=None, initializer=None, initargs=()):
+    """Apply **func** on each item of **jobs_args** using **jobs** processes.
+
+    :param func: A module-level function (it has to be picklable)
+    :param list[tuple] jobs_args: The arguments for each of the jobs
+    :param int jobs: The number of worker processes
+    :param executor: An existing pool of processes (see :func:`pool`). If
+                     provided, **jobs**, **initializer** and **initargs** are
+                     ignored.
+    :param initializer: A module-level function called with **initargs** when
+                        each worker process starts. It is the way to share
+                        data between the jobs, whatever the way the worker
+                        processes are started (fork, spawn or forkserver):
+                        **initargs** is sent once to each worker process. It
+                        is not called when the jobs run in the current process.
+    :return: An iterator over :class:`JobOutcome` objects (returned in the same
+             order as **jobs_args**).
+    """
+    jobs_args = list(jobs_args)
+    star_call = functools.partial(_captured_star_call, func, context=_job_context())
+    if executor is not None and len(jobs_args) > 1:
+        yield from _pooled(executor.map(star_call, jobs_args))
+    elif jobs <= 1 or len(jobs_args) <= 1:
+        for kargs in jobs_args:
+            yield captured_call(func, *kargs)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(jobs, len(jobs_args)),
+                                                    initializer=initializer, initargs=initargs) as executor:
+            yield from _pooled(executor.map(star_call, jobs_args))
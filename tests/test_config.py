@@ -1,10 +1,15 @@
 import os
+import tempfile
 import unittest
 
 from bronx.fancies import loggers
 
-from thenamelisttool.config import TntDirective, TntStackDirective
+from thenamelisttool.namadapter import namelist_adapter, FIRST_ORDER_SORTING, NO_SORTING
+
+from thenamelisttool.config import TntDirective, TntDirectivePlan, TntStackDirective, read_manifest
+from thenamelisttool.config import read_directives
 from thenamelisttool.config import TntDirectiveUnkownError, TntDirectiveValueError, TntStackDirectiveError
+from thenamelisttool.config import TntManifestError
 
 tpl_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
                         '../src/thenamelisttool/templates')
@@ -46,6 +51,83 @@ class TestTntConfig(unittest.TestCase):
         with self.assertRaises(TntDirectiveValueError):
             TntDirective(macros={1: 3})
 
+    def test_tnt_dir_namdelta(self):
+        self.assertIsNone(TntDirective().namdelta_namelist())
+        tdir = TntDirective(namdelta='&NAMDFI NSTDFI=45, /')
+        delta1 = tdir.namdelta_namelist()
+        delta1['NAMDFI']['NSTDFI'] = 12
+        delta2 = tdir.namdelta_namelist()
+        self.assertEqual(delta2['NAMDFI']['NSTDFI'], 45)
+        self.assertIsNot(delta1.parser, delta2.parser)
+        # The namdelta is parsed once
+        self.assertIs(tdir._get_parsed_namdelta(), tdir._get_parsed_namdelta())
+        # Errors are detected when the directive is validated
+        tdir = TntDirective(namdelta='&NAMDFI NSTDFI=??, /')
+        with loggers.contextboundGlobalLevel('critical'):
+            with self.assertRaises(ValueError):
+                tdir.validate()
+            with self.assertRaises(ValueError):
+                TntStackDirective(tpl_path, list(),
+                                  directives=dict(dfi=dict(namdelta='&NAMDFI NSTDFI=??, /')))
+
+    def test_tnt_dir_compile(self):
+        tdir = TntDirective(keys_to_set={('NAMDIM', 'NPROMA'): '-12', ('NAMDIM', 'LFOO'): 1},
+                            blocks_to_remove='NAMOBS',
+                            keys_to_move={('NAMDIM', 'NFLEVG'): ('NAMDIM', 'NLEV')},
+                            namdelta='&NAMDFI NSTDFI=45, /')
+        plan = tdir.compile()
+        self.assertIs(plan, tdir.compile())
+        self.assertListEqual([s.operation for s in plan],
+                             ['move_keys', 'add_keys', 'remove_blocks', 'merge'])
+        self.assertIn('remove_blocks: NAMOBS', plan.describe())
+        self.assertDictEqual(dict(plan.steps[1].argument), tdir.keys_to_set)
+        doctor_plan = tdir.compile(doctor=True)
+        self.assertIsNot(plan, doctor_plan)
+        self.assertDictEqual(dict(doctor_plan.steps[1].argument),
+                             {('NAMDIM', 'NPROMA'): -12, ('NAMDIM', 'LFOO'): True})
+        nam = namelist_adapter('&NAMDIM NFLEVG=90, NPROMA=8, /\n&NAMOBS /\n')
+        TntDirectivePlan.chain([doctor_plan, TntDirective(new_blocks='NAMNEW').compile()]).apply(nam)
+        self.assertSetEqual(set(nam.keys()), {'NAMDIM', 'NAMDFI', 'NAMNEW'})
+        self.assertEqual(nam['NAMDIM']['NLEV'], 90)
+        self.assertEqual(nam['NAMDIM']['NPROMA'], -12)
+        self.assertEqual(nam['NAMDFI']['NSTDFI'], 45)
+        # Consecutive merges are coalesced
+        deltas = [TntDirective(namdelta='&NAMDFI NSTDFI=1, /\n&NAMA A=1, /').compile(),
+                  TntDirective(namdelta='&NAMB B=1, /\n&NAMDFI NSTDFI=-, NEW=2, /').compile(),
+                  TntDirective(namdelta='&NAMA A=3, /').compile()]
+        chained = TntDirectivePlan.chain([doctor_plan, ] + deltas)
+        self.assertListEqual([s.operation for s in chained],
+                             ['move_keys', 'add_keys', 'remove_blocks', 'merge_all'])
+        nam = namelist_adapter('&NAMDIM NFLEVG=90, /\n&NAMB C=1, /\n')
+        chained.apply(nam)
+        ref = namelist_adapter('&NAMDIM NFLEVG=90, /\n&NAMB C=1, /\n')
+        for plan in [doctor_plan, ] + deltas:
+            plan.apply(ref)
+        self.assertEqual(nam.dumps(), ref.dumps())
+        self.assertEqual(chained.fingerprint(),
+                         TntDirectivePlan([s for p in [doctor_plan, ] + deltas for s in p]).fingerprint())
+        # Inconsistent directives are detected at compile time
+        with self.assertRaises(TntDirectiveValueError):
+            TntDirective(blocks_to_move={'A': 'C', 'B': 'C'}).compile()
+
+    def test_read_directives_cache(self):
+        with tempfile.TemporaryDirectory(prefix='tnt_config_') as tmpdir:
+            for ext, content in (('.yaml', 'keys_to_remove:\n  NAMA: [A, ]\n'),
+                                 ('.py', 'keys_to_remove = {"NAMA": ["A", ]}\n')):
+                dfile = os.path.join(tmpdir, 'directive' + ext)
+                with open(dfile, 'w') as fhdir:
+                    fhdir.write(content)
+                tdir = read_directives(dfile)
+                self.assertSetEqual(tdir.keys_to_remove, {('NAMA', 'A'), })
+                # The same object is returned (as long as the file does not change)
+                self.assertIs(read_directives(dfile), tdir)
+                self.assertIs(read_directives(os.path.join(tmpdir, '.', 'directive' + ext)), tdir)
+                with open(dfile, 'w') as fhdir:
+                    fhdir.write(content.replace('[A', '[B').replace('"A"', '"B"'))
+                tdir = read_directives(dfile)
+                self.assertSetEqual(tdir.keys_to_remove, {('NAMA', 'B'), })
+                self.assertIs(read_directives(dfile), tdir)
+
     def test_tntstack_dir(self):
         with self.assertRaises(TntStackDirectiveError):
             TntStackDirective(tpl_path, todolist='toto')
@@ -87,6 +169,67 @@ class TestTntConfig(unittest.TestCase):
                              dict(action='create', target='blop',
                                   external=os.path.join(tpl_path, 'namelist_prep_template')))
 
+    def test_manifest(self):
+        with tempfile.TemporaryDirectory(prefix='tnt_config_') as tmpdir:
+
+            def _manifest(name, content):
+                with open(os.path.join(tmpdir, name), 'w') as fhm:
+                    fhm.write(content)
+                return os.path.join(tmpdir, name)
+
+            jobs = read_manifest(_manifest('m.yaml',
+                                           'defaults:\n  sorting: first\n  directives: d.yaml\n'
+                                           'jobs:\n  - namelist: a.nam\n'
+                                           '  - {namelist: b.nam, output: sub/b.out, doctor: true}\n'
+                                           '  - {namelist: c.nam, directives: null, in_place: true}\n'),
+                                 keep_index=True)
+            self.assertListEqual([j.namelist for j in jobs],
+                                 [os.path.join(tmpdir, n) for n in ('a.nam', 'b.nam', 'c.nam')])
+            self.assertListEqual([j.target for j in jobs],
+                                 [os.path.join(tmpdir, n) for n in ('a.nam.tnt', 'sub/b.out', 'c.nam')])
+            self.assertListEqual([j.sorting for j in jobs], [FIRST_ORDER_SORTING, ] * 3)
+            self.assertListEqual([j.doctor for j in jobs], [False, True, False])
+            self.assertTrue(all([j.keep_index for j in jobs]))
+            self.assertEqual(jobs[0].source, jobs[1].source)
+            self.assertEqual(jobs[2].source, ('void', None))
+            jobs = read_manifest(_manifest('m.jsonl',
+                                           '# A comment\n{"namelist": "a.nam", "namdelta": "a.delta"}\n\n'
+                                           '{"namelist": "b.nam", "sorting": "second", "squeeze": true}\n'))
+            self.assertListEqual([j.sorting for j in jobs], [NO_SORTING, 2])
+            self.assertEqual(jobs[0].source, ('namdelta', os.path.realpath(os.path.join(tmpdir, 'a.delta'))))
+            self.assertTrue(jobs[1].squeeze)
+            for content in ('- {directives: d.yaml}\n',
+                            '- {namelist: a.nam, unknown: 1}\n',
+                            '- {namelist: a.nam, directives: d.yaml, namdelta: n.delta}\n',
+                            '- {namelist: a.nam, in_place: true, output: a.out}\n',
+                            '- {namelist: a.nam, sorting: third}\n',
+                            '- {namelist: a.nam, doctor: 1}\n',
+                            'defaults: {truc: 1}\njobs: []\n',
+                            'jobs: []\ntruc: 1\n',
+                            'namelist: a.nam\n'):
+                with self.assertRaises(TntManifestError):
+                    read_manifest(_manifest('broken.yaml', content))
+            with self.assertRaises(TntManifestError):
+                read_manifest(_manifest('broken.jsonl', '{"namelist": "a.nam"\n'))
+
+    def test_manifest_defaults_paths(self):
+        with tempfile.TemporaryDirectory(prefix='tnt_config_') as tmpdir:
+            os.mkdir(os.path.join(tmpdir, 'sub'))
+            manifest = os.path.join('sub', 'm.yaml')
+            cwd = os.getcwd()
+            os.chdir(tmpdir)
+            try:
+                with open(manifest, 'w') as fhm:
+                    fhm.write('- namelist: a.nam\n- {namelist: b.nam, blocks_ref: b.ref}\n')
+                jobs = read_manifest(manifest, blocks_ref='ref.nam')
+                rundir = os.getcwd()
+            finally:
+                os.chdir(cwd)
+        # The caller's paths are relative to the current directory, the manifest's ones to its directory
+        self.assertEqual(jobs[0].namelist, os.path.join('sub', 'a.nam'))
+        self.assertEqual(jobs[0].blocks_ref, os.path.join(rundir, 'ref.nam'))
+        self.assertEqual(jobs[1].blocks_ref, os.path.join('sub', 'b.ref'))
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -0,0 +1,151 @@
+import glob
+import os
+import unittest
+
+from thenamelisttool.namadapter import BronxNamelistAdapter, NativeNamelistAdapter
+from thenamelisttool.namadapter import NO_SORTING, FIRST_ORDER_SORTING, SECOND_ORDER_SORTING
+
+data_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')
+tpl_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                        '../src/thenamelisttool/templates')
+tpl_path = os.path.normpath(tpl_path)
+
+_SORTINGS = (NO_SORTING, FIRST_ORDER_SORTING, SECOND_ORDER_SORTING)
+
+# A namelist that exercises most of the namelist's syntax
+_RICH_NAMELIST = """! A leading comment
+ &NAMRICH
+   N=1, NK=2_8, NEG=-3,  ! a trailing comment
+   X=1.5, Y=-2.D0, Z=.5E-3, W=3.0_JPRB, V=1.23456789012345678, U=0., T=100.,
+   C=(1.,-2.5), CI=(1,2),
+   B1=B'101', B2=O'17', B3=Z'1F',
+   S='hello', S2="it's", S3='say "hi"', S4='', S5=KIND_'kind',
+   L1=.TRUE., L2=.FALSE., L3=T, L4=F, L5=.true., L7=.FALSE._4,
+   ARR(1)=1, ARR(3)=3, ARR(2)=2, ARR(10)=10,
+   MAT(2,1)=21, MAT(1,2)=12, MAT(1,1)=11,
+   SL(1:3)=1,2,3,
+   DT%A=1, DT%B(2)=2., DT%B(1)=1.,
+   LIST=1,2,3,4,
+   MIX=1,'a',.TRUE.,
+   M1=__MACRO_A__, M2='__MACRO_B__', M5='CEXP',
+   M3=NBPROC,
+   M4=$NPROC,
+   K_DEL=-,
+   K_DEL2=--
+ /
+ &NAMDEL K1=1, K2=-, K3=3 /
+ &namlower a=1, b_c=2, /END
+ &NAMEMPTY /
+ &NAMEMPTY2
+ /end
+ &NAMDUP
+   A=1,
+   B=2,
+   A=3,
+ /
+"""
+
+# A namelist meant to be merged in the rich one
+_RICH_DELTA = """&NAMRICH N=5, ARR(4)=4, NEW_KEY='new', X=-, DT%B(1)=- /
+&NAMNEW Q=1 /
+&NAMDEL K1=-, K4=.TRUE. /
+"""
+
+
+class TestTntConformance(unittest.TestCase):
+    """Check that the native adapter behaves exactly like the bronx one."""
+
+    _ADAPTERS = (BronxNamelistAdapter, NativeNamelistAdapter)
+
+    @staticmethod
+    def _corpus():
+        corpus = [os.path.join(tpl_path, 'namelist_prep_template'), ]
+        for candidate in sorted(glob.glob(os.path.join(data_path, '**', '*'), recursive=True)):
+            if os.path.isfile(candidate):
+                with open(candidate) as fhnam:
+                    if '&' in fhnam.read():
+                        corpus.append(candidate)
+        return corpus + [_RICH_NAMELIST, ]
+
+    def _both(self, source, macros=None):
+        return [adapter(source, macros=macros) for adapter in self._ADAPTERS]
+
+    def assertConform(self, bnam, nnam):
+        self.assertListEqual(list(bnam.keys()), list(nnam.keys()))
+        for b in bnam:
+            self.assertListEqual(list(bnam[b].keys()), list(nnam[b].keys()))
+            for k in bnam[b]:
+                self.assertEqual(bnam[b][k], nnam[b][k], '{:s}/{:s}'.format(b, k))
+                self.assertEqual(type(bnam[b][k]), type(nnam[b][k]), '{:s}/{:s}'.format(b, k))
+            self.assertSetEqual(set(bnam[b].rmkeys()), set(nnam[b].rmkeys()))
+            self.assertSetEqual(set(bnam[b].macros()), set(nnam[b].macros()))
+        for sorting in _SORTINGS:
+            self.assertEqual(bnam.dumps(sorting=sorting), nnam.dumps(sorting=sorting))
+
+    def test_parse(self):
+        for source in self._corpus():
+            with self.subTest(source=source[:40]):
+                self.assertConform(*self._both(source))
+                self.assertConform(*self._both(source, macros=dict(NBPROC=4, MACRO_A=[1, 2],
+                                                                   VAL_TO_SUBSTITUTE='subst')))
+
+    def test_parse_errors(self):
+        for bad in ('&NAMBROKEN A=?? /', '&NAMBROKEN A=1, 1 = 2 /'):
+            with self.assertRaises(ValueError):
+                BronxNamelistAdapter(bad)
+            with self.assertRaises(ValueError):
+                NativeNamelistAdapter(bad)
+
+    def test_operations(self):
+        for source in self._corpus():
+            with self.subTest(source=source[:40]):
+                namelists = self._both(source)
+                blocks = sorted(namelists[0].keys())
+                for nam in namelists:
+                    nam.add_blocks(['NAM_ADDED', 'namadded2'])
+                    nam.move_blocks({blocks[0]: 'NAM_MOVED'})
+                    nam.add_keys({('NAM_ADDED', 'A'): 1,
+                                  ('NAM_MOVED', 'NEW_STR'): 'text',
+                                  ('NAMADDED2', 'LPRINT'): True}, doctor=True)
+                    nam.add_keys({('NAM_ADDED', 'B(2)'): [1.5, 2.5]})
+                    nam.move_keys({('NAM_ADDED', 'A'): ('NAMADDED2', 'Z')})
+                    nam.move_keys({('NAM_MOVED', 'NEW_STR'): ('NAM_MOVED', 'NEW_STR2')}, keep_index=True)
+                    nam.remove_keys([('NAM_ADDED', 'B'), ])
+                    for b in blocks[1:3]:
+                        nam.remove_blocks([b, ])
+                    nam.squeeze()
+                self.assertConform(*namelists)
+                self.assertConform(*[nam.copy() for nam in namelists])
+
+    def test_keep_index(self):
+        namelists = self._both(_RICH_NAMELIST)
+        for nam in namelists:
+            nam.move_keys({('NAMRICH', 'ARR'): ('NAMRICH', 'ARRAY'),
+                           ('NAMRICH', 'DT'): ('NAMRICH', 'DTYPE')}, keep_index=True)
+            nam.add_keys({('NAMRICH', 'N'): 42})
+        self.assertConform(*namelists)
+        namelists = self._both(_RICH_NAMELIST)
+        for nam in namelists:
+            nam.move_keys({('NAMRICH', 'ARR'): ('NAMRICH', 'ARRAY')})
+        self.assertConform(*namelists)
+
+    def test_merge(self):
+        for source in self._corpus():
+            with self.subTest(source=source[:40]):
+                namelists = list()
+                for adapter in self._ADAPTERS:
+                    nam = adapter(source)
+                    nam.merge(adapter(_RICH_DELTA))
+                    nam.merge(adapter(_RICH_NAMELIST))
+                    namelists.append(nam)
+                    # N-way merges are equivalent to successive merges
+                    nam = adapter(source)
+                    nam.merge_all([adapter(_RICH_DELTA), adapter(_RICH_NAMELIST)])
+                    namelists.append(nam)
+                self.assertConform(*namelists[:2])
+                self.assertConform(*namelists[2:])
+                self.assertConform(namelists[0], namelists[2])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
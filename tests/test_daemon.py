@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from thenamelisttool import daemonclient
+from thenamelisttool.daemon import TntDaemon
+
+tpl_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                        '../src/thenamelisttool/templates')
+tpl_path = os.path.normpath(tpl_path)
+
+
+class TestTntDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='tnt_daemon_')
+        self.tmpdir = self._tmpdir.name
+        self.socket = os.path.join(self.tmpdir, 'daemon.sock')
+        self.namfile = os.path.join(self.tmpdir, 'nam')
+        shutil.copy(os.path.join(tpl_path, 'namelist_prep_template'), self.namfile)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _start(self, **kwargs):
+        daemon = TntDaemon(socket_path=self.socket, **kwargs)
+        daemon.bind()
+        thread = threading.Thread(target=daemon.serve)
+        thread.start()
+        return daemon, thread
+
+    def test_daemon(self):
+        daemon, thread = self._start(idle_timeout=0)
+        try:
+            with self.assertRaises(RuntimeError):
+                TntDaemon(socket_path=self.socket).bind()
+            # The working directory of the client is used
+            cwd = os.getcwd()
+            os.chdir(self.tmpdir)
+            try:
+                status, stdout, stderr = daemonclient.run_tool('tnt', ['-c', 'nam'], socket_path=self.socket)
+            finally:
+                os.chdir(cwd)
+            self.assertEqual((status, stdout, stderr), (0, '', ''))
+            with open(self.namfile + '.tnt') as fhnam:
+                self.assertIn('&NAM_IO_OFFLINE', fhnam.read())
+            # Errors are reported like a local run would
+            status, _, stderr = daemonclient.run_tool('tnt', ['-c', self.namfile + '.missing'],
+                                                      socket_path=self.socket)
+            self.assertEqual(status, 1)
+            self.assertIn('FileNotFoundError', stderr)
+            status, _, stderr = daemonclient.run_tool('tntdiff', ['-b', self.namfile], socket_path=self.socket)
+            self.assertEqual(status, 2)
+            self.assertIn('usage: tntdiff.py', stderr)
+            status, stdout, _ = daemonclient.run_tool('tntdiff', ['-b', self.namfile, '-a', self.namfile + '.tnt',
+                                                                  '-V'], socket_path=self.socket)
+            self.assertEqual(status, 0)
+            self.assertIn('&NAM_IO_OFFLINE', stdout)
+            # The daemon only accepts requests from clients with the same environment
+            saved_env = dict(os.environ)
+            os.environ['TNT_DAEMON_TEST'] = '1'
+            try:
+                with self.assertRaises(daemonclient.DaemonUnavailableError):
+                    daemonclient.run_tool('tnt', ['-c', self.namfile], socket_path=self.socket)
+            finally:
+                os.environ.clear()
+                os.environ.update(saved_env)
+            reply = daemonclient.call(dict(command='ping'), socket_path=self.socket)
+            self.assertEqual(reply['served'], 4)
+        finally:
+            daemonclient.call(dict(command='stop'), socket_path=self.socket)
+            thread.join()
+        self.assertFalse(os.path.exists(self.socket))
+        with self.assertRaises(daemonclient.DaemonUnavailableError):
+            daemonclient.run_tool('tnt', ['-c', self.namfile], socket_path=self.socket)
+
+    def test_idle_timeout(self):
+        _, thread = self._start(idle_timeout=0.1)
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(os.path.exists(self.socket))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,83 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from bronx.fancies import loggers
+
+from thenamelisttool.entrypoints import tntdiffpack
+
+_PACKS = dict(
+    before={'same': '&NAMA X=1, Y=2, /\n',
+            'reformatted': '&NAMA X=1, Y=2, /\n',
+            'modified': '&NAMA X=1, Y=2, /\n&NAMB Z=1, /\n',
+            'broken': '&NAMA X=1, /\n',
+            'deleted': '&NAMA X=1, /\n'},
+    after={'same': '&NAMA X=1, Y=2, /\n',
+           'reformatted': '&NAMA\n  Y=2,\n  X=1,\n/\n',
+           'modified': '&NAMA X=1, Y=3, /\n&NAMC Z=1, /\n',
+           'broken': '&NAMBROKEN A=?? /\n',
+           'created': '&NAMA X=1, /\n'},
+)
+
+
+class TestTntDiffPack(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='tnt_diffpack_')
+        self.tmpdir = self._tmpdir.name
+        for pack, files in _PACKS.items():
+            os.mkdir(os.path.join(self.tmpdir, pack))
+            for name, content in files.items():
+                with open(os.path.join(self.tmpdir, pack, name), 'w') as fhnam:
+                    fhnam.write(content)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _diffpack(self, name, *kargs):
+        """Run tntdiffpack on the two packs and return the report."""
+        outfile = os.path.join(self.tmpdir, name)
+        saved_argv = sys.argv
+        sys.argv = ['tntdiffpack.py', '-b', os.path.join(self.tmpdir, 'before'),
+                    '-a', os.path.join(self.tmpdir, 'after'), '-o', outfile] + list(kargs)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                tntdiffpack.main()
+        finally:
+            sys.argv = saved_argv
+        with open(outfile) as fhout:
+            return fhout.read()
+
+    def test_diffpack_jobs(self):
+        for opts in ((), ('--ndiff', )):
+            with loggers.contextboundGlobalLevel('critical'):
+                serial = self._diffpack('serial.out', '-j', '1', *opts)
+                self.assertEqual(self._diffpack('concurrent.out', '-j', '2', *opts), serial)
+            self.assertIn('UN-PARSABLE\n---------------------------\n\nbroken\n\n', serial)
+            self.assertIn('\n\nreformatted\nsame\n\n', serial)
+            self.assertIn('CREATED FILES\n-------------\ncreated\n\n', serial)
+            self.assertIn('\n\nbroken\ndeleted\n\n', serial)
+            self.assertIn('MODIFIED NAMELISTS\n------------------\n\nmodified\n\n', serial)
+            self.assertIn('============ modified ============', serial)
+
+    def test_identical_files(self):
+        with mock.patch.object(tntdiffpack, '_read_and_sort', wraps=tntdiffpack._read_and_sort) as m_read:
+            with loggers.contextboundGlobalLevel('critical'):
+                report = self._diffpack('serial.out', '-j', '1')
+        parsed = {os.path.basename(c[0][0]) for c in m_read.call_args_list}
+        self.assertSetEqual(parsed, {'reformatted', 'modified', 'broken'})
+        # Both byte-identical and reformatted files are untouched
+        self.assertIn('(1 of them are byte-identical and were not parsed)\n\nreformatted\nsame\n', report)
+        with open(os.path.join(self.tmpdir, 'after', 'reformatted'), 'w') as fhnam:
+            fhnam.write(_PACKS['before']['reformatted'])
+        with loggers.contextboundGlobalLevel('critical'):
+            report = self._diffpack('concurrent.out', '-j', '2')
+        self.assertIn('(2 of them are byte-identical and were not parsed)\n\nreformatted\nsame\n', report)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
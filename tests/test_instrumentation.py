@@ -0,0 +1,131 @@
+import contextlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import thenamelisttool as tnt
+from thenamelisttool import instrumentation
+from thenamelisttool.config import TntDirective
+from thenamelisttool.instrumentation import OperationCounters
+from thenamelisttool.namadapter import LazyNamelistAdapter, namelist_adapter
+
+tpl_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                        '../src/thenamelisttool/templates')
+tpl_path = os.path.normpath(tpl_path)
+
+
+NAM = """
+ &NAMA
+   A=1,
+   B=2,
+ /
+ &NAMB
+ /
+"""
+
+
+@contextlib.contextmanager
+def start_method(method):
+    """Temporarily change the way worker processes are started."""
+    saved = multiprocessing.get_start_method()
+    multiprocessing.set_start_method(method, force=True)
+    try:
+        yield
+    finally:
+        multiprocessing.set_start_method(saved, force=True)
+
+
+class TestTntInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='tnt_instrumentation_')
+        self.tmpdir = self._tmpdir.name
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_adapter_operations(self):
+        for nam in (namelist_adapter(NAM), LazyNamelistAdapter(NAM)):
+            with instrumentation.observing(OperationCounters()) as counters:
+                nam = nam.copy()
+                nam.add_blocks(['NAMC', ])
+                # Nested operations (remove_keys, add_keys) are not reported
+                nam.move_keys({('NAMA', 'A'): ('NAMB', 'A')})
+                nam.merge(namelist_adapter(' &NAMC C=1, /'))
+                nam.squeeze()
+                nam.splice_dumps()
+                nam.dumps()
+                nam.dumps()
+            self.assertListEqual(instrumentation.observers(), [])
+            # Not observed anymore
+            nam.dumps()
+            summary = counters.summary()
+            self.assertDictEqual({op: s['count'] for op, s in summary.items()},
+                                 dict(add_blocks=1, copy=1, dumps=2, merge=1, move_keys=1,
+                                      splice_dumps=1, squeeze=1))
+            self.assertTrue(all([s['elapsed'] >= 0 for s in summary.values()]))
+            counters.reset()
+            self.assertDictEqual(counters.summary(), dict())
+
+    def test_nested_operations(self):
+        entered = threading.Event()
+        release = threading.Event()
+
+        @instrumentation.instrumented
+        def slow_operation():
+            entered.set()
+            release.wait(10)
+
+        @instrumentation.instrumented
+        def outer_operation(nam):
+            nam.dumps()
+
+        nam = namelist_adapter(NAM)
+        with instrumentation.observing(OperationCounters()) as counters:
+            # Only the outermost operation is reported...
+            outer_operation(nam)
+            # ... but the operations of other threads are independent
+            thread = threading.Thread(target=slow_operation)
+            thread.start()
+            entered.wait(10)
+            nam.dumps()
+            release.set()
+            thread.join()
+        self.assertDictEqual(dict(counters.counts), dict(outer_operation=1, slow_operation=1, dumps=1))
+
+    def test_process_namelists(self):
+        # The operations observed in the worker processes are reported too (however they are started)
+        for method in ('fork', 'spawn'):
+            with start_method(method):
+                self._check_process_namelists()
+
+    def _check_process_namelists(self):
+        namfiles = list()
+        for i in range(3):
+            namfiles.append(os.path.join(self.tmpdir, 'nam{:d}'.format(i)))
+            shutil.copy(os.path.join(tpl_path, 'namelist_prep_template'), namfiles[-1])
+        directive = TntDirective(keys_to_set={('NAM_IO_OFFLINE', 'LPRINT'): False},
+                                 new_blocks={'NAM_NEW', })
+        counters = OperationCounters()
+        events = list()
+        instrumentation.register_observer(counters)
+        instrumentation.register_observer(lambda op, elapsed: events.append(op))
+        try:
+            with tnt.util.set_verbose(False, 'test_process_namelists'):
+                self.assertListEqual(tnt.util.process_namelists(namfiles[:2], directive, jobs=2), [])
+                tnt.util.process_namelist(namfiles[2], directive)
+        finally:
+            for observer in instrumentation.observers():
+                instrumentation.unregister_observer(observer)
+        self.assertEqual(counters.counts[instrumentation.OP_PROCESS_NAMELIST], 3)
+        self.assertEqual(counters.counts['add_blocks'], 3)
+        self.assertEqual(counters.counts['add_keys'], 3)
+        self.assertEqual(counters.counts['splice_dumps'], 3)
+        self.assertEqual(len(events), sum(counters.counts.values()))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
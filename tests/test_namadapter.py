@@ -1,7 +1,12 @@
+import io
 import os
 import unittest
+from unittest import mock
 
-from thenamelisttool.namadapter import BronxNamelistAdapter, NO_SORTING
+from thenamelisttool.namadapter import BronxNamelistAdapter, LazyNamelistAdapter, NativeNamelistAdapter
+from thenamelisttool import namadapter
+from thenamelisttool.namadapter import AbstractMapableNamelistAdapter, AbstractNamelistAdapter, BlockKeysIndex
+from thenamelisttool.namadapter import NO_SORTING, SECOND_ORDER_SORTING
 
 tpl_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
                         '../src/thenamelisttool/templates')
@@ -68,6 +73,161 @@ class TestTntNamAdapter(unittest.TestCase):
         nadapt.squeeze()
         self.assertNotIn('NAM_TOTO', nadapt)
 
+    def test_lazy_adapter(self):
+        nampath = os.path.join(tpl_path, 'namelist_prep_template')
+        bronx = BronxNamelistAdapter(nampath)
+        lazy = LazyNamelistAdapter(nampath, backend=BronxNamelistAdapter)
+        self.assertListEqual(list(lazy.keys()), list(bronx.keys()))
+        self.assertEqual(lazy.dumps(sorting=SECOND_ORDER_SORTING), bronx.dumps(sorting=SECOND_ORDER_SORTING))
+        # Blocks are only parsed when accessed
+        lazy = LazyNamelistAdapter(nampath, backend=BronxNamelistAdapter)
+        self.assertSetEqual(bronx.check_blocks(lazy), set())
+        lazy.remove_blocks(['NAM_PREP_ISBA', ])
+        self.assertEqual(lazy['nam_io_offline']['CSURF_FILETYPE'], 'LFI   ')
+        self.assertIsNone(lazy.block_source('NAM_IO_OFFLINE'))
+        self.assertTrue(lazy.block_source('NAM_FILE_NAMES').startswith('&NAM_FILE_NAMES'))
+        # Strings and comments are properly dealt with
+        lazy = LazyNamelistAdapter("! &NAMX /\n&NAMA A='&B /', ! &C /\n B=1, /\n&NAMB /")
+        self.assertListEqual(list(lazy.keys()), ['NAMA', 'NAMB'])
+        lazy.move_blocks({'NAMA': 'NAMC'})
+        lazy.merge(BronxNamelistAdapter('&NAMB X=1, /'))
+        nam = lazy.materialize()
+        self.assertIsInstance(nam, lazy.backend)
+        self.assertEqual(nam.dumps(), " &NAMB\n   X=1,\n /\n &NAMC\n   A='&B /',\n   B=1,\n /\n")
+        self.assertEqual(nam.dumps(), lazy.copy().dumps())
+
+    def test_lazy_adapter_copy(self):
+        master = LazyNamelistAdapter("&NAMA A=1, /\n&NAMB B=1, /\n&NAMC C=1, /\n")
+        first, second = master.copy(), master.copy()
+        # Blocks are parsed once and shared...
+        self.assertIs(first['NAMA'], second['NAMA'])
+        self.assertIs(master['NAMA'], second['NAMA'])
+        # ... until they are modified
+        first.add_keys({('NAMA', 'A2'): 2})
+        first.move_blocks({'NAMB': 'NAMD'})
+        second.remove_keys([('NAMC', 'C'), ])
+        second.merge(BronxNamelistAdapter('&NAMA A=3, /'))
+        self.assertEqual(first.dumps(), " &NAMA\n   A=1,\n   A2=2,\n /\n &NAMC\n   C=1,\n /\n &NAMD\n   B=1,\n /\n")
+        self.assertEqual(second.dumps(), " &NAMA\n   A=3,\n /\n &NAMB\n   B=1,\n /\n &NAMC\n /\n")
+        self.assertEqual(master.dumps(), " &NAMA\n   A=1,\n /\n &NAMB\n   B=1,\n /\n &NAMC\n   C=1,\n /\n")
+        self.assertIs(first['NAMC'], master['NAMC'])
+
+    def test_splice_dumps(self):
+        source = ("! Header comment\n"
+                  " &NAMA A=1,   B=2, ! comment\n /\n"
+                  " &NAMB X=__MACRO_X__, /\n"
+                  " &NAMC\n   C='c',\n /\n"
+                  " &NAMD D=.TRUE., /\n"
+                  " &NAME E=1 / &NAMF F=1 /")
+        for adapter in (BronxNamelistAdapter, NativeNamelistAdapter):
+            self.assertEqual(adapter(source).splice_dumps(), source)
+            nam = adapter(source, macros=dict(MACRO_X=2))
+            self.assertEqual(nam.splice_dumps(sorting=SECOND_ORDER_SORTING),
+                             nam.dumps(sorting=SECOND_ORDER_SORTING))
+            nam.add_keys({('NAMC', 'C2'): 2})
+            nam.remove_blocks(['NAMD', 'NAMF'])
+            nam.add_blocks(['NAMNEW'])
+            self.assertEqual(nam.splice_dumps(),
+                             "! Header comment\n"
+                             " &NAMA A=1,   B=2, ! comment\n /\n"
+                             " &NAMB\n   X=2,\n /\n"
+                             " &NAMC\n   C='c',\n   C2=2,\n /\n"
+                             " &NAME E=1 / \n"
+                             " &NAMNEW\n /\n")
+            self.assertEqual(adapter(nam.splice_dumps()).dumps(), nam.dumps())
+
+    def test_splice_dumps_fallback(self):
+
+        class WholeDumpsAdapter(NativeNamelistAdapter):
+            """An adapter that can not re-generate a single block."""
+
+            _actual_dumps_block = AbstractNamelistAdapter._actual_dumps_block
+
+        nam = WholeDumpsAdapter("&NAMA A=1, ! comment\n/\n&NAMB B=1, /\n")
+        self.assertEqual(nam.splice_dumps(), "&NAMA A=1, ! comment\n/\n&NAMB B=1, /\n")
+        nam.add_keys({('NAMB', 'B2'): 2})
+        self.assertEqual(nam.splice_dumps(), nam.dumps())
+
+    def test_keys_index(self):
+        b_index = BlockKeysIndex(['A', 'A(1)', 'A(2:3)', 'A%B', 'A%B(1)', 'AB', 'C(1)%A'])
+        self.assertSetEqual(set(b_index.expand('A')), {'A', 'A(1)', 'A(2:3)', 'A%B', 'A%B(1)'})
+        self.assertSetEqual(set(b_index.expand('A%B')), {'A%B', 'A%B(1)'})
+        self.assertSetEqual(set(b_index.expand('C')), {'C(1)%A'})
+        self.assertListEqual(b_index.expand('C(2)'), [])
+        b_index.discard('A(1)')
+        self.assertNotIn('A(1)', b_index)
+        self.assertEqual(len(b_index), 6)
+        # The adapter's indexes are kept in sync
+        nadapt = BronxNamelistAdapter('&NAMA A=1, A(2)=3, B%C=2, / &NAMB X=1, /')
+        self.assertSetEqual(nadapt._expand_keys([('NAMA', 'A')]), {('NAMA', 'A'), ('NAMA', 'A(2)')})
+        nadapt.add_keys({('NAMA', 'a(5)'): 1})
+        nadapt.move_keys({('NAMA', 'B'): ('NAMB', 'Y')})
+        nadapt.move_blocks({'NAMA': 'NAMC'})
+        self.assertSetEqual(nadapt._expand_keys([('NAMC', 'A'), ('NAMC', 'B')]),
+                            {('NAMC', 'A'), ('NAMC', 'A(2)'), ('NAMC', 'A(5)')})
+        self.assertSetEqual(nadapt._expand_keys([('NAMB', 'Y')]), {('NAMB', 'Y%C')})
+        nadapt.remove_keys([('NAMC', 'A(2)')])
+        self.assertSetEqual(nadapt._expand_keys([('NAMC', 'A')]), {('NAMC', 'A'), ('NAMC', 'A(5)')})
+        nadapt.merge(BronxNamelistAdapter('&NAMC A(7)=1, /'))
+        self.assertSetEqual(nadapt._expand_keys([('NAMC', 'A')]),
+                            {('NAMC', 'A'), ('NAMC', 'A(5)'), ('NAMC', 'A(7)')})
+
+    def test_keys_index_case(self):
+        # Block names are not case-sensitive (neither are the indexes)
+        nadapt = BronxNamelistAdapter('&NAMA Y(1)=1, X=0, /')
+        nadapt.remove_keys({('NAMA', 'X')})
+        nadapt.add_keys({('nama', 'Y(2)'): 5})
+        nadapt.remove_keys({('NAMA', 'Y')})
+        self.assertEqual(len(nadapt['NAMA']), 0)
+        nadapt = BronxNamelistAdapter('&NAMA Y(1)=1, /')
+        self.assertSetEqual(nadapt._expand_keys([('NAMA', 'Y')]), {('NAMA', 'Y(1)')})
+        nadapt.remove_blocks(['nama'])
+        nadapt.add_blocks(['NAMA'])
+        nadapt.add_keys({('NAMA', 'Y(2)'): 2})
+        with mock.patch.object(namadapter.tntlog, 'warning') as m_warning:
+            nadapt.move_keys({('NAMA', 'Y'): ('NAMA', 'Z')})
+            nadapt.move_keys({('nama', 'Z'): ('Nama', 'W')})
+            nadapt.move_blocks({'Nama': 'NAMB'})
+            nadapt.move_keys({('namb', 'W'): ('NAMB', 'V')})
+        m_warning.assert_not_called()
+        self.assertListEqual(list(nadapt['NAMB'].keys()), ['V(2)'])
+
+    def test_merge_keys_index(self):
+        for adapter, delta in ((BronxNamelistAdapter, BronxNamelistAdapter),
+                               (NativeNamelistAdapter, NativeNamelistAdapter),
+                               (LazyNamelistAdapter, BronxNamelistAdapter)):
+            nadapt = adapter('&NAMA A=1, A(2)=2, /')
+            self.assertSetEqual(nadapt._expand_keys([('NAMA', 'A')]), {('NAMA', 'A'), ('NAMA', 'A(2)')})
+            nadapt.merge(delta('&NAMA A(3)=3, / &NAMB B=1, /'))
+            self.assertSetEqual(nadapt._expand_keys([('NAMA', 'A')]),
+                                {('NAMA', 'A'), ('NAMA', 'A(2)'), ('NAMA', 'A(3)')})
+
+    def test_legacy_adapter(self):
+
+        class LegacyAdapter(AbstractMapableNamelistAdapter):
+            """An adapter that only implements the methods of the original base class."""
+
+            def __init__(self, namelistsfile, macros=None):
+                super().__init__(namelistsfile)
+                self._parser = BronxNamelistAdapter._parse(io.StringIO(namelistsfile), self._all_macros(macros))
+
+            _actual_newblock = BronxNamelistAdapter._actual_newblock
+            _actual_rmblock = BronxNamelistAdapter._actual_rmblock
+            _actual_mvblock = BronxNamelistAdapter._actual_mvblock
+            _actual_newkey = BronxNamelistAdapter._actual_newkey
+            _actual_rmkey = BronxNamelistAdapter._actual_rmkey
+            _actual_squeeze = BronxNamelistAdapter._actual_squeeze
+            dumps = BronxNamelistAdapter.dumps
+
+            def merge(self, other):
+                self.parser.merge(other.parser)
+
+        nadapt = LegacyAdapter('&NAMA A=1, /')
+        nadapt.merge(LegacyAdapter('&NAMB B=1, /'))
+        nadapt.merge_all([LegacyAdapter('&NAMC C=1, /')])
+        self.assertSetEqual(set(nadapt.keys()), {'NAMA', 'NAMB', 'NAMC'})
+        self.assertEqual(nadapt.splice_dumps(), nadapt.dumps())
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -0,0 +1,90 @@
+import contextlib
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from thenamelisttool import outputs, workers
+from thenamelisttool.outputs import OutputSink, SYNC_BATCH, SYNC_EACH
+
+
+@contextlib.contextmanager
+def start_method(method):
+    """Temporarily change the way worker processes are started."""
+    saved = multiprocessing.get_start_method()
+    multiprocessing.set_start_method(method, force=True)
+    try:
+        yield
+    finally:
+        multiprocessing.set_start_method(saved, force=True)
+
+
+def _sync_job():
+    """The fsync mode of the default sink (in a worker process)."""
+    return outputs.get_default_sink().sync
+
+
+class TestTntOutputs(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='tnt_outputs_')
+        self.tmpdir = self._tmpdir.name
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_output_sink(self):
+        sink = OutputSink()
+        target = os.path.join(self.tmpdir, 'nam')
+        self.assertTrue(sink.write(target, ' &NAMA\n /\n'))
+        os.chmod(target, 0o640)
+        inode = os.stat(target).st_ino
+        # Same content: nothing is written
+        self.assertFalse(sink.write(target, b' &NAMA\n /\n'))
+        self.assertEqual(os.stat(target).st_ino, inode)
+        # New content: the file is replaced (permissions are preserved)
+        self.assertTrue(sink.write(target, ' &NAMB\n /\n'))
+        self.assertNotEqual(os.stat(target).st_ino, inode)
+        self.assertEqual(os.stat(target).st_mode & 0o777, 0o640)
+        with open(target) as fhnam:
+            self.assertEqual(fhnam.read(), ' &NAMB\n /\n')
+        self.assertEqual((sink.nwritten, sink.nunchanged), (2, 1))
+        # Symbolic links are preserved
+        link = os.path.join(self.tmpdir, 'link')
+        os.symlink('nam', link)
+        self.assertTrue(sink.write(link, ' &NAMC\n /\n'))
+        self.assertTrue(os.path.islink(link))
+        with open(target) as fhnam:
+            self.assertEqual(fhnam.read(), ' &NAMC\n /\n')
+        self.assertListEqual(sorted(os.listdir(self.tmpdir)), ['link', 'nam'])
+
+    def test_output_sink_sync(self):
+        target = os.path.join(self.tmpdir, 'nam')
+        sink = OutputSink(SYNC_EACH)
+        sink.write(target, 'each')
+        self.assertListEqual(sink.take_pending(), [])
+        sink = OutputSink(SYNC_BATCH)
+        sink.write(target, 'batch')
+        sink.add_pending([os.path.join(self.tmpdir, 'removed'), ])
+        self.assertEqual(len(sink.take_pending()), 2)
+        sink.write(target, 'batch2')
+        sink.flush()
+        self.assertListEqual(sink.take_pending(), [])
+        with self.assertRaises(ValueError):
+            OutputSink('sometimes')
+
+    def test_default_sync(self):
+        with mock.patch.dict(os.environ, clear=False), mock.patch.object(outputs, '_DEFAULT_SINK', None):
+            os.environ.pop(outputs.SYNC_ENV, None)
+            outputs.set_default_sync(SYNC_BATCH)
+            self.assertNotIn(outputs.SYNC_ENV, os.environ)
+            # The worker processes use the parent process' mode (however they are started)
+            for method in ('fork', 'spawn'):
+                with start_method(method):
+                    synced = [o.value for o in workers.map_jobs(_sync_job, [(), ()], jobs=2)]
+                self.assertListEqual(synced, [SYNC_BATCH, SYNC_BATCH])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from thenamelisttool import parsecache
+from thenamelisttool.namadapter import BronxNamelistAdapter, NO_SORTING
+
+data_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')
+data_path = os.path.normpath(data_path)
+
+
+class TestTntParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='tnt_parsecache_')
+        self.cache = parsecache.NamelistParseCache(self._tmpdir.name)
+        parsecache.set_default_cache(self.cache)
+
+    def tearDown(self):
+        parsecache.set_default_cache(None)
+        self._tmpdir.cleanup()
+
+    def test_hit_and_miss(self):
+        nampath = os.path.join(data_path, 'namelistmin1312_assim')
+        nam1 = BronxNamelistAdapter(nampath)
+        self.assertDictEqual(self.cache.stats(), dict(hits=0, misses=1, evictions=0))
+        nam2 = BronxNamelistAdapter(nampath)
+        self.assertDictEqual(self.cache.stats(), dict(hits=1, misses=1, evictions=0))
+        self.assertEqual(nam1.dumps(sorting=NO_SORTING), nam2.dumps(sorting=NO_SORTING))
+        # Cached objects are independent from each other
+        nam2.remove_blocks(list(nam2.keys()))
+        self.assertEqual(len(BronxNamelistAdapter(nampath)), len(nam1))
+        # Macros are part of the key
+        BronxNamelistAdapter(nampath, macros=dict(NPROC=4))
+        self.assertEqual(self.cache.misses, 2)
+        # So is the namelist content
+        BronxNamelistAdapter('&NAMCT0 LECMWF=.FALSE., /')
+        BronxNamelistAdapter('&NAMCT0 LECMWF=.TRUE., /')
+        self.assertEqual(self.cache.misses, 4)
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_eviction(self):
+        self.cache = parsecache.NamelistParseCache(self._tmpdir.name, maxsize=1)
+        parsecache.set_default_cache(self.cache)
+        for nam in ('namelistmin1312_assim', 'namelist_obs'):
+            BronxNamelistAdapter(os.path.join(data_path, nam))
+        self.assertEqual(self.cache.evictions, 2)
+        self.assertListEqual(os.listdir(self._tmpdir.name), [])
+
+    def test_memory_cache(self):
+        self.cache = parsecache.MemoryParseCache()
+        self.assertIsInstance(self.cache, parsecache.AbstractParseCache)
+        self.assertNotIsInstance(self.cache, parsecache.NamelistParseCache)
+        parsecache.set_default_cache(self.cache)
+        nampath = os.path.join(data_path, 'namelistmin1312_assim')
+        nam1 = BronxNamelistAdapter(nampath)
+        nam2 = BronxNamelistAdapter(nampath)
+        self.assertDictEqual(self.cache.stats(), dict(hits=1, misses=1, evictions=0))
+        self.assertEqual(nam1.dumps(sorting=NO_SORTING), nam2.dumps(sorting=NO_SORTING))
+        nam2.remove_blocks(list(nam2.keys()))
+        self.assertEqual(len(BronxNamelistAdapter(nampath)), len(nam1))
+        self.cache = parsecache.MemoryParseCache(maxsize=1)
+        parsecache.set_default_cache(self.cache)
+        for nam in ('namelistmin1312_assim', 'namelist_obs'):
+            BronxNamelistAdapter(os.path.join(data_path, nam))
+        self.assertEqual(self.cache.evictions, 2)
+        self.assertListEqual(os.listdir(self._tmpdir.name), [])
+        self.cache.clear()
+        self.assertIsNone(self.cache.get(self.cache.key('&NAMA /')))
+        with self.assertRaises(AssertionError):
+            parsecache.set_default_cache(dict())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,108 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+
+import thenamelisttool as tnt
+from thenamelisttool import profiling
+from thenamelisttool.config import TntDirective
+
+tpl_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                        '../src/thenamelisttool/templates')
+tpl_path = os.path.normpath(tpl_path)
+
+
+@contextlib.contextmanager
+def start_method(method):
+    """Temporarily change the way worker processes are started."""
+    saved = multiprocessing.get_start_method()
+    multiprocessing.set_start_method(method, force=True)
+    try:
+        yield
+    finally:
+        multiprocessing.set_start_method(saved, force=True)
+
+
+class TestTntProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='tnt_profiling_')
+        self.tmpdir = self._tmpdir.name
+
+    def tearDown(self):
+        profiling.disable()
+        self._tmpdir.cleanup()
+
+    def _namfiles(self, n):
+        namfiles = list()
+        for i in range(n):
+            namfiles.append(os.path.join(self.tmpdir, 'nam{:d}'.format(i)))
+            shutil.copy(os.path.join(tpl_path, 'namelist_prep_template'), namfiles[-1])
+        return namfiles
+
+    def test_profiler(self):
+        self.assertIsNone(profiling.get_profiler())
+        # No profiler: a shared no-op context manager
+        self.assertIs(profiling.phase(profiling.PHASE_PARSE), profiling.phase(profiling.PHASE_DUMPS))
+        # Phases run in worker processes are collected too (however they are started)
+        for method in ('fork', 'spawn'):
+            with start_method(method):
+                self._check_profiler()
+
+    def _check_profiler(self):
+        namfiles = self._namfiles(3)
+        directive = TntDirective(keys_to_set={('NAM_IO_OFFLINE', 'LPRINT'): False})
+        profiler = profiling.enable()
+        tracemalloc.start()
+        try:
+            with tnt.util.set_verbose(False, 'test_profiler'):
+                self.assertListEqual(tnt.util.process_namelists(namfiles[:2], directive, jobs=2), [])
+                tnt.util.process_namelist(namfiles[2], directive)
+            summary = profiler.summary()
+        finally:
+            tracemalloc.stop()
+            profiling.disable()
+        self.assertListEqual(list(summary['phases'].keys()),
+                             [profiling.PHASE_PARSE, profiling.PHASE_APPLY,
+                              profiling.PHASE_DUMPS, profiling.PHASE_WRITE])
+        for p_summary in summary['phases'].values():
+            self.assertEqual(p_summary['count'], 3)
+            self.assertGreater(p_summary['peak'], 0)
+        self.assertSetEqual({r['item'] for r in summary['records'] if r['phase'] == profiling.PHASE_PARSE},
+                            set(namfiles))
+        json.dumps(summary)
+        table = profiler.table(top=2)
+        self.assertIn('Top 2 (slowest):', table)
+        self.assertEqual(len(table.split('\n')), 1 + 4 + 2 + 2 + 1)
+
+    def test_cli_profiling(self):
+        parser = argparse.ArgumentParser()
+        profiling.add_arguments(parser)
+        args = parser.parse_args([])
+        with profiling.cli_profiling(args, 'test') as profiler:
+            self.assertIsNone(profiler)
+            self.assertIsNone(profiling.get_profiler())
+        output = os.path.join(self.tmpdir, 'profile.json')
+        args = parser.parse_args(['--profile', '--profile-output', output])
+        namfile = self._namfiles(1)[0]
+        with tnt.util.set_verbose(False, 'test_cli_profiling'):
+            with self.assertRaises(SystemExit):
+                with profiling.cli_profiling(args, 'test') as profiler:
+                    self.assertIs(profiling.get_profiler(), profiler)
+                    tnt.util.process_namelist(namfile, TntDirective())
+                    raise SystemExit('failure')
+        self.assertIsNone(profiling.get_profiler())
+        self.assertFalse(tracemalloc.is_tracing())
+        with open(output) as fhjson:
+            summary = json.load(fhjson)
+        self.assertEqual(summary['phases'][profiling.PHASE_PARSE]['count'], 1)
+        self.assertGreater(summary['tracemalloc_peak'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
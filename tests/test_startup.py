@@ -0,0 +1,84 @@
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+src_path = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../src'))
+
+# The time it may take to import the package itself (the heavy modules are
+# imported lazily: it should be much less than that)
+_IMPORT_BUDGET_MS = 15
+
+# Modules that are not needed to import the package or to display some help
+_HEAVY_MODULES = {'thenamelisttool.config', 'thenamelisttool.namadapter', 'thenamelisttool.util',
+                  'thenamelisttool.workers', 'bronx.datagrip.namelist', 'yaml', 'difflib', 'pprint'}
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def _run(code):
+    """Run **code** in a new python interpreter (with the -X importtime option).
+
+    :return: The standard output, the set of loaded modules and a dictionary
+             of the modules that were imported by ``import`` statements
+             (module name -> cumulative import time in microseconds).
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([src_path, ] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    env.pop('PYTHONPROFILEIMPORTTIME', None)
+    code = ('import sys\ntry:\n    ' + '\n    '.join(code.split('\n')) +
+            '\nexcept SystemExit:\n    pass\n' +
+            'sys.stderr.write("\\nloaded: " + " ".join(sys.modules) + "\\n")\n')
+    p = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=env,
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if p.returncode != 0:
+        raise RuntimeError('python failed (rc={:d}):\n{:s}'.format(p.returncode, p.stderr))
+    loaded = set()
+    timings = dict()
+    for line in p.stderr.split('\n'):
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            timings[match.group(4)] = int(match.group(2))
+        elif line.startswith('loaded: '):
+            loaded = set(line.split()[1:])
+    return p.stdout, loaded, timings
+
+
+def _dispatch(*kargs):
+    """Call the ``tnt`` command with **kargs** arguments (see :func:`_run`)."""
+    return _run('sys.argv = {!r}\n'.format(['tnt', ] + list(kargs)) +
+                'from thenamelisttool.entrypoints import dispatch\n' +
+                'dispatch.main()')
+
+
+class TestTntStartup(unittest.TestCase):
+
+    def test_package_import(self):
+        _, loaded, timings = _run('import thenamelisttool')
+        self.assertIn('thenamelisttool', loaded)
+        self.assertSetEqual(_HEAVY_MODULES & loaded, set())
+        self.assertLess(timings['thenamelisttool'] / 1000, _IMPORT_BUDGET_MS)
+        # Submodules are still available
+        stdout, loaded, _ = _run('import thenamelisttool as tnt\nprint(tnt.util.__name__)')
+        self.assertEqual(stdout.strip(), 'thenamelisttool.util')
+        self.assertIn('thenamelisttool.config', loaded)
+
+    def test_dispatch(self):
+        stdout, loaded, _ = _dispatch('-h')
+        for subcommand in ('update', 'stack', 'compose', 'diff', 'diffpack'):
+            self.assertRegex(stdout, r'\n  {:s} +'.format(subcommand))
+        self.assertSetEqual({m for m in loaded if m.startswith('thenamelisttool.')},
+                            {'thenamelisttool.entrypoints', 'thenamelisttool.entrypoints.dispatch'})
+        # Only the selected utility is imported
+        stdout, loaded, _ = _dispatch('diff', '-h')
+        self.assertIn('usage: tnt diff [-h] -b BEFORE -a AFTER', stdout)
+        self.assertIn('thenamelisttool.entrypoints.tntdiff', loaded)
+        self.assertNotIn('thenamelisttool.entrypoints.tnt', loaded)
+        stdout, loaded, _ = _dispatch('update', '-h')
+        self.assertIn('usage: tnt update [-h]', stdout)
+        self.assertSetEqual(_HEAVY_MODULES & loaded, set())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
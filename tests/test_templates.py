@@ -1,4 +1,5 @@
 import os
+import tempfile
 import unittest
 
 import thenamelisttool as tnt
@@ -118,6 +119,28 @@ class TestTntRecipe(unittest.TestCase):
             nam.merge(ingredient)
         self.assertEqual(nam.dumps(sorting=FIRST_ORDER_SORTING), COMPOSED_NAM)
 
+    def test_recipe_merge_all(self):
+        from bronx.datagrip.namelist import FIRST_ORDER_SORTING
+        recipe = tnt.config.TntRecipe(os.path.join(tpl_path, 'tntcompose-recipe.tpl.yaml'),
+                                      sourcenam_directory=data_path)
+        nam = recipe.ingredients[0]
+        nam.merge_all(recipe.ingredients[1:])
+        self.assertEqual(nam.dumps(sorting=FIRST_ORDER_SORTING), COMPOSED_NAM)
+
+    def test_recipe_shared_source(self):
+        with tempfile.TemporaryDirectory(prefix='tnt_recipe_') as tmpdir:
+            recipe_file = os.path.join(tmpdir, 'recipe.yaml')
+            with open(recipe_file, 'w') as fhrecipe:
+                fhrecipe.write('namelist_obs/+:\n  - NAMARG\n' +
+                               'namelist_obs/-:\n  - NAMARG\n' +
+                               'namelist_empty/+:\n  - NAMOBS/-: [LCAPACH, ]\n')
+            recipe = tnt.config.TntRecipe(recipe_file, sourcenam_directory=data_path)
+        # namelist_obs is read once, but each ingredient is independent
+        self.assertEqual(len(recipe._sources), 2)
+        obs = tnt.namadapter.LazyNamelistAdapter(os.path.join(data_path, 'namelist_obs'))
+        self.assertListEqual(list(recipe.ingredients[1].keys()), ['NAMARG', ])
+        self.assertSetEqual(set(recipe.ingredients[2].keys()), set(obs.keys()) - {'NAMARG', })
+
     def _assert_syntax_error(self, recipe):
         with tnt.util.set_verbose(False, 'ko/recipe_ko1.yaml'):
             with self.assertRaises(tnt.config.TntRecipeSyntaxError):
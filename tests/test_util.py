@@ -0,0 +1,266 @@
+import contextlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import thenamelisttool as tnt
+from thenamelisttool.config import TntDirective, TntStackDirective
+
+tpl_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                        '../src/thenamelisttool/templates')
+tpl_path = os.path.normpath(tpl_path)
+
+data_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')
+
+
+@contextlib.contextmanager
+def start_method(method):
+    """Temporarily change the way worker processes are started."""
+    saved = multiprocessing.get_start_method()
+    multiprocessing.set_start_method(method, force=True)
+    try:
+        yield
+    finally:
+        multiprocessing.set_start_method(saved, force=True)
+
+
+def _batch_sources_job():
+    """The number of shared sources seen by a worker process (and whether they are parsed)."""
+    sources = tnt.util._BATCH_SOURCES
+    return len(sources), all([s.block_source(b) is None for s in sources._sources.values() for b in s])
+
+
+class TestTntUtil(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='tnt_util_')
+        self.tmpdir = self._tmpdir.name
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _copy_template(self, name, tplname='namelist_prep_template'):
+        target = os.path.join(self.tmpdir, name)
+        shutil.copy(os.path.join(tpl_path, tplname), target)
+        return target
+
+    def test_process_namelists(self):
+        namfiles = [self._copy_template('nam{:d}'.format(i)) for i in range(4)]
+        with open(namfiles[2], 'w') as fhnam:
+            fhnam.write('&NAMBROKEN A=?? /')
+        directive = TntDirective(keys_to_set={('NAM_IO_OFFLINE', 'LPRINT'): False})
+        with tnt.util.set_verbose(False, 'test_process_namelists'):
+            failures = tnt.util.process_namelists(namfiles, directive, jobs=2)
+        self.assertListEqual([f for f, _ in failures], [namfiles[2], ])
+        for i in (0, 1, 3):
+            nam = tnt.namadapter.BronxNamelistAdapter(namfiles[i] + '.tnt')
+            self.assertIs(nam['NAM_IO_OFFLINE']['LPRINT'], False)
+        self.assertFalse(os.path.exists(namfiles[2] + '.tnt'))
+
+    def test_non_ascii_comments(self):
+        namfile = os.path.join(self.tmpdir, 'nam')
+        with open(namfile, 'w', encoding='utf-8') as fhnam:
+            fhnam.write('&NAMA A=1, / ! Caf\u00e9\n&NAMB B=1, /\n')
+        directive = TntDirective(keys_to_set={('NAMB', 'B'): 2})
+        with self.assertLogs('tntlog', 'WARNING') as logs:
+            tnt.util.process_namelist(namfile, directive)
+        self.assertIn('non-ASCII', logs.output[0])
+        with open(namfile + '.tnt', encoding='ascii') as fhnam:
+            self.assertEqual(fhnam.read(), ' &NAMA\n   A=1,\n /\n &NAMB\n   B=2,\n /\n')
+
+    def test_structural_diff(self):
+        before = tnt.util.namelist_structure(tnt.namadapter.BronxNamelistAdapter(
+            '&NAMA A=1, B=2, C=3, /\n&NAMB X=1, /\n'))
+        after = tnt.util.namelist_structure(tnt.namadapter.BronxNamelistAdapter(
+            '&NAMA A=1, B=4, D=5, /\n&NAMC Y=.TRUE., /\n'))
+        self.assertListEqual(tnt.util.structural_diff(before, after),
+                             ['  &NAMA',
+                              '~     B: 2 => 4',
+                              '-     C=3,',
+                              '+     D=5,',
+                              '- &NAMB',
+                              '-     X=1,',
+                              '+ &NAMC',
+                              '+     Y=.TRUE.,'])
+        self.assertListEqual(tnt.util.structural_diff(after, after), [])
+        # Values must be formatted by the namelist's blocks
+        with self.assertRaises(AttributeError):
+            tnt.util.namelist_structure({'NAMA': {'A': 1}})
+
+    def test_compose_namelists(self):
+        recipes = list()
+        for i in range(3):
+            recipes.append(os.path.join(self.tmpdir, 'recipe{:d}.yaml'.format(i)))
+            shutil.copy(os.path.join(tpl_path, 'tntcompose-recipe.tpl.yaml'), recipes[-1])
+        with open(recipes[1], 'w') as fhrecipe:
+            fhrecipe.write('namelist_obs/+:\n  - NAMARG\nnamelist_missing: __all__\n')
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir)
+        try:
+            with tnt.util.set_verbose(False, 'test_compose_namelists'):
+                tnt.util.compose_namelist(recipes[0], sourcenam_directory=data_path, suffix='.ref')
+            with open(os.path.join(self.tmpdir, 'recipe0.ref')) as fhref:
+                ref = fhref.read()
+            # The shared sources reach the worker processes, however they are started
+            for method in ('fork', 'spawn'):
+                with start_method(method), tnt.util.set_verbose(False, 'test_compose_namelists'):
+                    reports = tnt.util.compose_namelists(recipes, jobs=2, sourcenam_directory=data_path)
+                self.assertListEqual([r.recipe for r in reports], recipes)
+                self.assertListEqual([r.error is None for r in reports], [True, False, True])
+                self.assertGreater(reports[2].elapsed, 0)
+                for i in (0, 2):
+                    with open(os.path.join(self.tmpdir, 'recipe{:d}.nam'.format(i))) as fhnam:
+                        self.assertEqual(fhnam.read(), ref)
+                    os.unlink(os.path.join(self.tmpdir, 'recipe{:d}.nam'.format(i)))
+                self.assertFalse(os.path.exists(os.path.join(self.tmpdir, 'recipe1.nam')))
+        finally:
+            os.chdir(cwd)
+        sources = tnt.config.TntRecipeSources()
+        sources.preload(recipes[0], sourcenam_directory=data_path)
+        sources.load()
+        with start_method('spawn'):
+            outcomes = list(tnt.workers.map_jobs(_batch_sources_job, [(), ()], jobs=2,
+                                                 initializer=tnt.util._set_batch_sources, initargs=(sources, )))
+        self.assertListEqual([o.value for o in outcomes], [(len(sources), True), ] * 2)
+
+    def _run_stack(self, subdir, jobs=1, statefile=None, lprint=False, cachedir=None, todolist=None):
+        rundir = os.path.join(self.tmpdir, subdir)
+        if not os.path.exists(rundir):
+            # The namelist's pack is created (otherwise, it is left as is)
+            os.mkdir(rundir)
+            for name in ('nam1', 'nam2', 'nam3', 'useless'):
+                shutil.copy(os.path.join(tpl_path, 'namelist_prep_template'), os.path.join(rundir, name))
+            if lprint:
+                with open(os.path.join(rundir, 'nam3'), 'a') as fhnam:
+                    fhnam.write('&NAMPRINT LPRINT=.TRUE., /\n')
+        directive = TntStackDirective(
+            tpl_path,
+            directives=dict(nolog=dict(keys_to_set={('NAM_IO_OFFLINE', 'LPRINT'): False}),
+                            newb=dict(new_blocks='NAMNEW')),
+            todolist=todolist or [dict(action='tnt', namelist='nam[12]', directive='nolog'),
+                                  dict(action='create', target='nam4', copy='nam1'),
+                                  dict(action='create', target='nam5', namelist='nam3', directive=['newb', 'nolog']),
+                                  dict(action='tnt', namelist=['nam[45]', 'nam3'], directive='newb'),
+                                  dict(action='move', target='nam6', namelist='nam5'),
+                                  dict(action='create', target='nam7', external='namelist_prep_template'),
+                                  dict(action='link', target='nam8', namelist='nam7'),
+                                  dict(action='tnt', namelist='nam8', directive='nolog'),
+                                  dict(action='touch', namelist='nam*'),
+                                  dict(action='clean_untouched')]
+        )
+        cwd = os.getcwd()
+        os.chdir(rundir)
+        try:
+            with tnt.util.set_verbose(False, 'test_process_tnt_stack'):
+                state = tnt.util.process_tnt_stack(directive, jobs=jobs, statefile=statefile,
+                                                   cachedir=cachedir)
+        finally:
+            os.chdir(cwd)
+        result = dict()
+        for name in sorted([n for n in os.listdir(rundir) if not os.path.isdir(os.path.join(rundir, n))]):
+            with open(os.path.join(rundir, name)) as fhnam:
+                result[name] = (os.path.islink(os.path.join(rundir, name)), fhnam.read())
+        return result, state
+
+    def test_process_manifest(self):
+        for i in range(3):
+            self._copy_template('nam{:d}'.format(i))
+        with open(os.path.join(self.tmpdir, 'lprint.yaml'), 'w') as fhdir:
+            fhdir.write('keys_to_set:\n  NAM_IO_OFFLINE:\n    LPRINT: false\n')
+        manifest = os.path.join(self.tmpdir, 'manifest.yaml')
+        with open(manifest, 'w') as fhm:
+            fhm.write('defaults:\n  directives: lprint.yaml\n' +
+                      'jobs:\n' +
+                      '  - {namelist: nam0}\n' +
+                      '  - {namelist: nam1, output: nam1.out, sorting: first, doctor: true}\n' +
+                      '  - {namelist: nam2, directives: missing.yaml}\n' +
+                      '  - {namelist: nam2, directives: null, in_place: true}\n')
+        manifest_jobs = tnt.config.read_manifest(manifest)
+        with mock.patch.object(tnt.util, 'read_directives', wraps=tnt.util.read_directives) as m_read:
+            with tnt.util.set_verbose(False, 'test_process_manifest'):
+                reports = tnt.util.process_manifest(manifest_jobs, jobs=2)
+        # lprint.yaml is read once (and missing.yaml is attempted once)
+        self.assertEqual(m_read.call_count, 2)
+        self.assertListEqual([r.error is None for r in reports], [True, True, False, True])
+        self.assertListEqual([os.path.basename(r.target) for r in reports],
+                             ['nam0.tnt', 'nam1.out', 'nam2.tnt', 'nam2'])
+        for target in ('nam0.tnt', 'nam1.out'):
+            nam = tnt.namadapter.BronxNamelistAdapter(os.path.join(self.tmpdir, target))
+            self.assertIs(nam['NAM_IO_OFFLINE']['LPRINT'], False)
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, 'nam2.tnt')))
+        summary = tnt.util.manifest_summary(reports, elapsed=1.)
+        self.assertEqual((summary['jobs'], summary['failed']), (4, 1))
+        self.assertListEqual([r['status'] for r in summary['results']], ['ok', 'ok', 'failed', 'ok'])
+        self.assertIn('missing.yaml', summary['results'][2]['error'])
+
+    def test_process_tnt_stack(self):
+        serial, _ = self._run_stack('serial', jobs=1)
+        self.assertListEqual(sorted(serial.keys()),
+                             ['nam1', 'nam2', 'nam3', 'nam4', 'nam6', 'nam7', 'nam8'])
+        self.assertIn('NAMNEW', serial['nam4'][1])
+        self.assertIn('LPRINT=.FALSE.', serial['nam8'][1])
+        self.assertDictEqual(self._run_stack('concurrent', jobs=3)[0], serial)
+
+    def test_process_tnt_stack_incremental(self):
+        statefile = os.path.join(self.tmpdir, 'tntstack.state')
+        serial, _ = self._run_stack('serial')
+        result, state = self._run_stack('inc1', statefile=statefile)
+        self.assertDictEqual(result, serial)
+        self.assertEqual((len(state.executed), len(state.skipped)), (9, 0))
+        with open(statefile) as fhstate:
+            self.assertNotIn('blobs', json.load(fhstate))
+        # Without a cache, the outputs of the tasks can not be restored in a new
+        # pack (only the "tnt" action that leaves nam5 unchanged is skipped)
+        result, state = self._run_stack('inc2', statefile=statefile)
+        self.assertDictEqual(result, serial)
+        self.assertEqual((len(state.executed), len(state.skipped)), (8, 1))
+        # The pack is left as is: the result is the one of a full run on the
+        # current content of the directory (only the tasks whose outputs are
+        # still in place are skipped)
+        todolist = [dict(action='tnt', namelist='nam[12]', directive='nolog'),
+                    dict(action='create', target='nam4', copy='nam1'),
+                    dict(action='create', target='nam5', namelist='nam3', directive='newb')]
+        for i in range(2):
+            serial, _ = self._run_stack('serial_as_is', todolist=todolist)
+            result, state = self._run_stack('inc_as_is', statefile=statefile, todolist=todolist)
+            self.assertDictEqual(result, serial)
+        self.assertEqual((len(state.executed), len(state.skipped)), (2, 2))
+
+    def test_process_tnt_stack_cache(self):
+        statefile = os.path.join(self.tmpdir, 'tntstack.state')
+        cachedir = os.path.join(self.tmpdir, 'cache')
+        serial, _ = self._run_stack('serial')
+        result, state = self._run_stack('inc1', statefile=statefile, cachedir=cachedir)
+        self.assertDictEqual(result, serial)
+        self.assertEqual((len(state.executed), len(state.skipped)), (9, 0))
+        # Nothing changed: the results of the previous run are restored from the cache
+        result, state = self._run_stack('inc2', statefile=statefile, jobs=2, cachedir=cachedir)
+        self.assertDictEqual(result, serial)
+        self.assertEqual((len(state.executed), len(state.skipped)), (0, 9))
+        # Only the tasks that depend on nam3 are executed
+        serial, _ = self._run_stack('serial_lprint', lprint=True)
+        result, state = self._run_stack('inc3', statefile=statefile, lprint=True, cachedir=cachedir)
+        self.assertDictEqual(result, serial)
+        self.assertEqual((len(state.executed), len(state.skipped)), (3, 6))
+        # The pack is left as is: the tasks that modify files in place are skipped too
+        todolist = [dict(action='tnt', namelist='nam[12]', directive='nolog'),
+                    dict(action='create', target='nam4', copy='nam1'),
+                    dict(action='tnt', namelist='nam4', directive='newb'),
+                    dict(action='clean_untouched')]
+        self._run_stack('serial_as_is', todolist=todolist)
+        serial, _ = self._run_stack('serial_as_is', todolist=todolist)
+        # NB: The cache directory may be in the namelist's pack (it is not cleaned)
+        cachedir = os.path.join(self.tmpdir, 'inc_as_is', 'cache')
+        for i in range(2):
+            result, state = self._run_stack('inc_as_is', statefile=statefile, cachedir=cachedir, todolist=todolist)
+        self.assertEqual((len(state.executed), len(state.skipped)), (0, 4))
+        self.assertTrue(os.listdir(cachedir))
+        self.assertDictEqual(result, serial)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
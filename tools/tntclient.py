@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+
+"""
+TNT client - Run tnt.py, tntdiff.py or tntcompose.py through the TNT daemon.
+"""
+
+import os
+import sys
+
+# Automatically set the python path
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'src')
+)
+
+from thenamelisttool.entrypoints import tntclient as tnt_cli
+
+
+if __name__ == '__main__':
+    tnt_cli.main()
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+
+"""
+TNT daemon - Run the TNT utilities on behalf of the tntclient.py utility.
+"""
+
+import os
+import sys
+
+# Automatically set the python path
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'src')
+)
+
+from thenamelisttool.entrypoints import tntdaemon as tnt_cli
+
+
+if __name__ == '__main__':
+    tnt_cli.main()